@@ -1,11 +1,16 @@
+import json
+import hashlib
 from pydantic import BaseModel
 from typing import List, Optional
+from fastapi import Request, Response
 
 
 class AgentSkill(BaseModel):
     id: str
     name: str
     description: Optional[str] = None
+    # Palabras clave usadas por el enrutador local del orquestador
+    tags: Optional[List[str]] = None
 
 
 class AgentCapabilities(BaseModel):
@@ -19,3 +24,16 @@ class AgentCard(BaseModel):
     url: str
     skills: List[AgentSkill]
     capabilities: AgentCapabilities
+
+
+def agent_card_response(card: AgentCard, request: Request) -> Response:
+    """
+    Respuesta de /.well-known/agent.json con ETag: si el cliente envía un
+    If-None-Match que coincide, se responde 304 sin cuerpo.
+    """
+    body = json.dumps(card.model_dump(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,14 +1,17 @@
 """
 Agente Clima - Servicio de ejemplo para responder sobre clima
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import logging
 import os
-from agents.agent_card import AgentCard, AgentSkill, AgentCapabilities
+from agents.agent_card import AgentCard, AgentSkill, AgentCapabilities, agent_card_response
+from core.metrics import install_metrics, jsonrpc_outcome, track_jsonrpc
+from core.tracing import install_tracing
+from core.health import install_health
+from core.serve import run_service
 import json
-from fastapi.responses import JSONResponse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,6 +21,9 @@ app = FastAPI(
     description="Agente de ejemplo para responder sobre clima",
     version="1.0.0"
 )
+install_metrics(app, "agente-clima")
+install_tracing(app, "agente-clima")
+install_health(app, "agente-clima")
 
 class HURequest(BaseModel):
     hu_id: str
@@ -39,7 +45,12 @@ AGENT_CARD = AgentCard(
     description="Agente especializado en responder sobre clima",
     url=AGENT_URL,
     skills=[
-        AgentSkill(id="clima", name="Clima", description="Responde preguntas sobre el clima")
+        AgentSkill(
+            id="clima",
+            name="Clima",
+            description="Responde preguntas sobre el clima",
+            tags=["clima", "temperatura", "tiempo", "lluvia", "pronóstico", "meteorología"]
+        )
     ],
     capabilities=AgentCapabilities(streaming=False)
 )
@@ -53,12 +64,18 @@ async def get_agent_card():
     return AGENT_CARD
 
 @app.get("/.well-known/agent.json")
-async def agent_json():
-    return JSONResponse(content=AGENT_CARD.model_dump())
+async def agent_json(request: Request):
+    return agent_card_response(AGENT_CARD, request)
 
 @app.post("/jsonrpc")
 async def jsonrpc(request: dict):
     method = request.get("method")
+    with track_jsonrpc(method) as outcome:
+        response = await dispatch_jsonrpc(method, request)
+        outcome["value"] = jsonrpc_outcome(response)
+    return response
+
+async def dispatch_jsonrpc(method: Optional[str], request: dict):
     if method == "get_agent_card":
         return {"result": AGENT_CARD.dict()}
     elif method == "tasks/send":
@@ -112,5 +129,4 @@ async def process_hu(request: HURequest):
     )
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8002) 
\ No newline at end of file
+    run_service(app, "agents.clima_agent_service:app", 8002)
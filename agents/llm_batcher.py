@@ -0,0 +1,133 @@
+# agents/llm_batcher.py
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    # Solo para anotaciones: la cadena (y LangChain) se crea de forma perezosa en el servicio
+    from langchain_core.runnables import Runnable
+
+logger = logging.getLogger(__name__)
+
+# Ventana de agrupación en ms; 0 desactiva el micro-batching (una llamada al LLM por petición)
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "0"))
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+# Prompts de un mismo lote que se envían a la vez al servidor del modelo (max_concurrency de abatch)
+LLM_BATCH_MAX_CONCURRENCY = int(os.getenv("LLM_BATCH_MAX_CONCURRENCY", "4"))
+
+
+class LLMMicroBatcher:
+    """
+    Agrupa las invocaciones del LLM que llegan en ráfaga y las despacha con chain.abatch.
+
+    Cada llamada a invoke() deja su input en una cola y espera su futuro. Un despachador
+    toma el primer input, sigue recogiendo durante window_ms o hasta max_size elementos y
+    lanza el lote con abatch(max_concurrency=max_concurrency); cada resultado (o excepción)
+    vuelve a quien lo pidió. Los lotes se ejecutan en tareas propias, así que mientras uno
+    está en el LLM se va llenando el siguiente.
+    """
+    def __init__(
+        self,
+        chain_factory: Callable[[], "Runnable"],
+        window_ms: float = LLM_BATCH_WINDOW_MS,
+        max_size: int = LLM_BATCH_MAX_SIZE,
+        max_concurrency: int = LLM_BATCH_MAX_CONCURRENCY
+    ):
+        self.chain_factory = chain_factory
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.largest_batch = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running: set = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_size > 1
+
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._dispatcher is None or self._dispatcher.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            # Contexto vacío: el despachador y sus lotes no deben heredar el de la petición que
+            # lo arrancó (p.ej. su traza), que atribuiría a esa petición los lotes de todas
+            self._dispatcher = contextvars.Context().run(asyncio.create_task, self._dispatch_loop())
+
+    async def invoke(self, inputs: dict) -> Any:
+        """
+        Equivalente a chain.ainvoke(inputs), pero compartiendo lote con otras peticiones.
+        """
+        if not self.enabled:
+            return await self.chain_factory().ainvoke(inputs)
+        self._ensure_dispatcher()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((inputs, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[dict, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _dispatch_loop(self):
+        while True:
+            batch = await self._collect()
+            # Quien canceló su petición mientras esperaba ya no necesita resultado
+            batch = [(inputs, future) for inputs, future in batch if not future.done()]
+            if not batch:
+                continue
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: List[Tuple[dict, asyncio.Future]]):
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            results = await self.chain_factory().abatch(
+                [inputs for inputs, _ in batch],
+                config={"max_concurrency": self.max_concurrency},
+                return_exceptions=True
+            )
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                self.errors += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "max_concurrency": self.max_concurrency,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queued": self._queue.qsize() if self._queue is not None else 0
+        }
@@ -0,0 +1,246 @@
+# agents/llm_cache.py
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from core.shared_state import connect, shared_db_path, shared_state_enabled
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+# Ruta del nivel en disco (SQLite); vacío lo desactiva. En modo multi-worker (core/shared_state.py)
+# se usa por defecto una base compartida, para que lo que genera un worker sirva a los demás
+LLM_CACHE_SQLITE_PATH = os.getenv("LLM_CACHE_SQLITE_PATH", "") or (shared_db_path("llm_cache") if shared_state_enabled() else "")
+LLM_CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_SQLITE_MAX_ENTRIES", "100000"))
+# Inserciones en disco entre dos pasadas de limpieza (TTL y tamaño máximo), en un hilo aparte
+LLM_CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "256"))
+
+# Cabeceras que fuerzan la regeneración sin consultar la caché
+CACHE_BYPASS_HEADER = "x-cache-bypass"
+
+
+def cache_bypass_requested(headers) -> bool:
+    """
+    True si la petición pide ignorar la caché: "X-Cache-Bypass: 1" o "Cache-Control: no-cache".
+    """
+    if headers.get(CACHE_BYPASS_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in headers.get("cache-control", "").lower()
+
+
+def make_cache_key(prompt_template: str, model: str, temperature: float, test_cases, input_mode: str = "",
+                   provider: str = "", endpoint: str = "") -> str:
+    """
+    Clave de contenido: hash de (plantilla, modelo, temperatura, test_cases canónicos, modo de input
+    del prompt, proveedor y URL del LLM). Con el proveedor y la URL, lo generado por otro backend
+    (p.ej. el LLM falso de las pruebas de carga) nunca se sirve desde el nivel en disco.
+    """
+    canonical = json.dumps(test_cases, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    material = json.dumps([prompt_template, model, temperature, canonical, input_mode, provider, endpoint], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResultCache:
+    """
+    Caché de respuestas del LLM en dos niveles: LRU en memoria y, opcionalmente, SQLite en disco.
+    Ambos niveles aplican TTL y un tamaño máximo (se expulsan primero las entradas menos usadas).
+    Desde el event loop se usan aget/aset: el nivel en memoria se consulta en línea y el de
+    disco en un hilo. La limpieza del disco se hace cada evict_every inserciones en un hilo
+    aparte, fuera de la inserción.
+    """
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        sqlite_path: str = LLM_CACHE_SQLITE_PATH,
+        sqlite_max_entries: int = LLM_CACHE_SQLITE_MAX_ENTRIES,
+        evict_every: int = LLM_CACHE_EVICT_EVERY
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_max_entries = sqlite_max_entries
+        self.evict_every = max(1, evict_every)
+        self._memory: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        # _lock protege la memoria y los contadores; _db_lock la conexión SQLite, para que
+        # una limpieza del disco no bloquee los aciertos en memoria
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._inserts_since_evict = 0
+        self._evicting = False
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if sqlite_path:
+            # WAL y espera por lock: varios workers pueden compartir el fichero
+            self._db = connect(sqlite_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+            self._db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created_at, value = entry
+        if self._expired(created_at, now):
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        self.hits += 1
+        self.memory_hits += 1
+        return value
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        with self._db_lock:
+            row = self._db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self._expired(created_at, now):
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self._remember(key, created_at, value)
+            self.hits += 1
+            self.disk_hits += 1
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is not None:
+                return value
+        value = self._disk_get(key, now) if self._db is not None else None
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get sin bloquear el event loop: solo el nivel en disco va a un hilo."""
+        now = time.time()
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is not None:
+                return value
+        value = await asyncio.to_thread(self._disk_get, key, now) if self._db is not None else None
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    def _disk_set(self, key: str, value: str, now: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+        with self._lock:
+            self._inserts_since_evict += 1
+            if self._inserts_since_evict < self.evict_every or self._evicting:
+                return
+            self._inserts_since_evict = 0
+            self._evicting = True
+        threading.Thread(target=self.evict_disk, name="llm-cache-evict", daemon=True).start()
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self._db is not None:
+            self._disk_set(key, value, now)
+
+    async def aset(self, key: str, value: str):
+        """set sin bloquear el event loop: la escritura en disco va a un hilo."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, now)
+
+    def evict_disk(self) -> int:
+        """
+        Borra del disco las entradas caducadas y las menos usadas por encima de
+        sqlite_max_entries. Devuelve cuántas se borraron.
+        """
+        removed = 0
+        try:
+            with self._db_lock:
+                if self.ttl_seconds > 0:
+                    removed += self._db.execute("DELETE FROM llm_cache WHERE created_at < ?",
+                                                (time.time() - self.ttl_seconds,)).rowcount
+                removed += self._db.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.sqlite_max_entries,)
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Error limpiando la caché del LLM en disco: {e}")
+        finally:
+            with self._lock:
+                self._evicting = False
+                self.disk_evictions += removed
+        return removed
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        disk_size = None
+        if self._db is not None:
+            with self._db_lock:
+                disk_size = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_size": len(self._memory),
+                "memory_max_entries": self.max_entries,
+                "disk_size": disk_size,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "ttl_seconds": self.ttl_seconds
+            }
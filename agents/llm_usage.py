@@ -0,0 +1,59 @@
+# agents/llm_usage.py
+import threading
+from typing import Any, Dict, Optional
+
+
+def extract_usage(message: Any) -> Optional[Dict[str, int]]:
+    """
+    Tokens de prompt y de respuesta de un mensaje del LLM (usage_metadata de LangChain),
+    o None si el proveedor no los informa.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    return {
+        "prompt_tokens": int(usage.get("input_tokens", 0)),
+        "completion_tokens": int(usage.get("output_tokens", 0)),
+    }
+
+
+class LLMUsageStats:
+    """
+    Acumula el consumo del LLM por petición: tokens de prompt y de respuesta, caracteres
+    del input serializado y duración, para comparar modos de serialización del prompt.
+    """
+    def __init__(self):
+        self.requests = 0
+        self.with_tokens = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.input_chars = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, usage: Optional[Dict[str, int]], input_chars: int, ms: float) -> dict:
+        """
+        Registra una llamada y devuelve el informe de esa petición.
+        """
+        with self._lock:
+            self.requests += 1
+            self.input_chars += input_chars
+            self.total_ms += ms
+            if usage:
+                self.with_tokens += 1
+                self.prompt_tokens += usage["prompt_tokens"]
+                self.completion_tokens += usage["completion_tokens"]
+        return {**(usage or {}), "input_chars": input_chars, "ms": round(ms, 1)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "requests_with_tokens": self.with_tokens,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.with_tokens, 1) if self.with_tokens else None,
+                "avg_completion_tokens": round(self.completion_tokens / self.with_tokens, 1) if self.with_tokens else None,
+                "avg_input_chars": round(self.input_chars / self.requests, 1) if self.requests else None,
+                "avg_ms": round(self.total_ms / self.requests, 1) if self.requests else None,
+            }
@@ -1,33 +1,65 @@
 """
 Agente PGP independiente - Servicio para procesar HUs y generar Gherkin
 """
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, ValidationError
 from typing import List, Dict, Optional
 import json
 import logging
 import os
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 load_dotenv()
 
-# LLM via LangChain + Ollama
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
+# LLM via LangChain (Ollama por defecto; LLM_PROVIDER=fake para pruebas de carga).
+# El proveedor y LangChain se importan al crear la cadena (get_pgp_chain), no al importar el módulo
+from core.llm_provider import build_chat_model
 
 # Importar la lógica de generación de PGP clásica
 from agents.task_manager import PGPTargetAgent
-from agents.agent_card import AgentCard, AgentSkill, AgentCapabilities
-from fastapi.responses import JSONResponse
+from agents.agent_card import AgentCard, AgentSkill, AgentCapabilities, agent_card_response
+from core.hu_repository import get_hu_repository
+from core.custom_types import SendTaskRequest, GetTaskRequest, CancelTaskRequest
+from core.in_memory_task_manager import InMemoryTaskManager
+from agents.llm_cache import LLMResultCache, LLM_CACHE_ENABLED, cache_bypass_requested, make_cache_key
+from core.single_flight import SingleFlight, make_flight_key
+from agents.llm_batcher import LLMMicroBatcher
+from agents.llm_usage import LLMUsageStats, extract_usage
+from agents.prompt_input import PROMPT_INPUT_MODE, serialize_prompt_input
+from core.metrics import LLM_FALLBACKS, install_metrics, jsonrpc_outcome, track_jsonrpc, track_llm_call
+from core import tracing
+from core.health import STARTUP_WARMUP, install_health
+from core.serve import run_service
+from core.shared_state import SharedTaskStore, shared_state_enabled
+from sse_starlette.sse import EventSourceResponse
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # La precarga del LLM va en segundo plano: /health/live responde desde el primer momento
+    # y /health/ready cuando la cadena está lista
+    if STARTUP_WARMUP:
+        readiness.start("llm", warmup_llm)
+    try:
+        yield
+    finally:
+        await readiness.stop()
+        # Detiene los workers de la cola; en modo multi-worker marca ERROR las tareas que
+        # quedaron sin ejecutar para que no sigan activas en el almacén compartido
+        await task_manager.shutdown()
+
 # Crear la aplicación FastAPI
 app = FastAPI(
     title="PGP Agent Service",
     description="Servicio independiente para procesar HUs y generar Gherkin",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Modelos Pydantic para la API
@@ -42,17 +74,22 @@ class PGPResponse(BaseModel):
     hu_id: str
     gherkin_content: str
     message: Optional[str] = None
+    usage: Optional[Dict] = None
 
 # Instanciar el procesador PGP clásico
 pgp_processor = PGPTargetAgent()
 
-# Instanciar el modelo LLM (Ollama local)
+# Instanciar el modelo LLM (Ollama local por defecto)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "ollama")
 LLM_URL = os.getenv("LLM_URL", "http://localhost:11434")
-llm = ChatOllama(
-    model="llama3",
-    temperature=0.2,
-    base_url=LLM_URL
-)
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+
+# Caché de resultados del LLM (memoria + SQLite opcional)
+llm_cache = LLMResultCache() if LLM_CACHE_ENABLED else None
+
+# Agrupación de generaciones idénticas en curso (misma HU y mismo payload)
+hu_flight = SingleFlight("pgp-agent")
 
 # Prompt para el LLM
 PROMPT_TEMPLATE = (
@@ -77,6 +114,34 @@ Según la historia XX-XXX el formato Gherkin es:
     """
 )
 
+# Cadena prompt | llm, creada una sola vez (en la precarga del arranque o en la primera llamada)
+_pgp_chain = None
+_pgp_chain_lock = threading.Lock()
+
+def get_pgp_chain():
+    global _pgp_chain
+    if _pgp_chain is None:
+        with _pgp_chain_lock:
+            if _pgp_chain is None:
+                from langchain_core.prompts import ChatPromptTemplate
+                llm = build_chat_model(
+                    LLM_PROVIDER,
+                    ollama={"model": LLM_MODEL, "temperature": LLM_TEMPERATURE, "base_url": LLM_URL}
+                )
+                _pgp_chain = ChatPromptTemplate.from_template(PROMPT_TEMPLATE) | llm
+    return _pgp_chain
+
+async def warmup_llm() -> dict:
+    """Importa el proveedor y crea la cadena en un hilo, sin bloquear el event loop."""
+    await asyncio.to_thread(get_pgp_chain)
+    return {"provider": LLM_PROVIDER}
+
+# Micro-batching de las llamadas al LLM (desactivado con LLM_BATCH_WINDOW_MS=0)
+llm_batcher = LLMMicroBatcher(get_pgp_chain)
+
+# Consumo de tokens y duración de cada llamada al LLM
+llm_usage = LLMUsageStats()
+
 # Definir el AgentCard para este agente
 # Configurar URL del agente desde variable de entorno
 AGENT_URL = os.getenv("PGP_AGENT_URL", "http://localhost:8001")
@@ -86,9 +151,14 @@ AGENT_CARD = AgentCard(
     description="Agente especializado en transformar HUs a Gherkin (PGP)",
     url=AGENT_URL,
     skills=[
-        AgentSkill(id="pgp", name="PGP", description="Transforma HUs a Gherkin")
+        AgentSkill(
+            id="pgp",
+            name="PGP",
+            description="Transforma HUs a Gherkin",
+            tags=["login", "credenciales", "contraseña", "validación", "pruebas", "gherkin", "acceso"]
+        )
     ],
-    capabilities=AgentCapabilities(streaming=False)
+    capabilities=AgentCapabilities(streaming=True)
 )
 
 @app.get("/health")
@@ -97,14 +167,43 @@ async def health_check():
     return {"status": "healthy", "service": "pgp-agent"}
 
 @app.get("/.well-known/agent.json")
-async def agent_json():
-    return JSONResponse(content=AGENT_CARD.model_dump())
+async def agent_json(request: Request):
+    return agent_card_response(AGENT_CARD, request)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Contadores de la caché de resultados del LLM"""
+    if llm_cache is None:
+        return {"enabled": False}
+    return llm_cache.stats()
+
+@app.get("/llm/usage/stats")
+async def llm_usage_stats():
+    """Tokens de prompt/respuesta y duración media de las llamadas al LLM"""
+    return {"prompt_input_mode": PROMPT_INPUT_MODE, **llm_usage.stats()}
+
+@app.get("/llm/batch/stats")
+async def llm_batch_stats():
+    """Tamaño medio de los lotes enviados al LLM por el micro-batcher"""
+    return llm_batcher.stats()
+
+@app.get("/singleflight/stats")
+async def singleflight_stats():
+    """Llamadas al LLM agrupadas por el single-flight"""
+    return hu_flight.stats()
 
 @app.post("/process-hu", response_model=PGPResponse)
-async def process_hu(request: HURequest):
+async def process_hu(request: HURequest, http_request: Request):
     """
     Procesa una HU y genera el contenido Gherkin correspondiente usando LLM (Llama local)
     Si el LLM falla, usa la generación clásica como fallback.
+    Con la cabecera "X-Cache-Bypass: 1" (o "Cache-Control: no-cache") se fuerza la regeneración.
+    """
+    return await run_process_hu(request, bypass_cache=cache_bypass_requested(http_request.headers))
+
+async def run_process_hu(request: HURequest, bypass_cache: bool = False) -> PGPResponse:
+    """
+    Lógica de /process-hu, compartida con el método JSON-RPC tasks/send.
     """
     try:
         logger.info(f"Procesando HU: {request.hu_id}")
@@ -113,51 +212,42 @@ async def process_hu(request: HURequest):
         if request.hu_data:
             request.test_cases = [request.hu_data]
             logger.info(f"Usando datos de HU enviados por orquestador: {request.hu_data.get('title', '')}")
-        # Si no se proporcionan test_cases, cargar desde archivo (fallback)
+        # Si no se proporcionan test_cases, cargar desde el índice compartido (fallback)
         elif not request.test_cases:
-            from pathlib import Path
-            path = Path("data/test_cases.json")
-            if not path.exists():
+            repository = get_hu_repository()
+            if not repository.exists():
                 raise HTTPException(
                     status_code=404, 
-                    detail=f"Archivo de test cases no encontrado en {path}"
+                    detail=f"Archivo de test cases no encontrado en {repository.path}"
                 )
-            with path.open("r", encoding="utf-8") as f:
-                all_test_cases = json.load(f)
-            request.test_cases = [c for c in all_test_cases if c.get("hu_id") == request.hu_id]
+            request.test_cases = repository.get_cases(request.hu_id)
             if not request.test_cases:
                 raise HTTPException(
                     status_code=404, 
                     detail=f"No se encontraron test cases para HU: {request.hu_id}"
                 )
-        # --- Generación con LLM ---
-        try:
-            prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-            chain = prompt | llm
-            # El input debe ser un string JSON legible
-            input_json = json.dumps(request.test_cases, indent=2, ensure_ascii=False)
-            gherkin_content = chain.invoke({"test_cases": input_json})
-            # Si la respuesta es un objeto, extraer el contenido
-            if hasattr(gherkin_content, 'content'):
-                gherkin_content = gherkin_content.content
-            if not isinstance(gherkin_content, str):
-                gherkin_content = str(gherkin_content)
-            return PGPResponse(
-                status="success",
-                hu_id=request.hu_id,
-                gherkin_content=gherkin_content,
-                message="PGP generado exitosamente por LLM"
-            )
-        except Exception as llm_exc:
-            logger.error(f"Error usando LLM: {llm_exc}. Usando generación clásica.")
-            # --- Fallback: generación clásica ---
-            gherkin_content = pgp_processor.generate_pgp_from_test_cases(request.test_cases)
-            return PGPResponse(
-                status="success",
-                hu_id=request.hu_id,
-                gherkin_content=gherkin_content,
-                message="PGP generado exitosamente por método clásico (fallback)"
-            )
+        # --- Caché de resultados del LLM ---
+        cache_key = None
+        if llm_cache is not None:
+            cache_key = make_cache_key(PROMPT_TEMPLATE, LLM_MODEL, LLM_TEMPERATURE, request.test_cases, PROMPT_INPUT_MODE,
+                                       LLM_PROVIDER, LLM_URL)
+            if bypass_cache:
+                llm_cache.record_bypass()
+            else:
+                cached = await llm_cache.aget(cache_key)
+                if cached is not None:
+                    logger.info(f"HU {request.hu_id} servida desde la caché del LLM")
+                    return PGPResponse(
+                        status="success",
+                        hu_id=request.hu_id,
+                        gherkin_content=cached,
+                        message="PGP generado exitosamente por LLM (caché)"
+                    )
+        # --- Generación (peticiones idénticas concurrentes comparten una sola llamada al LLM) ---
+        flight_key = make_flight_key(request.hu_id, request.test_cases)
+        return await hu_flight.do(
+            flight_key, lambda: generate_pgp(request.hu_id, request.test_cases, cache_key)
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -167,42 +257,215 @@ async def process_hu(request: HURequest):
             detail=f"Error interno procesando HU: {str(e)}"
         )
 
+async def generate_pgp(hu_id: str, test_cases: List[Dict], cache_key: Optional[str] = None) -> PGPResponse:
+    """
+    Genera el Gherkin con el LLM (o con el método clásico si el LLM falla) y guarda el
+    resultado en la caché. Se ejecuta a través de hu_flight, una vez por HU en curso.
+    """
+    try:
+        # Input del prompt: JSON compacto sin campos vacíos o con indent=2 (PROMPT_INPUT_MODE)
+        input_json = serialize_prompt_input(test_cases)
+        start = time.perf_counter()
+        # Con LLM_BATCH_WINDOW_MS > 0 la llamada comparte lote (abatch) con otras peticiones
+        with tracing.start_span("llm.invoke", model=LLM_MODEL, hu_id=hu_id), track_llm_call("invoke"):
+            result = await llm_batcher.invoke({"test_cases": input_json})
+            usage = llm_usage.record(extract_usage(result), len(input_json), (time.perf_counter() - start) * 1000)
+            tracing.set_attributes(**usage)
+        logger.info(f"HU {hu_id} generada por LLM: {usage}")
+        # Si la respuesta es un objeto, extraer el contenido
+        gherkin_content = result.content if hasattr(result, 'content') else result
+        if not isinstance(gherkin_content, str):
+            gherkin_content = str(gherkin_content)
+        if cache_key is not None:
+            await llm_cache.aset(cache_key, gherkin_content)
+        return PGPResponse(
+            status="success",
+            hu_id=hu_id,
+            gherkin_content=gherkin_content,
+            message="PGP generado exitosamente por LLM",
+            usage=usage
+        )
+    except Exception as llm_exc:
+        logger.error(f"Error usando LLM: {llm_exc}. Usando generación clásica.")
+        LLM_FALLBACKS.inc(mode="invoke")
+        # --- Fallback: generación clásica ---
+        with tracing.start_span("llm.fallback", hu_id=hu_id, error=str(llm_exc)):
+            gherkin_content = pgp_processor.generate_pgp_from_test_cases(test_cases)
+        return PGPResponse(
+            status="success",
+            hu_id=hu_id,
+            gherkin_content=gherkin_content,
+            message="PGP generado exitosamente por método clásico (fallback)"
+        )
+
+async def stream_process_hu(request: HURequest, bypass_cache: bool = False):
+    """
+    Versión en streaming de run_process_hu para tasks/sendSubscribe.
+    Emite eventos SSE "token" ({"text": ...}) a medida que el LLM genera y un evento
+    final "done" con el PGPResponse completo (o "error").
+    """
+    logger.info(f"Procesando HU en streaming: {request.hu_id}")
+    cache_key = None
+    if llm_cache is not None:
+        cache_key = make_cache_key(PROMPT_TEMPLATE, LLM_MODEL, LLM_TEMPERATURE, request.test_cases, PROMPT_INPUT_MODE,
+                                   LLM_PROVIDER, LLM_URL)
+        if bypass_cache:
+            llm_cache.record_bypass()
+        else:
+            cached = await llm_cache.aget(cache_key)
+            if cached is not None:
+                yield {"event": "token", "data": json.dumps({"text": cached}, ensure_ascii=False)}
+                final = PGPResponse(status="success", hu_id=request.hu_id, gherkin_content=cached,
+                                    message="PGP generado exitosamente por LLM (caché)")
+                yield {"event": "done", "data": final.model_dump_json()}
+                return
+
+    parts = []
+    token_usage = None
+    input_json = serialize_prompt_input(request.test_cases)
+    start = time.perf_counter()
+    try:
+        with tracing.start_span("llm.stream", model=LLM_MODEL, hu_id=request.hu_id), track_llm_call("stream"):
+            async for chunk in get_pgp_chain().astream({"test_cases": input_json}):
+                # El proveedor informa los tokens en el último fragmento
+                token_usage = extract_usage(chunk) or token_usage
+                text = chunk.content if hasattr(chunk, "content") else str(chunk)
+                if not text:
+                    continue
+                parts.append(text)
+                yield {"event": "token", "data": json.dumps({"text": text}, ensure_ascii=False)}
+    except Exception as llm_exc:
+        if parts:
+            # Ya se enviaron tokens: no se puede mezclar con la generación clásica
+            logger.error(f"Error en streaming del LLM para HU {request.hu_id}: {llm_exc}")
+            yield {"event": "error", "data": json.dumps({"code": -32603, "message": str(llm_exc)}, ensure_ascii=False)}
+            return
+        logger.error(f"Error usando LLM: {llm_exc}. Usando generación clásica.")
+        LLM_FALLBACKS.inc(mode="stream")
+        with tracing.start_span("llm.fallback", hu_id=request.hu_id, error=str(llm_exc)):
+            gherkin_content = pgp_processor.generate_pgp_from_test_cases(request.test_cases)
+        yield {"event": "token", "data": json.dumps({"text": gherkin_content}, ensure_ascii=False)}
+        final = PGPResponse(status="success", hu_id=request.hu_id, gherkin_content=gherkin_content,
+                            message="PGP generado exitosamente por método clásico (fallback)")
+        yield {"event": "done", "data": final.model_dump_json()}
+        return
+
+    gherkin_content = "".join(parts)
+    usage = llm_usage.record(token_usage, len(input_json), (time.perf_counter() - start) * 1000)
+    if cache_key is not None:
+        await llm_cache.aset(cache_key, gherkin_content)
+    final = PGPResponse(status="success", hu_id=request.hu_id, gherkin_content=gherkin_content,
+                        message="PGP generado exitosamente por LLM", usage=usage)
+    yield {"event": "done", "data": final.model_dump_json()}
+
+def parse_task_message(params: dict):
+    """
+    Extrae la lista de test cases del mensaje JSON-RPC.
+    Devuelve (test_cases, None) o (None, error JSON-RPC).
+    """
+    message = params.get("message", {})
+    text = ""
+    if isinstance(message, dict) and "parts" in message:
+        text = message["parts"][0]["text"]
+    else:
+        text = str(message)
+    try:
+        test_cases = json.loads(text)
+        if not isinstance(test_cases, list) or not all(isinstance(tc, dict) for tc in test_cases):
+            raise ValueError
+    except Exception:
+        return None, {"code": -32000, "message": "El mensaje debe ser una lista de diccionarios HU válidos"}
+    hu_id = test_cases[0].get("hu_id") if test_cases else None
+    if not hu_id:
+        return None, {"code": -32000, "message": "No se pudo extraer hu_id del mensaje"}
+    return test_cases, None
+
+async def execute_task(task_request: SendTaskRequest) -> dict:
+    """
+    Handler de los workers del TaskManager: genera el PGP de una tarea tasks/send.
+    """
+    test_cases = json.loads(task_request.params.message.parts[0].text)
+    metadata = task_request.params.metadata or {}
+    req = HURequest(hu_id=test_cases[0]["hu_id"], test_cases=test_cases, skill="pgp")
+    # Los workers de la cola no heredan el contexto de la petición: la traza llega en metadata
+    with tracing.start_span("task.execute", parent=tracing.extract_metadata(metadata),
+                            task_id=task_request.id, hu_id=req.hu_id):
+        resp = await run_process_hu(req, bypass_cache=bool(metadata.get("bypass_cache")))
+    return resp.model_dump()
+
+# Cola de tareas en proceso: tasks/send espera a que la tarea termine (como mucho
+# TASK_SEND_WAIT_SECONDS). Con varios workers el estado de las tareas se comparte para
+# que tasks/get funcione en cualquiera de ellos
+task_manager = InMemoryTaskManager(
+    execute_task,
+    shared_store=SharedTaskStore("pgp_agent_tasks") if shared_state_enabled() else None
+)
+
+# /metrics: peticiones HTTP y JSON-RPC, LLM, fallbacks y estadísticas de los componentes
+install_metrics(app, "pgp-agent", collectors={
+    "tasks": task_manager.stats,
+    "llm_batch": llm_batcher.stats,
+    "llm_usage": llm_usage.stats,
+    "singleflight": hu_flight.stats,
+    **({"llm_cache": llm_cache.stats} if llm_cache is not None else {}),
+})
+tracing.install_tracing(app, "pgp-agent")
+# /health/live y /health/ready (pendiente hasta que termina la precarga del LLM)
+readiness = install_health(app, "pgp-agent")
+
+@app.get("/tasks/stats")
+async def tasks_stats():
+    """Estado de la cola de tareas"""
+    return task_manager.stats()
+
 @app.get("/agent-card")
 async def get_agent_card():
     """Devuelve la AgentCard de este agente (REST)"""
     return AGENT_CARD
 
 @app.post("/jsonrpc")
-async def jsonrpc(request: dict):
+async def jsonrpc(request: dict, http_request: Request):
     method = request.get("method")
+    with track_jsonrpc(method) as outcome:
+        response = await dispatch_jsonrpc(method, request, http_request)
+        outcome["value"] = jsonrpc_outcome(response)
+    return response
+
+async def dispatch_jsonrpc(method: Optional[str], request: dict, http_request: Request):
     if method == "get_agent_card":
         return {"result": AGENT_CARD.model_dump()}
     elif method == "tasks/send":
-        params = request.get("params", {})
-        message = params.get("message", {})
-        text = ""
-        if isinstance(message, dict) and "parts" in message:
-            text = message["parts"][0]["text"]
-        else:
-            text = str(message)
+        # Se encola la tarea y se devuelve su id; el resultado se consulta con tasks/get
+        test_cases, error = parse_task_message(request.get("params", {}))
+        if error:
+            return {"error": error}
         try:
-            test_cases = json.loads(text)
-            if not isinstance(test_cases, list) or not all(isinstance(tc, dict) for tc in test_cases):
-                raise ValueError
-        except Exception:
-            return {"error": {"code": -32000, "message": "El mensaje debe ser una lista de diccionarios HU válidos"}}
-        hu_id = test_cases[0].get("hu_id") if test_cases else None
-        if not hu_id:
-            return {"error": {"code": -32000, "message": "No se pudo extraer hu_id del mensaje"}}
-        req = HURequest(hu_id=hu_id, test_cases=test_cases, skill="pgp")
-        resp = await process_hu(req)
-        if hasattr(resp, "model_dump"):
-            return {"result": resp.model_dump()}
-        else:
-            return {"result": resp}
+            send_request = SendTaskRequest(**request)
+        except ValidationError:
+            return {"error": {"code": -32600, "message": "Invalid Request"}}
+        if cache_bypass_requested(http_request.headers):
+            send_request.params.metadata = {**(send_request.params.metadata or {}), "bypass_cache": True}
+        response = await task_manager.on_send_task(send_request)
+        return response.model_dump(exclude_none=True)
+    elif method in ("tasks/get", "tasks/cancel"):
+        try:
+            if method == "tasks/get":
+                response = await task_manager.on_get_task(GetTaskRequest(**request))
+            else:
+                response = await task_manager.on_cancel_task(CancelTaskRequest(**request))
+        except ValidationError:
+            return {"error": {"code": -32602, "message": "Invalid params: se requiere params.id"}}
+        return response.model_dump(exclude_none=True)
+    elif method == "tasks/sendSubscribe":
+        test_cases, error = parse_task_message(request.get("params", {}))
+        if error:
+            return {"error": error}
+        req = HURequest(hu_id=test_cases[0]["hu_id"], test_cases=test_cases, skill="pgp")
+        return EventSourceResponse(
+            stream_process_hu(req, bypass_cache=cache_bypass_requested(http_request.headers))
+        )
     else:
         return {"error": {"code": -32601, "message": "Method not found"}}
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001) 
\ No newline at end of file
+    run_service(app, "agents.pgp_agent_service:app", 8001)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Generación masiva de Gherkin sin LLM: un fichero .feature por HU con PGPTargetAgent.
+
+Lee una exportación de casos de prueba (array JSON, NDJSON o .hus), agrupa los casos por
+HU y reparte las HUs entre varios procesos. Cada proceso abre el fichero de origen por su
+cuenta y lee solo los casos de sus HUs (por offset, o por mmap en .hus), así que a los
+workers solo se les envían posiciones, no los casos.
+
+Uso:
+    python -m agents.pgp_bulk data/test_cases.json salida/ --workers 8
+"""
+import os
+import re
+import json
+import hashlib
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from agents.task_manager import PGPTargetAgent
+from core.hu_store import HUStore, is_hu_store
+from core.hu_stream import iter_test_cases_with_offsets
+
+logger = logging.getLogger(__name__)
+
+PGP_BULK_WORKERS = int(os.getenv("PGP_BULK_WORKERS", str(os.cpu_count() or 1)))
+PGP_BULK_CHUNK_SIZE = int(os.getenv("PGP_BULK_CHUNK_SIZE", "2000"))
+
+_UNSAFE_FILENAME = re.compile(r"[^\w.-]")
+
+
+def feature_filename(hu_id: str) -> str:
+    """
+    Nombre del .feature de una HU. Si hay que sustituir caracteres o el hu_id tiene mayúsculas
+    se añade un hash corto del hu_id original ("HU/1" -> "HU_1~<hash>.feature"), para que no
+    coincida con el de "HU_1" ni, en sistemas de ficheros que no distinguen mayúsculas, con el
+    de "hu-1" (el "~" nunca aparece en un nombre sin hash).
+    """
+    safe = _UNSAFE_FILENAME.sub("_", hu_id)
+    if safe != hu_id or safe != safe.lower():
+        safe = f"{safe}~{hashlib.sha1(hu_id.encode('utf-8')).hexdigest()[:10]}"
+    return f"{safe}.feature"
+
+
+def group_offsets(source: str) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Recorre el origen en streaming y agrupa la posición de cada caso por hu_id.
+    """
+    groups: Dict[str, List[Tuple[int, int]]] = {}
+    for case, offset, length in iter_test_cases_with_offsets(source):
+        hu_id = case.get("hu_id")
+        if hu_id:
+            groups.setdefault(str(hu_id), []).append((offset, length))
+    return groups
+
+
+def _write_shard(source: str, out_dir: str, shard: list) -> Tuple[int, int]:
+    """
+    Worker: escribe los .feature de un bloque de HUs. shard es una lista de (hu_id, offset
+    del registro) (origen .hus) o de (hu_id, posiciones de sus casos) (origen JSON/NDJSON).
+    Devuelve (HUs, casos) escritos.
+    """
+    agent = PGPTargetAgent()
+    hus = cases_written = 0
+    store = HUStore(source, sequential=True) if is_hu_store(source) else None
+    src = None if store else open(source, "rb")
+    try:
+        for hu_id, position in shard:
+            if store:
+                test_cases = store.get_cases_at(position)
+            else:
+                test_cases = []
+                for offset, length in position:
+                    src.seek(offset)
+                    test_cases.append(json.loads(src.read(length)))
+            with open(os.path.join(out_dir, feature_filename(hu_id)), "w", encoding="utf-8") as out:
+                cases_written += agent.write_feature(hu_id, test_cases, out)
+            hus += 1
+    finally:
+        if store:
+            store.close()
+        if src:
+            src.close()
+    return hus, cases_written
+
+
+def run_bulk(source: str, out_dir: str, workers: int = PGP_BULK_WORKERS, chunk_size: int = PGP_BULK_CHUNK_SIZE) -> dict:
+    """
+    Genera un .feature por HU del origen en out_dir. Con workers=1 se ejecuta en el proceso actual.
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    if is_hu_store(source):
+        # Bloques contiguos en el orden del fichero: cada worker lee secuencialmente
+        store = HUStore(source)
+        items = store.records()
+        store.close()
+    else:
+        items = list(group_offsets(source).items())
+    index_seconds = time.perf_counter() - start
+
+    shards = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    hus = cases = 0
+    if workers <= 1:
+        for shard in shards:
+            h, c = _write_shard(source, out_dir, shard)
+            hus, cases = hus + h, cases + c
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_write_shard, source, out_dir, shard) for shard in shards]
+            for future in as_completed(futures):
+                h, c = future.result()
+                hus, cases = hus + h, cases + c
+    elapsed = time.perf_counter() - start
+    return {
+        "hus": hus,
+        "cases": cases,
+        "workers": workers,
+        "index_seconds": round(index_seconds, 2),
+        "seconds": round(elapsed, 2),
+        "cases_per_second": round(cases / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="casos de prueba en JSON, NDJSON o .hus")
+    parser.add_argument("out_dir", help="directorio de salida de los .feature")
+    parser.add_argument("--workers", type=int, default=PGP_BULK_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=PGP_BULK_CHUNK_SIZE, help="HUs por bloque enviado a cada worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = run_bulk(args.source, args.out_dir, args.workers, args.chunk_size)
+    logger.info(f"{result['hus']} .feature generados ({result['cases']} casos) en {result['seconds']}s: "
+                f"{result['cases_per_second']} casos/s con {result['workers']} procesos")
+
+
+if __name__ == "__main__":
+    main()
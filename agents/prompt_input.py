@@ -0,0 +1,37 @@
+# agents/prompt_input.py
+import os
+import json
+from typing import Any
+
+# "compact": sin campos vacíos ni espacios (menos tokens de prompt); "pretty": JSON con indent=2
+PROMPT_INPUT_MODE = os.getenv("PROMPT_INPUT_MODE", "compact").lower()
+
+_EMPTY = (None, "", [], {})
+
+
+def strip_empty(value: Any) -> Any:
+    """
+    Elimina de forma recursiva las claves con valores vacíos (None, "", [], {})
+    y recorta los espacios sobrantes de los textos.
+    """
+    if isinstance(value, dict):
+        cleaned = {k: strip_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if not any(v is e or v == e for e in _EMPTY)}
+    if isinstance(value, list):
+        cleaned = [strip_empty(v) for v in value]
+        return [v for v in cleaned if not any(v is e or v == e for e in _EMPTY)]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def serialize_prompt_input(test_cases: Any, mode: str = PROMPT_INPUT_MODE) -> str:
+    """
+    Serializa los casos de prueba que se insertan en el prompt del LLM.
+    Args:
+        test_cases: Lista de casos de prueba de la HU.
+        mode (str): "compact" o "pretty".
+    """
+    if mode == "pretty":
+        return json.dumps(test_cases, indent=2, ensure_ascii=False)
+    return json.dumps(strip_empty(test_cases), ensure_ascii=False, separators=(",", ":"))
@@ -1,52 +1,273 @@
 # agents/task_manager.py
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, TextIO, Tuple
+
+# Valores literales que pueden pasar a columnas de Examples: texto entre comillas y números
+_LITERAL = re.compile(r"'([^']*)'|\"([^\"]*)\"|(?<![\w<-])(\d+(?:[.,]\d+)?)(?![\w>-])")
+# Palabra previa al literal, usada como nombre del parámetro (p.ej. "usuario" en "el usuario 'x'")
+_PARAM_NAME = re.compile(r"(\w+)\W*$")
+# Texto que en un Scenario Outline se leería como parámetro de Examples
+_PLACEHOLDER = re.compile(r"<[^<>]*>")
+_WHITESPACE = re.compile(r"\s+")
+
 
 # Esta clase manejará la lógica para transformar casos de prueba en PGPs en lenguaje Gherkin
 class PGPTargetAgent:
     def __init__(self):
         pass
 
-    def generate_pgp_from_test_cases(self, test_cases: list[dict]) -> str:
-        scenarios = []
+    def render_scenario(self, case: dict) -> str:
+        """
+        Genera el escenario Gherkin de un caso de prueba.
+        """
+        hu_id = case.get("hu_id", "")
+        title = case.get("title", "")
+        description = case.get("description", "")
+        preconditions = case.get("preconditions", [])
+        steps = case.get("steps", [])
+        expected_result = case.get("expected_result", "")
+
+        lines = []
+
+        # Comentarios con metadata
+        if hu_id or title:
+            lines.append(f"# {hu_id} - {title}")
+        if description:
+            lines.append(f"# {description}")
+        lines.append("")  # línea vacía
+
+        lines.append(f"Scenario: {title}")
+
+        # GIVEN: precondiciones
+        if preconditions:
+            lines.append(f"  Given {preconditions[0]}")
+            lines.extend(f"  And {pre}" for pre in preconditions[1:])
+
+        # WHEN: pasos
+        if steps:
+            lines.append(f"  When {steps[0]}")
+            lines.extend(f"  And {step}" for step in steps[1:])
+
+        # THEN: resultado esperado
+        if expected_result:
+            lines.append(f"  Then {expected_result}")
+
+        return "\n".join(lines)
 
+    def iter_scenarios(self, test_cases: Iterable[dict]) -> Iterator[str]:
+        """
+        Genera los escenarios uno a uno, sin acumularlos en memoria.
+        Acepta cualquier iterable (p.ej. core.hu_stream.iter_test_cases).
+        """
         for case in test_cases:
-            hu_id = case.get("hu_id", "")
-            title = case.get("title", "")
-            description = case.get("description", "")
-            preconditions = case.get("preconditions", [])
-            steps = case.get("steps", [])
-            expected_result = case.get("expected_result", "")
+            yield self.render_scenario(case)
 
-            lines = []
+    def write_pgp(self, test_cases: Iterable[dict], out: TextIO) -> int:
+        """
+        Escribe los escenarios directamente en un fichero (mismo formato que
+        generate_pgp_from_test_cases). Devuelve el número de escenarios escritos.
+        """
+        count = 0
+        for scenario in self.iter_scenarios(test_cases):
+            if count:
+                out.write("\n\n")
+            out.write(scenario)
+            count += 1
+        return count
 
-            # Comentarios con metadata
-            if hu_id or title:
-                lines.append(f"# {hu_id} - {title}")
-            if description:
-                lines.append(f"# {description}")
-            lines.append("")  # línea vacía
+    # --- Ficheros .feature completos (Feature, Background, Scenario Outline) ---
 
-            lines.append(f"Scenario: {title}")
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _split_literals(text: str) -> Tuple[str, Tuple[str, ...], Tuple[str, ...]]:
+        """
+        Separa un texto en plantilla + literales. Devuelve (plantilla con {n}, valores, nombres).
+        Los pasos se repiten mucho entre casos y HUs, por eso se memoriza.
+        """
+        values, names = [], []
+        escaped = text.replace("{", "{{").replace("}", "}}")
 
-            # GIVEN: precondiciones
-            if preconditions:
-                lines.append(f"  Given {preconditions[0]}")
-                for pre in preconditions[1:]:
-                    lines.append(f"  And {pre}")
+        def replace(match):
+            quote = "'" if match.group(1) is not None else '"' if match.group(2) is not None else ""
+            value = next(g for g in match.groups() if g is not None)
+            prefix = _PARAM_NAME.search(escaped[:match.start()])
+            names.append(prefix.group(1).lower() if prefix else "valor")
+            values.append(value)
+            return f"{quote}{{{len(values) - 1}}}{quote}"
 
-            # WHEN: pasos
-            if steps:
-                lines.append(f"  When {steps[0]}")
-                for step in steps[1:]:
-                    lines.append(f"  And {step}")
+        template = _LITERAL.sub(replace, escaped)
+        return template, tuple(values), tuple(names)
 
-            # THEN: resultado esperado
-            if expected_result:
-                lines.append(f"  Then {expected_result}")
+    def _case_template(self, case: dict, shared: List[str]):
+        """
+        Plantilla de un caso (título, precondiciones no compartidas, pasos y resultado) con
+        sus literales extraídos, para detectar casos que solo cambian en valores concretos.
+        """
+        parts = [("title", case.get("title", ""))]
+        parts += [("given", pre) for pre in case.get("preconditions", []) if pre not in shared]
+        parts += [("when", step) for step in case.get("steps", [])]
+        if case.get("expected_result"):
+            parts.append(("then", case["expected_result"]))
+        templates, values, names = [], [], []
+        for kind, text in parts:
+            template, text_values, text_names = self._split_literals(text)
+            templates.append((kind, template, len(values), len(text_values)))
+            values += text_values
+            names += text_names
+        return tuple((kind, template) for kind, template, _, _ in templates), templates, values, names
 
-            scenarios.append("\n".join(lines))
+    @staticmethod
+    def _steps_block(given: List[str], when: List[str], then: str, indent: str = "    ") -> List[str]:
+        lines = []
+        for keyword, items in (("Given", given), ("When", when), ("Then", [then] if then else [])):
+            for i, item in enumerate(items):
+                lines.append(f"{indent}{keyword if i == 0 else 'And'} {item}")
+        return lines
 
-        return "\n\n".join(scenarios)
+    @staticmethod
+    def _examples_table(header: List[str], rows: List[List[str]], indent: str = "      ") -> List[str]:
+        rows = [[value.replace("\\", "\\\\").replace("|", "\\|") for value in row] for row in rows]
+        widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+        return [indent + "| " + " | ".join(cell.ljust(w) for cell, w in zip(row, widths)) + " |"
+                for row in [header] + rows]
 
+    def _scenario_block(self, case: dict, shared: List[str], comment: bool) -> List[str]:
+        """Scenario de un caso (con su id como tag y, si se pide, su descripción como comentario)."""
+        lines = []
+        if comment and case.get("description"):
+            lines.append(f"  # {case['description']}")
+        if case.get("id"):
+            lines.append("  @" + _WHITESPACE.sub("_", str(case["id"])))
+        given = [pre for pre in case.get("preconditions", []) if pre not in shared]
+        lines.append(f"  Scenario: {case.get('title', '')}")
+        lines += self._steps_block(given, case.get("steps", []), case.get("expected_result", ""))
+        return lines
 
+    @staticmethod
+    def _outline_columns(rows: List[list], names: List[str], reserved: Tuple[str, ...] = ()):
+        """
+        Columnas de Examples: posiciones cuyo valor cambia entre casos y valores fijos con
+        "<...>" (en el Outline se leerían como parámetro). Las posiciones con los mismos
+        valores en todos los casos se fusionan en una sola columna.
+        Devuelve (posición -> columna, columna -> primera posición, hay valores que cambian).
+        """
+        columns: Dict[tuple, str] = {}          # valores de la columna -> nombre
+        column_position: Dict[str, int] = {}     # nombre -> primera posición con esos valores
+        position_to_column: Dict[int, str] = {}
+        used_names: Dict[str, int] = {name: 1 for name in reserved}
+        varies = False
+        for pos in range(len(rows[0])):
+            column_values = tuple(row[pos] for row in rows)
+            if len(set(column_values)) == 1:
+                if not _PLACEHOLDER.search(column_values[0]):
+                    continue
+            else:
+                varies = True
+            if column_values not in columns:
+                name = names[pos]
+                used_names[name] = used_names.get(name, 0) + 1
+                name = name if used_names[name] == 1 else f"{name}{used_names[name]}"
+                columns[column_values] = name
+                column_position[name] = pos
+            position_to_column[pos] = columns[column_values]
+        return position_to_column, column_position, varies
 
+    def render_feature(self, hu_id: str, test_cases: List[dict]) -> str:
+        """
+        Genera un fichero .feature completo para una HU:
+          - Feature con la descripción de la HU
+          - Background con las precondiciones comunes a todos los casos (si hay varios)
+          - Scenario Outline + Examples para los casos que solo difieren en valores
+            literales (texto entre comillas o números); el id de cada caso pasa a una
+            columna y las filas repetidas se eliminan
+          - Scenario (con el id del caso como tag) para el resto, incluidos los grupos en
+            los que ningún valor cambia o cuyo texto fijo contiene "<...>"
+        """
+        cases = [c for c in test_cases if isinstance(c, dict)]
+        lines = [f"Feature: {hu_id}" + (f" - {cases[0].get('title', '')}" if len(cases) == 1 else "")]
+        descriptions = {c.get("description", "") for c in cases}
+        if len(descriptions) == 1 and next(iter(descriptions)):
+            lines.append(f"  {next(iter(descriptions))}")
+        comment = len(descriptions) > 1
 
+        # Precondiciones presentes en todos los casos, en el orden del primero
+        shared: List[str] = []
+        if len(cases) > 1:
+            shared = [pre for pre in cases[0].get("preconditions", [])
+                      if all(pre in c.get("preconditions", []) for c in cases[1:])]
+        if shared:
+            lines += ["", "  Background:"] + self._steps_block(shared, [], "")
+
+        # Agrupar los casos por plantilla (y descripción), conservando el orden de aparición
+        groups: Dict[tuple, List[Tuple[dict, list, list, list]]] = {}
+        for case in cases:
+            key, templates, values, names = self._case_template(case, shared)
+            description = case.get("description", "") if comment else ""
+            groups.setdefault((description, key), []).append((case, templates, values, names))
+
+        # Conjuntos para descartar duplicados sin recorrer lo ya emitido
+        seen_scenarios: set = set()
+        for group in groups.values():
+            case, templates, _, names = group[0]
+            rows = [values for _, _, values, _ in group]
+            with_ids = any(c.get("id") for c, _, _, _ in group)
+            position_to_column, column_position, varies = (
+                self._outline_columns(rows, names, ("id",) if with_ids else ())
+                if len(group) > 1 and rows[0] else ({}, {}, False)
+            )
+            if not varies or any(_PLACEHOLDER.search(template) for _, template, _, _ in templates):
+                for case, _, _, _ in group:
+                    block = self._scenario_block(case, shared, comment)
+                    if tuple(block) not in seen_scenarios:
+                        seen_scenarios.add(tuple(block))
+                        lines += [""] + block
+                continue
+
+            rendered: Dict[str, List[str]] = {}
+            for kind, template, start, count in templates:
+                args = [f"<{position_to_column[pos]}>" if pos in position_to_column else rows[0][pos]
+                        for pos in range(start, start + count)]
+                rendered.setdefault(kind, []).append(template.format(*args))
+            lines.append("")
+            if comment and case.get("description"):
+                lines.append(f"  # {case['description']}")
+            lines.append(f"  Scenario Outline: {rendered['title'][0]}")
+            lines += self._steps_block(rendered.get("given", []), rendered.get("when", []),
+                                       (rendered.get("then") or [""])[0])
+
+            header = list(column_position)
+            examples, seen_rows = [], set()
+            for (case, _, _, _), row in zip(group, rows):
+                cells = [row[column_position[name]] for name in header]
+                if with_ids:
+                    cells.insert(0, str(case.get("id", "")))
+                if tuple(cells) not in seen_rows:
+                    seen_rows.add(tuple(cells))
+                    examples.append(cells)
+            header = (["id"] if with_ids else []) + header
+            lines += ["", "    Examples:"] + self._examples_table(header, examples)
+
+        return "\n".join(lines) + "\n"
+
+    def iter_features(self, test_cases: Iterable[dict]) -> Iterator[Tuple[str, str]]:
+        """
+        Agrupa los casos por hu_id (en orden de aparición) y genera (hu_id, contenido .feature).
+        """
+        by_hu: Dict[str, List[dict]] = {}
+        for case in test_cases:
+            by_hu.setdefault(str(case.get("hu_id", "")), []).append(case)
+        for hu_id, cases in by_hu.items():
+            yield hu_id, self.render_feature(hu_id, cases)
+
+    def write_feature(self, hu_id: str, test_cases: Iterable[dict], out: TextIO) -> int:
+        """
+        Escribe el fichero .feature completo de una HU (ver render_feature).
+        Devuelve el número de casos de prueba procesados.
+        """
+        cases = list(test_cases)
+        out.write(self.render_feature(hu_id, cases))
+        return len(cases)
+
+    def generate_pgp_from_test_cases(self, test_cases: list[dict]) -> str:
+        return "\n\n".join(self.iter_scenarios(test_cases))
@@ -0,0 +1,61 @@
+"""
+Respuesta JSON del gateway: se serializa una sola vez con orjson (si está instalado)
+y solo se indenta cuando el cliente lo pide.
+"""
+import json
+from contextvars import ContextVar
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+# Preferencia de formato de la petición en curso
+_pretty_json: ContextVar[bool] = ContextVar("pretty_json", default=False)
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+def wants_pretty_json(request: Request) -> bool:
+    """
+    El cliente pide JSON indentado con ?pretty=1 o con un parámetro en Accept,
+    p.ej. "Accept: application/json; pretty=1" o "Accept: application/json; indent=2".
+    """
+    if request.query_params.get("pretty", "").lower() in TRUE_VALUES:
+        return True
+    for media_range in request.headers.get("accept", "").split(","):
+        params = [p.strip().lower() for p in media_range.split(";")[1:]]
+        for param in params:
+            name, _, value = param.partition("=")
+            if name == "pretty" and value in TRUE_VALUES:
+                return True
+            if name == "indent" and value not in ("", "0"):
+                return True
+    return False
+
+
+async def pretty_json_preference(request: Request):
+    """
+    Dependencia global: guarda la preferencia de formato para FastJSONResponse.
+    Es asíncrona para ejecutarse en el mismo contexto que la serialización de la respuesta.
+    """
+    _pretty_json.set(wants_pretty_json(request))
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse que serializa una única vez; compacta por defecto e indentada bajo demanda.
+    """
+    def render(self, content) -> bytes:
+        pretty = _pretty_json.get()
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+            if pretty:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(content, option=option)
+        if pretty:
+            return json.dumps(content, ensure_ascii=False, indent=2).encode("utf-8")
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
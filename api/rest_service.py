@@ -1,14 +1,22 @@
 """
 API REST Service - Punto de entrada para consumir desde Postman
 """
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+import json
 import httpx
 import logging
 import os
 from dotenv import load_dotenv
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from api.responses import FastJSONResponse, pretty_json_preference
+from core.metrics import MeteredTransport, install_metrics
+from core.tracing import ainject_headers, install_tracing
+from core.health import install_health
+from core.serve import run_service
 
 # Cargar variables de entorno
 load_dotenv()
@@ -20,68 +28,134 @@ logger = logging.getLogger(__name__)
 # Configuración de la URL del orquestador (puede venir de variable de entorno)
 ORCHESTRATOR_URL = os.getenv("ORCHESTRATOR_URL", "http://localhost:8003")
 
+# Configuración del cliente HTTP compartido hacia el orquestador
+ORCHESTRATOR_TIMEOUT = float(os.getenv("ORCHESTRATOR_TIMEOUT", "30"))
+# Espera máxima de una generación en /api/generate-pgp, por debajo de ORCHESTRATOR_TIMEOUT:
+# si el LLM tarda más, se responde 202 con el task_id en lugar de agotar el timeout
+GATEWAY_WAIT_SECONDS = float(os.getenv("GATEWAY_WAIT_SECONDS", str(max(ORCHESTRATOR_TIMEOUT - 5, 1))))
+# Tiempo máximo de espera entre resultados de un lote (cada HU puede implicar una llamada al LLM)
+ORCHESTRATOR_BATCH_TIMEOUT = float(os.getenv("ORCHESTRATOR_BATCH_TIMEOUT", "300"))
+GATEWAY_HTTP_MAX_CONNECTIONS = int(os.getenv("GATEWAY_HTTP_MAX_CONNECTIONS", "100"))
+GATEWAY_HTTP_KEEPALIVE = int(os.getenv("GATEWAY_HTTP_KEEPALIVE", "20"))
+GATEWAY_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_HTTP_KEEPALIVE_EXPIRY", "30"))
+GATEWAY_HTTP2 = os.getenv("GATEWAY_HTTP2", "false").lower() in ("1", "true", "yes")
+
+
+def build_orchestrator_client() -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP de larga vida (keep-alive) usado para hablar con el orquestador.
+    """
+    limits = httpx.Limits(
+        max_connections=GATEWAY_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=GATEWAY_HTTP_KEEPALIVE,
+        keepalive_expiry=GATEWAY_HTTP_KEEPALIVE_EXPIRY
+    )
+    http2 = GATEWAY_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("GATEWAY_HTTP2 activo pero falta el paquete 'h2' (httpx[http2]); se usa HTTP/1.1")
+            http2 = False
+    # El transporte registra la latencia del salto gateway -> orquestador (/metrics)
+    transport = MeteredTransport(httpx.AsyncHTTPTransport(limits=limits, http2=http2), "orchestrator")
+    # El event hook propaga la traza de la petición (cabecera traceparent) al orquestador
+    return httpx.AsyncClient(timeout=ORCHESTRATOR_TIMEOUT, transport=transport,
+                             event_hooks={"request": [ainject_headers]})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http_client = build_orchestrator_client()
+    try:
+        yield
+    finally:
+        await app.state.http_client.aclose()
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
+
 # Crear la aplicación FastAPI
 app = FastAPI(
     title="PGP Generator API",
     description="API REST para generar PGP desde Historias de Usuario",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Serialización única (orjson); indentado solo con ?pretty=1 o Accept: application/json; pretty=1
+    default_response_class=FastJSONResponse,
+    dependencies=[Depends(pretty_json_preference)]
 )
-
-# Configurar JSON con indentación para respuestas más legibles
-@app.middleware("http")
-async def format_json_response(request, call_next):
-    response = await call_next(request)
-    if hasattr(response, 'body') and response.headers.get("content-type", "").startswith("application/json"):
-        # Reemplazar \n con saltos de línea reales para mejor legibilidad
-        import json
-        body = json.loads(response.body.decode())
-        if "gherkin_content" in body and body["gherkin_content"]:
-            # Mantener los \n como están, pero asegurar que el JSON esté bien formateado
-            pass
-        response = JSONResponse(
-            content=body,
-            status_code=response.status_code,
-            headers=dict(response.headers)
-        )
-    return response
+install_metrics(app, "pgp-api-rest")
+install_tracing(app, "pgp-api-rest")
+install_health(app, "pgp-api-rest")
 
 # Modelos para la API
 class GeneratePGPRequest(BaseModel):
     hu_id: str
+    # False: responde de inmediato (202) con el task_id, que se consulta en GET /api/tasks/{task_id}
+    wait: bool = True
 
 class GeneratePGPResponse(BaseModel):
     status: str
+    hu_id: Optional[str] = None
+    gherkin_content: Optional[str] = None
+    message: Optional[str] = None
+    # Presente mientras la generación sigue en curso (status "submitted")
+    task_id: Optional[str] = None
+
+class GeneratePGPBatchRequest(BaseModel):
+    hu_ids: List[str]
+    stream: bool = False
+
+class GeneratePGPBatchItem(BaseModel):
     hu_id: str
+    skill: Optional[str] = None
+    status: str
     gherkin_content: Optional[str] = None
     message: Optional[str] = None
 
+class GeneratePGPBatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[GeneratePGPBatchItem]
+
 @app.get("/health")
 async def health_check():
     """Endpoint de salud del servicio"""
     return {"status": "healthy", "service": "pgp-api-rest"}
 
+def to_generate_response(router_response: dict, response: Response, hu_id: Optional[str] = None) -> GeneratePGPResponse:
+    """
+    Convierte la respuesta del orquestador; las generaciones aún en curso se responden con 202.
+    """
+    status = router_response.get("status", "error")
+    if status == "submitted":
+        response.status_code = 202
+    return GeneratePGPResponse(
+        status=status,
+        hu_id=router_response.get("hu_id") or hu_id,
+        gherkin_content=router_response.get("gherkin_content"),
+        message=router_response.get("message"),
+        task_id=router_response.get("task_id")
+    )
+
 @app.post("/api/generate-pgp", response_model=GeneratePGPResponse)
-async def generate_pgp(request: GeneratePGPRequest):
+async def generate_pgp(request: GeneratePGPRequest, response: Response, client: httpx.AsyncClient = Depends(get_http_client)):
     """
-    Genera PGP (Gherkin) desde una Historia de Usuario
+    Genera PGP (Gherkin) desde una Historia de Usuario.
+    Si la generación no termina en GATEWAY_WAIT_SECONDS (o con "wait": false) responde 202
+    con status "submitted" y el task_id para consultarla en GET /api/tasks/{task_id}.
     """
     try:
         logger.info(f"Generando PGP para HU: {request.hu_id}")
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{ORCHESTRATOR_URL}/route-hu",
-                json=request.model_dump()
-            )
-            print(f"[LangGraph] Response: {response.json()}")  
-            response.raise_for_status()
-            router_response = response.json()
-            gherkin_content = router_response.get("gherkin_content", "")
-            return GeneratePGPResponse(
-                status=router_response.get("status", "error"),
-                hu_id=request.hu_id,
-                gherkin_content=gherkin_content,
-                message=router_response.get("message")
-            )
+        orchestrator_response = await client.post(
+            f"{ORCHESTRATOR_URL}/route-hu",
+            json={"hu_id": request.hu_id, "wait_seconds": GATEWAY_WAIT_SECONDS if request.wait else 0}
+        )
+        orchestrator_response.raise_for_status()
+        return to_generate_response(orchestrator_response.json(), response, request.hu_id)
     except httpx.HTTPStatusError as e:
         logger.error(f"Error HTTP del orquestador: {e.response.status_code} - {e.response.text}")
         if e.response.status_code == 404:
@@ -100,6 +174,127 @@ async def generate_pgp(request: GeneratePGPRequest):
             detail=f"Error interno generando PGP: {str(e)}"
         )
 
+@app.get("/api/tasks/{task_id}", response_model=GeneratePGPResponse)
+async def get_task(task_id: str, response: Response, wait_seconds: float = 0,
+                   client: httpx.AsyncClient = Depends(get_http_client)):
+    """
+    Estado de una generación en curso. Con wait_seconds (como mucho GATEWAY_WAIT_SECONDS)
+    se responde en cuanto termina.
+    """
+    return await proxy_task(client, "GET", task_id, response,
+                            params={"wait_seconds": min(max(wait_seconds, 0), GATEWAY_WAIT_SECONDS)})
+
+@app.delete("/api/tasks/{task_id}", response_model=GeneratePGPResponse)
+async def cancel_task(task_id: str, response: Response, client: httpx.AsyncClient = Depends(get_http_client)):
+    """Cancela una generación en curso."""
+    return await proxy_task(client, "DELETE", task_id, response)
+
+async def proxy_task(client: httpx.AsyncClient, method: str, task_id: str, response: Response, params: Optional[dict] = None):
+    try:
+        orchestrator_response = await client.request(method, f"{ORCHESTRATOR_URL}/tasks/{task_id}", params=params)
+    except Exception as e:
+        logger.error(f"Error conectando con el orquestador para la tarea {task_id}: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Error conectando con el orquestador: {str(e)}")
+    if orchestrator_response.status_code != 200:
+        raise HTTPException(status_code=orchestrator_response.status_code,
+                            detail=orchestrator_response.json().get("detail", orchestrator_response.text)
+                            if orchestrator_response.headers.get("content-type", "").startswith("application/json")
+                            else orchestrator_response.text)
+    return to_generate_response(orchestrator_response.json(), response)
+
+@app.post("/api/generate-pgp/stream")
+async def generate_pgp_stream(request: GeneratePGPRequest, client: httpx.AsyncClient = Depends(get_http_client)):
+    """
+    Genera PGP (Gherkin) en streaming: reenvía tal cual el SSE del orquestador
+    (eventos "route", "token", "done" y "error").
+    """
+    logger.info(f"Generando PGP en streaming para HU: {request.hu_id}")
+    orchestrator_request = client.build_request(
+        "POST",
+        f"{ORCHESTRATOR_URL}/route-hu/stream",
+        json=request.model_dump()
+    )
+    try:
+        response = await client.send(orchestrator_request, stream=True)
+    except Exception as e:
+        logger.error(f"Error conectando con el orquestador para HU {request.hu_id}: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Error conectando con el orquestador: {str(e)}")
+
+    if response.status_code != 200:
+        body = (await response.aread()).decode("utf-8", errors="replace")
+        await response.aclose()
+        logger.error(f"Error HTTP del orquestador: {response.status_code} - {body}")
+        if response.status_code == 404:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No hay agente disponible para la HU '{request.hu_id}'"
+            )
+        raise HTTPException(status_code=response.status_code, detail=f"Error del orquestador: {body}")
+
+    return StreamingResponse(
+        response.aiter_raw(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(response.aclose)
+    )
+
+@app.post("/api/generate-pgp/batch", response_model=GeneratePGPBatchResponse)
+async def generate_pgp_batch(
+    request: GeneratePGPBatchRequest,
+    http_request: Request,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """
+    Genera PGP para un lote de HUs. El orquestador agrupa por skill y reparte en paralelo.
+    Con "stream": true (o "Accept: application/x-ndjson") se devuelve NDJSON, una línea por
+    HU en cuanto termina; si no, un único documento JSON con todos los resultados.
+    """
+    logger.info(f"Generando PGP en lote para {len(request.hu_ids)} HUs")
+    stream = request.stream or "application/x-ndjson" in http_request.headers.get("accept", "")
+    orchestrator_request = client.build_request(
+        "POST",
+        f"{ORCHESTRATOR_URL}/route-hu/batch",
+        json={"hu_ids": request.hu_ids},
+        timeout=httpx.Timeout(ORCHESTRATOR_TIMEOUT, read=ORCHESTRATOR_BATCH_TIMEOUT)
+    )
+    try:
+        response = await client.send(orchestrator_request, stream=True)
+    except Exception as e:
+        logger.error(f"Error conectando con el orquestador para el lote: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Error conectando con el orquestador: {str(e)}")
+
+    if response.status_code != 200:
+        body = (await response.aread()).decode("utf-8", errors="replace")
+        await response.aclose()
+        logger.error(f"Error HTTP del orquestador: {response.status_code} - {body}")
+        raise HTTPException(status_code=response.status_code, detail=f"Error del orquestador: {body}")
+
+    if stream:
+        return StreamingResponse(
+            response.aiter_raw(),
+            media_type="application/x-ndjson",
+            background=BackgroundTask(response.aclose)
+        )
+
+    results = []
+    try:
+        async for line in response.aiter_lines():
+            if line.strip():
+                results.append(GeneratePGPBatchItem(**json.loads(line)))
+    except Exception as e:
+        logger.error(f"Error leyendo el lote del orquestador: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Error leyendo la respuesta del orquestador: {str(e)}")
+    finally:
+        await response.aclose()
+
+    succeeded = sum(1 for r in results if r.status == "success")
+    return GeneratePGPBatchResponse(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
+
 # Elimina los endpoints GET que requerían skill
 
 @app.get("/")
@@ -110,11 +305,17 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /api/generate-pgp": "Generar PGP desde HU (JSON)",
+            "POST /api/generate-pgp/stream": "Generar PGP desde HU en streaming (SSE)",
+            "POST /api/generate-pgp/batch": "Generar PGP para un lote de HUs (JSON o NDJSON)",
             "GET /api/generate-pgp/{hu_id}": "Generar PGP desde HU (path parameter)",
-            "GET /health": "Estado del servicio"
+            "GET /api/tasks/{task_id}": "Estado de una generación en curso (202 de /api/generate-pgp)",
+            "DELETE /api/tasks/{task_id}": "Cancelar una generación en curso",
+            "GET /health": "Estado del servicio",
+            "GET /health/live": "Liveness: el proceso responde",
+            "GET /health/ready": "Readiness: tareas de arranque terminadas",
+            "GET /metrics": "Métricas en formato Prometheus"
         }
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    run_service(app, "api.rest_service:app", 8000)
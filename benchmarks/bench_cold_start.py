@@ -0,0 +1,176 @@
+"""
+Arranque en frío de los servicios: tiempo de importación (-X importtime) y tiempo hasta
+que responden /health/live y /health/ready.
+
+Para cada servicio:
+  - importa el módulo en un proceso nuevo con `python -X importtime` y muestra el total y
+    los paquetes de primer nivel más caros (mejor de --repeat ejecuciones)
+  - lo arranca con uvicorn y mide, desde el lanzamiento del proceso, cuándo responde
+    /health/live y cuándo /health/ready (en versiones sin esos endpoints se usa /health)
+
+El orquestador se arranca con un agente que acepta la conexión y no responde nunca (como
+un contenedor que aún está arrancando), para medir si el descubrimiento bloquea el arranque.
+
+Con --source se mide otro checkout del repositorio, p.ej. para comparar con la versión
+anterior:
+    git worktree add /tmp/base HEAD~1
+    python -m benchmarks.bench_cold_start --source /tmp/base
+    python -m benchmarks.bench_cold_start
+
+Uso:
+    python -m benchmarks.bench_cold_start [--repeat 3] [--top 5] [--json cold.json]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from benchmarks.bench_e2e import SERVICES
+from benchmarks.common import free_port
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def stalled_agent() -> str:
+    """Servidor TCP que acepta conexiones y no responde: el descubrimiento espera su timeout."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(64)
+    held = []
+
+    def accept():
+        while True:
+            conn, _ = server.accept()
+            held.append(conn)
+
+    threading.Thread(target=accept, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}"
+
+
+def service_env(source: str, agent_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": source,
+        "AGENT_URLS": agent_url,
+        "TRACING_EXPORTER": "none",
+        # Valores ficticios: versiones anteriores creaban el cliente de Azure al importar
+        "AZURE_OPENAI_ENDPOINT": env.get("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com/"),
+        "AZURE_OPENAI_API_KEY": env.get("AZURE_OPENAI_API_KEY", "dummy"),
+        "AZURE_OPENAI_DEPLOYMENT": env.get("AZURE_OPENAI_DEPLOYMENT", "dummy"),
+        "AZURE_OPENAI_API_VERSION": env.get("AZURE_OPENAI_API_VERSION", "2023-05-15"),
+    })
+    return env
+
+
+def import_profile(module: str, source: str, env: dict, repeat: int, top: int) -> dict:
+    """
+    Mejor de `repeat` importaciones del módulo. Devuelve el total y los paquetes de primer
+    nivel con más tiempo acumulado (todos sus submódulos incluidos).
+    """
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=source, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"No se pudo importar {module}:\n{proc.stderr[-2000:]}")
+        total, packages = 0, {}
+        for line in proc.stderr.splitlines():
+            match = _IMPORTTIME.match(line)
+            if not match:
+                continue
+            cumulative, name = int(match.group(2)), match.group(4)
+            if name == module:
+                total = cumulative
+            root = name.split(".")[0]
+            # El primer módulo importado de cada paquete no es siempre la raíz: se suma el tiempo propio
+            packages[root] = packages.get(root, 0) + int(match.group(1))
+        if best is None or total < best[0]:
+            best = (total, packages)
+    total, packages = best
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"import_ms": round(total / 1000, 1),
+            "heaviest": [{"package": name, "ms": round(us / 1000, 1)} for name, us in heaviest]}
+
+
+def startup_profile(target: str, source: str, env: dict, timeout: float = 60.0) -> dict:
+    """
+    Lanza el servicio y mide cuándo responden /health/live y /health/ready (o /health).
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=source, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    result = {"live_s": None, "ready_s": None}
+    paths = {"live_s": "/health/live", "ready_s": "/health/ready"}
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - start < timeout and None in result.values():
+                if proc.poll() is not None:
+                    raise RuntimeError(f"{target} terminó al arrancar:\n{proc.stderr.read().decode()[-2000:]}")
+                for key, path in paths.items():
+                    if result[key] is not None:
+                        continue
+                    try:
+                        response = client.get(url + path)
+                        if response.status_code == 404:
+                            # Versión sin liveness/readiness: se usa /health
+                            paths[key] = path = "/health"
+                            response = client.get(url + path)
+                    except httpx.HTTPError:
+                        break
+                    if response.status_code == 200:
+                        result[key] = round(time.perf_counter() - start, 3)
+                time.sleep(0.01)
+        result["endpoints"] = sorted(set(paths.values()))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=os.getcwd(), help="raíz del checkout a medir")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="paquetes más caros a mostrar por servicio")
+    parser.add_argument("--json", help="guarda el resultado en este fichero")
+    args = parser.parse_args()
+
+    source = os.path.abspath(args.source)
+    env = service_env(source, stalled_agent())
+    results = {}
+    for name, target in SERVICES:
+        module = target.split(":")[0]
+        results[name] = {**import_profile(module, source, env, args.repeat, args.top),
+                         **startup_profile(target, source, env)}
+
+    print(f"Checkout: {source}  Python {sys.version.split()[0]}  CPUs: {os.cpu_count()}")
+    print(f"\n{'servicio':<13} {'import ms':>10} {'live s':>8} {'ready s':>8}  endpoints")
+    for name, data in results.items():
+        live = f"{data['live_s']:.2f}" if data["live_s"] is not None else "-"
+        ready = f"{data['ready_s']:.2f}" if data["ready_s"] is not None else "-"
+        print(f"{name:<13} {data['import_ms']:>10.1f} {live:>8} {ready:>8}  {', '.join(data['endpoints'])}")
+    for name, data in results.items():
+        heaviest = ", ".join(f"{p['package']} {p['ms']:.0f}" for p in data["heaviest"])
+        print(f"\n{name}: {heaviest} (ms)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"source": source, "services": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Prueba de carga extremo a extremo: gateway -> orquestador -> agentes, con un LLM falso.
+
+Arranca los cuatro servicios con uvicorn en puertos locales (--workers procesos por servicio) con
+LLM_PROVIDER=fake y ORCHESTRATOR_LLM_PROVIDER=fake (core.fake_llm.FakeChatModel: latencia
+y velocidad de tokens configurables, sin red), lanza peticiones a /api/generate-pgp con la
+concurrencia indicada y muestra:
+  - throughput, p50/p95/p99 y errores vistos por el cliente
+  - CPU consumida por cada servicio (y por el propio cliente) durante la medición
+  - latencia media de cada salto, leída del /metrics de cada servicio
+
+La caché del LLM y el single-flight se desactivan (salvo con --cache) para que todas las
+peticiones recorran todos los saltos. Con --max-p95-ms / --max-error-rate el script termina
+con código 1 si se superan, para usarlo como control antes de desplegar. Con --workers N
+cada servicio corre en modo multi-worker (estado compartido en SQLite, ver core/shared_state.py)
+y la CPU de cada servicio es la de todos sus procesos.
+
+Uso:
+    python -m benchmarks.bench_e2e --requests 500 --concurrency 20 --llm-latency-ms 200
+    python -m benchmarks.bench_e2e --routing llm --json e2e.json --max-p95-ms 1500
+    python -m benchmarks.bench_e2e --workers 2 --llm-error-rate 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import free_port, percentile, process_tree_cpu_seconds, process_tree_rss_mb
+
+SERVICES = (
+    ("pgp-agent", "agents.pgp_agent_service:app"),
+    ("clima-agent", "agents.clima_agent_service:app"),
+    ("orquestador", "core.orchestrator_langgraph:app"),
+    ("gateway", "api.rest_service:app"),
+)
+
+# (descripción, servicio, métrica, etiquetas que deben coincidir)
+HOPS = (
+    ("gateway: POST /api/generate-pgp", "gateway", "a2a_http_request_duration_seconds", {"route": "/api/generate-pgp"}),
+    ("gateway -> orquestador", "gateway", "a2a_upstream_request_duration_seconds", {"operation": "/route-hu"}),
+    ("orquestador: POST /route-hu", "orquestador", "a2a_http_request_duration_seconds", {"route": "/route-hu"}),
+    ("orquestador: LLM de enrutado", "orquestador", "a2a_llm_call_duration_seconds", {"mode": "route"}),
+    ("orquestador -> agente tasks/send", "orquestador", "a2a_upstream_request_duration_seconds", {"operation": "tasks/send"}),
+    ("orquestador -> agente tasks/get", "orquestador", "a2a_upstream_request_duration_seconds", {"operation": "tasks/get"}),
+    ("agente PGP: JSON-RPC tasks/send", "pgp-agent", "a2a_jsonrpc_request_duration_seconds", {"method": "tasks/send"}),
+    ("agente PGP: LLM", "pgp-agent", "a2a_llm_call_duration_seconds", {"mode": "invoke"}),
+)
+
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def service_env(args, ports: dict) -> dict:
+    url = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")])),
+        "LLM_PROVIDER": "fake",
+        "ORCHESTRATOR_LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.llm_tokens_per_second),
+        "FAKE_LLM_OUTPUT_TOKENS": str(args.llm_output_tokens),
+        "AGENT_URLS": f"{url['pgp-agent']},{url['clima-agent']}",
+        "PGP_AGENT_URL": url["pgp-agent"],
+        "CLIMA_AGENT_URL": url["clima-agent"],
+        "ORCHESTRATOR_URL": url["orquestador"],
+        "ROUTER_ENABLED": "true" if args.routing == "local" else "false",
+        "LLM_CACHE_ENABLED": "true" if args.cache else "false",
+        "SINGLE_FLIGHT_ENABLED": "true" if args.cache else "false",
+        "METRICS_ENABLED": "true",
+        "TRACING_EXPORTER": "none",
+        # Procesos por servicio; con más de uno el estado se comparte en SQLite (core/shared_state.py)
+        "WORKERS": str(args.workers),
+        "SHARED_STATE_DIR": os.path.join(args.log_dir, "shared-state") if args.workers > 1 else "",
+        "FAKE_LLM_ERROR_RATE": str(args.llm_error_rate),
+        "METRICS_SHARED_INTERVAL": "1",
+    })
+    if args.data:
+        env["HU_DATA_PATH"] = args.data
+    return env
+
+
+def start_services(args, log_dir: str):
+    ports = {name: free_port() for name, _ in SERVICES}
+    env = service_env(args, ports)
+    procs = {}
+    # Agentes primero: el orquestador los descubre al arrancar (listo cuando termina), y el gateway al final
+    for name, target in SERVICES:
+        log = open(os.path.join(log_dir, f"{name}.log"), "w")
+        procs[name] = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(ports[name]),
+             "--log-level", "warning", "--no-access-log", "--workers", str(args.workers)],
+            env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        wait_ready(name, f"http://127.0.0.1:{ports[name]}", procs[name], log.name)
+    return procs, {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+
+
+def wait_ready(name: str, url: str, proc: subprocess.Popen, log_path: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+                tail = f.read()[-2000:]
+            raise RuntimeError(f"{name} terminó al arrancar (código {proc.returncode}):\n{tail}")
+        try:
+            if httpx.get(f"{url}/health/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{name} no respondió en {url}/health/ready tras {timeout}s (log: {log_path})")
+
+
+def stop_services(procs: dict):
+    for proc in procs.values():
+        proc.terminate()
+    for proc in procs.values():
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def scrape(urls: dict) -> dict:
+    """
+    Lee los _sum y _count de los histogramas de /metrics de cada servicio.
+    Devuelve {(servicio, métrica, etiquetas): valor}.
+    """
+    samples = {}
+    for name, url in urls.items():
+        text = httpx.get(f"{url}/metrics", timeout=10.0).text
+        for line in text.splitlines():
+            match = _SAMPLE.match(line)
+            if not match or not match.group(1).endswith(("_sum", "_count")):
+                continue
+            labels = frozenset((k, v) for k, v in _LABEL.findall(match.group(2)) if k != "service")
+            samples[(name, match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+def hop_latencies(before: dict, after: dict) -> list:
+    rows = []
+    for label, service, metric, wanted in HOPS:
+        total = count = 0.0
+        for (name, sample, labels), value in after.items():
+            if name != service or not all((k, v) in labels for k, v in wanted.items()):
+                continue
+            delta = value - before.get((name, sample, labels), 0.0)
+            if sample == f"{metric}_sum":
+                total += delta
+            elif sample == f"{metric}_count":
+                count += delta
+        if count:
+            rows.append({"hop": label, "count": int(count), "mean_ms": round(total / count * 1000, 2)})
+    return rows
+
+
+async def drive(gateway_url: str, hu_ids: list, total: int, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, errors, not_success = [], [], [0]
+    async with httpx.AsyncClient(base_url=gateway_url, limits=limits, timeout=120.0) as client:
+        async def one(i: int):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/api/generate-pgp", json={"hu_id": hu_ids[i % len(hu_ids)]})
+                    error = None if response.status_code == 200 else f"HTTP {response.status_code}: {response.text[:200]}"
+                    # Enrutado local y por LLM devuelven el mismo esquema de respuesta (status, gherkin_content, ...)
+                    if not error and response.json().get("status") != "success":
+                        not_success[0] += 1
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                latencies.append(time.perf_counter() - start)
+                if error:
+                    errors.append(error)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        wall = time.perf_counter() - start
+    return latencies, errors, not_success[0], wall
+
+
+def load_hu_ids(args) -> list:
+    if args.hu:
+        return args.hu
+    from core.hu_stream import iter_test_cases
+    return list(dict.fromkeys(str(c["hu_id"]) for c in iter_test_cases(args.data or "data/test_cases.json") if c.get("hu_id")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10, help="peticiones previas que no se miden")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0, help="0 = respuesta completa de golpe")
+    parser.add_argument("--llm-output-tokens", type=int, default=60)
+    parser.add_argument("--llm-error-rate", type=float, default=0,
+                        help="fracción de llamadas al LLM que fallan (1 = todo por generación clásica)")
+    parser.add_argument("--workers", type=int, default=1, help="procesos por servicio (WORKERS)")
+    parser.add_argument("--routing", choices=("local", "llm"), default="local",
+                        help="local: enrutador por palabras clave; llm: agente ReAct con el LLM falso")
+    parser.add_argument("--cache", action="store_true", help="no desactivar la caché del LLM ni el single-flight")
+    parser.add_argument("--data", help="fichero de casos de prueba (HU_DATA_PATH)")
+    parser.add_argument("--hu", action="append", help="HU a pedir (repetible); por defecto todas las del fichero")
+    parser.add_argument("--json", help="guarda el resultado en este fichero")
+    parser.add_argument("--max-p95-ms", type=float, help="falla (código 1) si el p95 lo supera")
+    parser.add_argument("--max-error-rate", type=float, help="falla (código 1) si la tasa de error la supera")
+    parser.add_argument("--log-dir", default=os.path.join(tempfile.gettempdir(), "bench_e2e_logs"))
+    args = parser.parse_args()
+
+    hu_ids = load_hu_ids(args)
+    os.makedirs(args.log_dir, exist_ok=True)
+    print(f"Arrancando servicios (logs en {args.log_dir}) ...")
+    procs, urls = start_services(args, args.log_dir)
+    try:
+        if args.warmup:
+            asyncio.run(drive(urls["gateway"], hu_ids, args.warmup, min(args.concurrency, args.warmup)))
+        if args.workers > 1:
+            # Los workers publican sus métricas cada METRICS_SHARED_INTERVAL (1 s)
+            time.sleep(1.5)
+        before = scrape(urls)
+        cpu_before = {name: process_tree_cpu_seconds(proc.pid) for name, proc in procs.items()}
+        client_cpu_before = time.process_time()
+
+        latencies, errors, not_success, wall = asyncio.run(drive(urls["gateway"], hu_ids, args.requests, args.concurrency))
+
+        client_cpu = time.process_time() - client_cpu_before
+        cpu = {name: process_tree_cpu_seconds(proc.pid) - cpu_before[name] for name, proc in procs.items()}
+        rss = {name: process_tree_rss_mb(proc.pid) for name, proc in procs.items()}
+        if args.workers > 1:
+            # Los workers publican sus métricas cada METRICS_SHARED_INTERVAL (1 s)
+            time.sleep(1.5)
+        hops = hop_latencies(before, scrape(urls))
+    finally:
+        stop_services(procs)
+
+    result = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "log_dir")},
+        "cpus": os.cpu_count(),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "not_success": not_success,
+        "error_rate": round(len(errors) / len(latencies), 4) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "cpu": {name: {"seconds": round(sec, 2), "percent": round(sec / wall * 100, 1), "rss_mb": round(rss[name] or 0, 1)}
+                for name, sec in cpu.items()},
+        "client_cpu_seconds": round(client_cpu, 2),
+        "hops": hops,
+    }
+
+    print(f"\nCPUs: {result['cpus']}  HUs: {len(hu_ids)}  enrutado: {args.routing}  "
+          f"LLM falso: {args.llm_latency_ms:.0f} ms + {args.llm_output_tokens} tokens a {args.llm_tokens_per_second or '∞'} tok/s")
+    print(f"Peticiones: {result['requests']}  concurrencia: {args.concurrency}  errores: {result['errors']}  "
+          f"sin status=success: {not_success}")
+    print(f"Throughput: {result['throughput_rps']} req/s  p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms")
+    print(f"\n{'servicio':<14} {'CPU s':>7} {'CPU %':>7} {'RSS MB':>8}")
+    for name, data in result["cpu"].items():
+        print(f"{name:<14} {data['seconds']:>7.2f} {data['percent']:>7.1f} {data['rss_mb']:>8.1f}")
+    print(f"{'cliente':<14} {client_cpu:>7.2f} {client_cpu / wall * 100:>7.1f} {'-':>8}")
+    print(f"\n{'salto':<36} {'llamadas':>9} {'media ms':>9}")
+    for hop in hops:
+        print(f"{hop['hop']:<36} {hop['count']:>9} {hop['mean_ms']:>9.1f}")
+    if errors:
+        print(f"\nPrimeros errores: {errors[:5]}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failed = []
+    if args.max_p95_ms is not None and result["p95_ms"] > args.max_p95_ms:
+        failed.append(f"p95 {result['p95_ms']} ms > {args.max_p95_ms} ms")
+    if args.max_error_rate is not None and result["error_rate"] > args.max_error_rate:
+        failed.append(f"tasa de error {result['error_rate']} > {args.max_error_rate}")
+    if failed:
+        print("\nFALLO: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
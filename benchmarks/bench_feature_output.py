@@ -0,0 +1,90 @@
+"""
+Tamaño de la salida del generador clásico: escenarios sueltos frente a .feature completos.
+
+Compara, por HU, write_pgp (un Scenario por caso, formato anterior de los .feature) con
+render_feature (Feature + Background + Scenario Outline/Examples) y cuenta bytes, líneas
+de pasos escritas y escenarios que ejecutaría el runner (Scenario + filas de Examples).
+
+Uso:
+    python -m benchmarks.bench_feature_output --cases 100000
+    python -m benchmarks.bench_feature_output --data data/test_cases.json
+"""
+import argparse
+import io
+import itertools
+import os
+import tempfile
+import time
+
+from agents.task_manager import PGPTargetAgent
+from benchmarks.bench_hu_loader import generate
+from core.hu_stream import iter_test_cases
+
+STEP_PREFIXES = ("Given ", "When ", "Then ", "And ")
+
+
+def measure(text: str) -> dict:
+    lines = [line.strip() for line in text.splitlines()]
+    scenarios = sum(1 for line in lines if line.startswith("Scenario:"))
+    in_examples, rows = False, 0
+    for line in lines:
+        if line.startswith("Examples:"):
+            in_examples, header = True, True
+        elif in_examples and line.startswith("|"):
+            rows += 0 if header else 1
+            header = False
+        elif line:
+            in_examples = False
+    return {
+        "bytes": len(text.encode("utf-8")),
+        "step_lines": sum(1 for line in lines if line.startswith(STEP_PREFIXES)),
+        "executed": scenarios + rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=100_000)
+    parser.add_argument("--data", help="fichero de casos (por defecto, exportación sintética de bench_hu_loader)")
+    args = parser.parse_args()
+
+    path = args.data
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), "hu_bench_1000000.json")
+        if not os.path.exists(path):
+            print(f"Generando 1000000 casos en {path} ...")
+            generate(path, 1_000_000, ndjson=False)
+    test_cases = list(itertools.islice(iter_test_cases(path), args.cases))
+
+    agent = PGPTargetAgent()
+    by_hu = {}
+    for case in test_cases:
+        by_hu.setdefault(case.get("hu_id", ""), []).append(case)
+
+    totals = {"scenarios": {"bytes": 0, "step_lines": 0, "executed": 0}, "feature": {"bytes": 0, "step_lines": 0, "executed": 0}}
+    elapsed = {"scenarios": 0.0, "feature": 0.0}
+    for hu_id, cases in by_hu.items():
+        start = time.perf_counter()
+        buf = io.StringIO()
+        buf.write(f"Feature: {hu_id}\n\n")
+        agent.write_pgp(cases, buf)
+        flat = buf.getvalue()
+        elapsed["scenarios"] += time.perf_counter() - start
+        start = time.perf_counter()
+        full = agent.render_feature(hu_id, cases)
+        elapsed["feature"] += time.perf_counter() - start
+        for key, text in (("scenarios", flat), ("feature", full)):
+            for metric, value in measure(text).items():
+                totals[key][metric] += value
+
+    print(f"Casos: {len(test_cases)}  HUs: {len(by_hu)}  ({path})")
+    print(f"{'salida':<12} {'bytes':>12} {'pasos':>10} {'ejecutados':>11} {'casos/s':>10}")
+    for key in ("scenarios", "feature"):
+        t = totals[key]
+        print(f"{key:<12} {t['bytes']:>12} {t['step_lines']:>10} {t['executed']:>11} {len(test_cases) / elapsed[key]:>10.0f}")
+    saving = 1 - totals["feature"]["bytes"] / totals["scenarios"]["bytes"]
+    print(f"Reducción de tamaño: {saving:.1%}")
+
+
+if __name__ == "__main__":
+    main()
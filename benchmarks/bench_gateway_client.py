@@ -0,0 +1,83 @@
+"""
+Throughput de /api/generate-pgp (peticiones/segundo) contra un orquestador stub.
+
+Compara el gateway actual (cliente httpx compartido, gestionado por lifespan) con
+la implementación anterior, que creaba un httpx.AsyncClient por petición.
+
+Uso:
+    python -m benchmarks.bench_gateway_client --requests 1000 --concurrency 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.common import serve_in_thread
+
+
+def build_stub_orchestrator() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/route-hu")
+    async def route_hu(request: dict):
+        return {"status": "success", "gherkin_content": "Scenario: stub", "message": "ok"}
+
+    return app
+
+
+def build_legacy_gateway(orchestrator_url: str) -> FastAPI:
+    """Réplica del endpoint anterior: un AsyncClient nuevo en cada petición."""
+    app = FastAPI()
+
+    @app.post("/api/generate-pgp")
+    async def generate_pgp(request: dict):
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            response = await client.post(f"{orchestrator_url}/route-hu", json=request)
+            response.raise_for_status()
+            return response.json()
+
+    return app
+
+
+async def drive(base_url: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def one(i: int):
+            async with semaphore:
+                response = await client.post("/api/generate-pgp", json={"hu_id": f"HU-{i}"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    orchestrator_url = serve_in_thread(build_stub_orchestrator())
+    os.environ["ORCHESTRATOR_URL"] = orchestrator_url
+    from api.rest_service import app as gateway_app
+
+    legacy_url = serve_in_thread(build_legacy_gateway(orchestrator_url))
+    gateway_url = serve_in_thread(gateway_app)
+
+    legacy_rps = asyncio.run(drive(legacy_url, args.requests, args.concurrency))
+    shared_rps = asyncio.run(drive(gateway_url, args.requests, args.concurrency))
+
+    print(f"Cliente por petición (antes):  {legacy_rps:8.1f} req/s")
+    print(f"Cliente compartido (después):  {shared_rps:8.1f} req/s")
+    print(f"Mejora:                        {shared_rps / legacy_rps:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Pico de memoria (RSS) y tiempo de carga del índice de HUs sobre una exportación sintética.
+
+Genera un fichero con N casos de prueba (array JSON o NDJSON) y mide cada estrategia en
+un subproceso independiente para que el pico de RSS de una no contamine a la siguiente:
+  - json_load:     json.load del documento completo (implementación anterior)
+  - stream:        recorrer los casos con el parser incremental sin guardarlos
+  - repo_memory:   HURepository con el índice de casos parseados (HU_INDEX_MODE=memory)
+  - repo_offsets:  HURepository con índice de offsets (HU_INDEX_MODE=offsets)
+
+Uso:
+    python -m benchmarks.bench_hu_loader --cases 1000000
+    python -m benchmarks.bench_hu_loader --cases 1000000 --ndjson
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("json_load", "stream", "repo_memory", "repo_offsets")
+
+
+def generate(path: str, cases: int, ndjson: bool, cases_per_hu: int = 4):
+    rng = random.Random(7)
+    with open(path, "w", encoding="utf-8") as f:
+        if not ndjson:
+            f.write("[\n")
+        for i in range(cases):
+            case = {
+                "id": f"TC-{i:07d}",
+                "hu_id": f"HU-{i // cases_per_hu:07d}",
+                "title": f"Validar operación {i} del módulo {rng.randint(1, 50)}",
+                "description": "Como usuario registrado, quiero ingresar con mis credenciales para acceder al sistema",
+                "preconditions": ["El usuario está registrado", "La contraseña es válida"],
+                "steps": ["Abrir la página de login", "Ingresar el usuario", "Ingresar la contraseña", "Presionar 'Ingresar'"],
+                "expected_result": "El usuario accede correctamente al panel principal",
+            }
+            line = json.dumps(case, ensure_ascii=False)
+            if ndjson:
+                f.write(line + "\n")
+            else:
+                f.write(("  " if i == 0 else ",\n  ") + line)
+        if not ndjson:
+            f.write("\n]\n")
+
+
+def child(mode: str, path: str) -> dict:
+    start = time.perf_counter()
+    lookup_us = None
+    if mode == "json_load":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = {}
+        for case in data:
+            index.setdefault(case["hu_id"], []).append(case)
+        count = len(index)
+    elif mode == "stream":
+        from core.hu_stream import iter_test_cases
+        count = sum(1 for _ in iter_test_cases(path))
+    else:
+        from core.hu_repository import HURepository
+        repo = HURepository(path, index_mode=mode.split("_", 1)[1])
+        ids = repo.hu_ids()
+        count = len(ids)
+    elapsed = time.perf_counter() - start
+    if mode.startswith("repo_"):
+        sample = random.Random(1).sample(ids, min(1000, len(ids)))
+        t = time.perf_counter()
+        for hu_id in sample:
+            repo.get_cases(hu_id)
+        lookup_us = (time.perf_counter() - t) / len(sample) * 1e6
+    # ru_maxrss está en KB en Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"mode": mode, "count": count, "seconds": elapsed, "peak_rss_mb": peak_mb, "lookup_us": lookup_us}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=1_000_000)
+    parser.add_argument("--ndjson", action="store_true")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--file", help="reutilizar un fichero existente en lugar de generarlo")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.file)))
+        return
+
+    path = args.file
+    if not path:
+        suffix = ".ndjson" if args.ndjson else ".json"
+        path = os.path.join(tempfile.gettempdir(), f"hu_bench_{args.cases}{suffix}")
+        if not os.path.exists(path):
+            print(f"Generando {args.cases} casos en {path} ...")
+            generate(path, args.cases, args.ndjson)
+    print(f"Fichero: {path} ({os.path.getsize(path) / 1024 / 1024:.0f} MB)")
+
+    print(f"{'modo':<14} {'HUs/casos':>10} {'carga':>9} {'pico RSS':>10} {'get_cases':>11}")
+    for mode in args.modes.split(","):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_hu_loader", "--child", mode, "--file", path],
+            capture_output=True, text=True, check=True
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        lookup = f"{r['lookup_us']:.1f} µs" if r["lookup_us"] is not None else "-"
+        print(f"{r['mode']:<14} {r['count']:>10} {r['seconds']:>8.1f}s {r['peak_rss_mb']:>8.0f}MB {lookup:>11}")
+
+
+if __name__ == "__main__":
+    main()
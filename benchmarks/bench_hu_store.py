@@ -0,0 +1,87 @@
+"""
+Arranque en frío y latencia de búsqueda del almacén binario .hus frente al JSON.
+
+Convierte una exportación sintética (la misma que bench_hu_loader) al formato .hus y mide,
+cada estrategia en un subproceso nuevo:
+  - arranque en frío: abrir el repositorio y obtener la primera HU
+  - búsqueda: media de get_cases sobre HUs aleatorias
+  - pico de RSS y memoria privada (RssAnon) al terminar; con mmap la diferencia son
+    páginas del fichero en la caché de página, compartidas y recuperables
+
+Uso:
+    python -m benchmarks.bench_hu_store --cases 1000000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_hu_loader import generate
+from benchmarks.common import anon_rss_mb, peak_rss_mb
+
+MODES = ("json_memory", "json_offsets", "hus")
+
+
+def child(mode: str, json_path: str, hus_path: str, lookups: int) -> dict:
+    from core.hu_repository import HURepository
+    start = time.perf_counter()
+    if mode == "hus":
+        repo = HURepository(hus_path)
+    else:
+        repo = HURepository(json_path, index_mode=mode.split("_", 1)[1])
+    repo.get_first("HU-0000000")
+    cold = time.perf_counter() - start
+
+    ids = [f"HU-{random.Random(i).randrange(0, 250000):07d}" for i in range(lookups)]
+    t = time.perf_counter()
+    for hu_id in ids:
+        repo.get_cases(hu_id)
+    lookup_us = (time.perf_counter() - t) / lookups * 1e6
+    return {"mode": mode, "cold_s": cold, "lookup_us": lookup_us,
+            "peak_rss_mb": peak_rss_mb(), "anon_rss_mb": anon_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--json", help=argparse.SUPPRESS)
+    parser.add_argument("--hus", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.json, args.hus, args.lookups)))
+        return
+
+    json_path = os.path.join(tempfile.gettempdir(), f"hu_bench_{args.cases}.json")
+    hus_path = os.path.join(tempfile.gettempdir(), f"hu_bench_{args.cases}.hus")
+    if not os.path.exists(json_path):
+        print(f"Generando {args.cases} casos en {json_path} ...")
+        generate(json_path, args.cases, ndjson=False)
+
+    from core.hu_store import write_hu_store
+    start = time.perf_counter()
+    count = write_hu_store(json_path, hus_path)
+    print(f"Conversión: {count} HUs en {time.perf_counter() - start:.1f}s")
+    print(f"JSON: {os.path.getsize(json_path) / 1024 / 1024:.0f} MB  .hus: {os.path.getsize(hus_path) / 1024 / 1024:.0f} MB")
+
+    print(f"{'modo':<14} {'arranque':>10} {'get_cases':>11} {'pico RSS':>10} {'RssAnon':>9}")
+    for mode in args.modes.split(","):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_hu_store", "--child", mode,
+             "--json", json_path, "--hus", hus_path, "--lookups", str(args.lookups)],
+            capture_output=True, text=True, check=True
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        anon = f"{r['anon_rss_mb']:.0f}MB" if r["anon_rss_mb"] is not None else "-"
+        print(f"{r['mode']:<14} {r['cold_s'] * 1000:>8.1f}ms {r['lookup_us']:>8.1f} µs {r['peak_rss_mb']:>8.0f}MB {anon:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Coste de serialización de respuestas grandes (gherkin_content de varios MB) en el gateway.
+
+Compara la configuración anterior (middleware que intentaba re-serializar cada
+respuesta JSON + JSONResponse estándar) con FastJSONResponse (orjson, una sola
+serialización, indentado solo bajo demanda).
+
+Uso:
+    python -m benchmarks.bench_json_response --size-kb 2048 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
+
+from api.responses import FastJSONResponse, pretty_json_preference
+from api.rest_service import GeneratePGPResponse
+from benchmarks.common import percentile
+
+
+def build_payload(size_kb: int) -> GeneratePGPResponse:
+    scenario = (
+        "Scenario: Validar login exitoso\n"
+        "  Given El usuario está registrado\n"
+        "  When Ingresar el usuario 'juan@example.com'\n"
+        "  Then El usuario accede correctamente al panel principal\n\n"
+    )
+    repeats = max(1, size_kb * 1024 // len(scenario.encode("utf-8")))
+    return GeneratePGPResponse(status="success", hu_id="HU-123", gherkin_content=scenario * repeats, message="ok")
+
+
+def build_legacy_app(payload: GeneratePGPResponse) -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def format_json_response(request, call_next):
+        response = await call_next(request)
+        if hasattr(response, 'body') and response.headers.get("content-type", "").startswith("application/json"):
+            body = json.loads(response.body.decode())
+            response = JSONResponse(content=body, status_code=response.status_code, headers=dict(response.headers))
+        return response
+
+    @app.get("/payload", response_model=GeneratePGPResponse)
+    async def get_payload():
+        return payload
+
+    return app
+
+
+def build_fast_app(payload: GeneratePGPResponse) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse, dependencies=[Depends(pretty_json_preference)])
+
+    @app.get("/payload", response_model=GeneratePGPResponse)
+    async def get_payload():
+        return payload
+
+    return app
+
+
+async def measure(app: FastAPI, total: int, url: str = "/payload") -> list[float]:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        for _ in range(total):
+            start = time.perf_counter()
+            response = await client.get(url)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: list[float]):
+    ms = [x * 1000 for x in latencies]
+    print(f"{name:<34} p50={percentile(ms, 50):7.2f}ms  p95={percentile(ms, 95):7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=2048)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    payload = build_payload(args.size_kb)
+    print(f"gherkin_content: {len(payload.gherkin_content.encode('utf-8')) / 1024:.0f} KB")
+    report("Middleware + JSONResponse (antes)", asyncio.run(measure(build_legacy_app(payload), args.requests)))
+    report("FastJSONResponse (después)", asyncio.run(measure(build_fast_app(payload), args.requests)))
+    report("FastJSONResponse ?pretty=1", asyncio.run(measure(build_fast_app(payload), args.requests, "/payload?pretty=1")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Throughput y latencia del micro-batching del Agente PGP (LLMMicroBatcher) frente a un LLM falso.
+
+El LLM falso simula un servidor de modelo local con una sola GPU: procesa una pasada
+cada vez y una pasada con k prompts cuesta base + k * per_item, así que agrupar prompts
+abarata cada uno. Las peticiones llegan con una tasa de Poisson y se prueba cada ventana.
+
+Uso:
+    python -m benchmarks.bench_llm_batching --requests 200 --rate 60 --windows 0,5,20,50,100
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, List, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from agents.llm_batcher import LLMMicroBatcher
+from benchmarks.common import percentile
+
+
+class FakeBatchedLLM(Runnable):
+    """Servidor de modelo simulado: una pasada a la vez, coste base + k * per_item."""
+    def __init__(self, base: float, per_item: float):
+        self.base = base
+        self.per_item = per_item
+        self.passes = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _forward(self, count: int):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self.passes += 1
+            await asyncio.sleep(self.base + count * self.per_item)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        raise NotImplementedError
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        await self._forward(1)
+        return "Scenario: fake"
+
+    async def abatch(self, inputs: List[Any], config=None, *, return_exceptions: bool = False, **kwargs) -> List[str]:
+        await self._forward(len(inputs))
+        return ["Scenario: fake"] * len(inputs)
+
+
+async def run(window_ms: float, args) -> dict:
+    fake = FakeBatchedLLM(args.base_ms / 1000, args.per_item_ms / 1000)
+    prompt = ChatPromptTemplate.from_template("{test_cases}")
+    batcher = LLMMicroBatcher(lambda: prompt | fake, window_ms=window_ms,
+                              max_size=args.max_size, max_concurrency=args.max_size)
+    rng = random.Random(42)
+    latencies = []
+
+    async def one(i: int):
+        start = time.perf_counter()
+        await batcher.invoke({"test_cases": f"HU-{i}"})
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(args.requests):
+        tasks.append(asyncio.create_task(one(i)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    ms = [x * 1000 for x in latencies]
+    return {
+        "window": window_ms,
+        "throughput": args.requests / elapsed,
+        "p50": percentile(ms, 50),
+        "p95": percentile(ms, 95),
+        "passes": fake.passes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=60, help="peticiones/segundo (llegadas de Poisson)")
+    parser.add_argument("--windows", default="0,5,20,50,100", help="ventanas en ms; 0 = sin batching")
+    parser.add_argument("--max-size", type=int, default=16)
+    parser.add_argument("--base-ms", type=float, default=40)
+    parser.add_argument("--per-item-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'ventana':>8} {'req/s':>8} {'p50':>10} {'p95':>10} {'pasadas':>8}")
+    for window in (float(w) for w in args.windows.split(",")):
+        r = asyncio.run(run(window, args))
+        print(f"{r['window']:>6.0f}ms {r['throughput']:>8.1f} {r['p50']:>8.1f}ms {r['p95']:>8.1f}ms {r['passes']:>8}")
+
+
+if __name__ == "__main__":
+    main()
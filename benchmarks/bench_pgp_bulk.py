@@ -0,0 +1,97 @@
+"""
+Casos/segundo del generador clásico (PGPTargetAgent) sobre una exportación sintética.
+
+  - join:    generate_pgp_from_test_cases sobre la lista completa (un único string)
+  - stream:  write_pgp(iter_test_cases(...)) escribiendo directamente a un fichero
+  - bulk:    agents.pgp_bulk, un .feature por HU, con cada número de procesos de --workers
+             y con origen JSON y .hus
+
+Crear cientos de miles de ficheros pequeños puede costar más que generarlos; con
+--out-dir /dev/shm se mide la generación sin el sistema de ficheros.
+
+Uso:
+    python -m benchmarks.bench_pgp_bulk --cases 1000000 --workers 1,2,4
+    python -m benchmarks.bench_pgp_bulk --cases 1000000 --out-dir /dev/shm
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_hu_loader import generate
+from benchmarks.common import peak_rss_mb
+
+
+def child(mode: str, path: str, out_path: str) -> dict:
+    from agents.task_manager import PGPTargetAgent
+    from core.hu_stream import iter_test_cases
+    agent = PGPTargetAgent()
+    start = time.perf_counter()
+    if mode == "join":
+        test_cases = list(iter_test_cases(path))
+        content = agent.generate_pgp_from_test_cases(test_cases)
+        with open(out_path, "w", encoding="utf-8") as out:
+            out.write(content)
+        count = len(test_cases)
+    else:
+        with open(out_path, "w", encoding="utf-8") as out:
+            count = agent.write_pgp(iter_test_cases(path), out)
+    elapsed = time.perf_counter() - start
+    return {"mode": mode, "cases": count, "seconds": elapsed, "peak_rss_mb": peak_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=1_000_000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--out-dir", default=tempfile.gettempdir(),
+                        help="dónde escribir los .feature (p.ej. /dev/shm para no medir el disco)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.file, args.out)))
+        return
+
+    tmp = tempfile.gettempdir()
+    json_path = os.path.join(tmp, f"hu_bench_{args.cases}.json")
+    hus_path = os.path.join(tmp, f"hu_bench_{args.cases}.hus")
+    if not os.path.exists(json_path):
+        print(f"Generando {args.cases} casos en {json_path} ...")
+        generate(json_path, args.cases, ndjson=False)
+    if not os.path.exists(hus_path):
+        from core.hu_store import write_hu_store
+        write_hu_store(json_path, hus_path)
+    print(f"CPUs disponibles: {os.cpu_count()}")
+
+    print(f"{'modo':<22} {'casos':>9} {'tiempo':>8} {'casos/s':>10} {'pico RSS':>10}")
+    out_file = os.path.join(tmp, "pgp_bench.feature")
+    for mode in ("join", "stream"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_pgp_bulk", "--child", mode, "--file", json_path, "--out", out_file],
+            capture_output=True, text=True, check=True
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['mode']:<22} {r['cases']:>9} {r['seconds']:>7.1f}s {r['cases'] / r['seconds']:>10.0f} {r['peak_rss_mb']:>8.0f}MB")
+    os.remove(out_file)
+
+    from agents.pgp_bulk import run_bulk
+    out_dir = os.path.join(args.out_dir, "pgp_bench_features")
+    for source in (json_path, hus_path):
+        for workers in (int(w) for w in args.workers.split(",")):
+            shutil.rmtree(out_dir, ignore_errors=True)
+            r = run_bulk(source, out_dir, workers=workers)
+            label = f"bulk {os.path.splitext(source)[1]} x{workers}"
+            print(f"{label:<22} {r['cases']:>9} {r['seconds']:>7.1f}s {r['cases_per_second']:>10.0f} {'-':>10}"
+                  f"  (índice {r['index_seconds']}s)")
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
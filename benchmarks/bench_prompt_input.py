@@ -0,0 +1,68 @@
+"""
+Tamaño del prompt del Agente PGP según PROMPT_INPUT_MODE y coste de construir la cadena.
+
+Para cada HU de data/test_cases.json compara el input serializado en modo "pretty"
+(indent=2, comportamiento anterior) y "compact" (sin vacíos ni espacios). Los tokens son
+una aproximación (palabras, signos y saltos de línea con su sangría, que los tokenizadores
+BPE codifican como tokens propios); la cifra real la da /llm/usage/stats.
+También mide construir ChatPromptTemplate | llm en cada petición frente a reutilizarla.
+
+Uso:
+    python -m benchmarks.bench_prompt_input --iterations 2000
+"""
+import argparse
+import json
+import re
+import time
+from collections import defaultdict
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from agents.prompt_input import serialize_prompt_input
+
+_TOKEN = re.compile(r"\w+|[^\w\s]|\s*\n\s*", re.UNICODE)
+
+
+def approx_tokens(text: str) -> int:
+    return len(_TOKEN.findall(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data/test_cases.json")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Importado aquí para no exigir un servidor Ollama: solo se usa la plantilla
+    from agents.pgp_agent_service import PROMPT_TEMPLATE
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        hus = defaultdict(list)
+        for case in json.load(f):
+            hus[case.get("hu_id")].append(case)
+
+    print(f"{'HU':<10} {'modo':<8} {'input chars':>12} {'input tok~':>11} {'prompt tok~':>12}")
+    totals = defaultdict(lambda: [0, 0])
+    for hu_id, cases in hus.items():
+        for mode in ("pretty", "compact"):
+            input_text = serialize_prompt_input(cases, mode)
+            prompt = PROMPT_TEMPLATE.replace("{test_cases}", input_text)
+            input_tokens, prompt_tokens = approx_tokens(input_text), approx_tokens(prompt)
+            totals[mode][0] += input_tokens
+            totals[mode][1] += prompt_tokens
+            print(f"{hu_id:<10} {mode:<8} {len(input_text):>12} {input_tokens:>11} {prompt_tokens:>12}")
+    for i, label in enumerate(("input", "prompt completo")):
+        saving = 1 - totals["compact"][i] / totals["pretty"][i]
+        print(f"Ahorro de tokens (aprox.) del modo compact, {label}: {saving:.1%}")
+
+    fake_llm = RunnableLambda(lambda prompt: "Scenario: fake")
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        ChatPromptTemplate.from_template(PROMPT_TEMPLATE) | fake_llm
+    per_build = (time.perf_counter() - start) / args.iterations
+    print(f"Construir la cadena por petición: {per_build * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
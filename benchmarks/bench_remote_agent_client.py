@@ -0,0 +1,92 @@
+"""
+Micro-benchmark de RemoteAgentClient contra un agente stub local.
+
+Compara la latencia por llamada de:
+  - requests.post sin Session (implementación anterior: handshake TCP en cada llamada)
+  - fachada síncrona send_task (pool httpx.Client con keep-alive)
+  - send_task_async (pool httpx.AsyncClient con keep-alive)
+
+Uso:
+    python -m benchmarks.bench_remote_agent_client --calls 500
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import requests
+from fastapi import FastAPI
+
+from benchmarks.common import percentile, serve_in_thread
+from host.remote_agent_client import RemoteAgentClient
+
+
+def build_stub_agent() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/.well-known/agent.json")
+    async def agent_json():
+        return {
+            "name": "Agente Stub",
+            "description": "Responde al instante",
+            "url": "",
+            "skills": [{"id": "pgp", "name": "PGP"}],
+            "capabilities": {"streaming": False},
+        }
+
+    @app.post("/jsonrpc")
+    async def jsonrpc(request: dict):
+        return {"result": {"status": "success", "gherkin_content": "Scenario: stub"}}
+
+    return app
+
+
+def report(name: str, latencies: list[float]):
+    ms = [x * 1000 for x in latencies]
+    print(f"{name:<28} media={sum(ms) / len(ms):6.2f}ms  p50={percentile(ms, 50):6.2f}ms  p95={percentile(ms, 95):6.2f}ms")
+
+
+def bench_requests(client: RemoteAgentClient, calls: int) -> list[float]:
+    latencies = []
+    for i in range(calls):
+        payload = client._build_payload(str(i), "bench", "[]")
+        start = time.perf_counter()
+        requests.post(f"{client.base_url}/jsonrpc", json=payload).json()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_sync(client: RemoteAgentClient, calls: int) -> list[float]:
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        client.send_task(str(i), "bench", "[]")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def bench_async(client: RemoteAgentClient, calls: int) -> list[float]:
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        await client.send_task_async(str(i), "bench", "[]")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    client = RemoteAgentClient(serve_in_thread(build_stub_agent()))
+    client.fetch_agent_card()
+
+    report("requests.post (sin pool)", bench_requests(client, args.calls))
+    report("send_task (pool síncrono)", bench_sync(client, args.calls))
+    report("send_task_async (pool)", asyncio.run(bench_async(client, args.calls)))
+
+
+if __name__ == "__main__":
+    main()
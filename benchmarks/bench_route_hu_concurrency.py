@@ -0,0 +1,104 @@
+"""
+Prueba de carga de /route-hu: N HUs concurrentes contra un agente stub lento.
+
+Con la ruta asíncrona, el tiempo total debe parecerse al de la HU más lenta,
+no a la suma de todas. El LLM del orquestador se sustituye por un agente
+falso que invoca directamente la herramienta del skill.
+
+Uso:
+    python -m benchmarks.bench_route_hu_concurrency --n 20 --min-latency 0.2 --max-latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from fastapi import FastAPI
+
+from benchmarks.common import serve_in_thread
+
+
+def build_stub_agent(min_latency: float, max_latency: float) -> FastAPI:
+    app = FastAPI()
+    card = {
+        "name": "Agente Stub",
+        "description": "Agente PGP simulado",
+        "url": "",
+        "skills": [{"id": "pgp", "name": "PGP", "description": "Transforma HUs a Gherkin"}],
+        "capabilities": {"streaming": False},
+    }
+
+    @app.get("/.well-known/agent.json")
+    async def agent_json():
+        return card
+
+    @app.post("/jsonrpc")
+    async def jsonrpc(request: dict):
+        await asyncio.sleep(random.uniform(min_latency, max_latency))
+        text = request["params"]["message"]["parts"][0]["text"]
+        hu = json.loads(text)[0]
+        return {"result": {"status": "success", "hu_id": hu.get("hu_id"), "gherkin_content": "Scenario: stub"}}
+
+    return app
+
+
+class FakeReactAgent:
+    """Sustituye al agente ReAct: elige siempre la primera herramienta sin llamar a un LLM."""
+
+    def __init__(self, tools):
+        self.tools = tools
+
+    async def ainvoke(self, inputs):
+        content = inputs["messages"][-1]["content"]
+        return await self.tools[0](input=content)
+
+
+async def run(n: int, hu_id: str):
+    import httpx
+    from core.orchestrator_langgraph import server
+
+    await server.discover_agents()
+    server.react_agent = FakeReactAgent(server.tools)
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://orchestrator", timeout=None) as client:
+        async def one():
+            start = time.perf_counter()
+            response = await client.post("/route-hu", json={"hu_id": hu_id})
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(n)))
+        total = time.perf_counter() - start
+
+    await server.shutdown()
+    print(f"HUs concurrentes:         {n}")
+    print(f"Suma de latencias:        {sum(latencies):.2f}s (equivalente secuencial)")
+    print(f"HU más lenta:             {max(latencies):.2f}s")
+    print(f"Tiempo total (wall):      {total:.2f}s")
+    print(f"Throughput:               {n / total:.1f} HU/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=20)
+    parser.add_argument("--min-latency", type=float, default=0.2)
+    parser.add_argument("--max-latency", type=float, default=1.0)
+    parser.add_argument("--hu-id", default="HU-123")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    agent_url = serve_in_thread(build_stub_agent(args.min_latency, args.max_latency))
+    os.environ["AGENT_URLS"] = agent_url
+    # Credenciales ficticias: el LLM real del orquestador no se usa en este benchmark
+    os.environ.setdefault("AZURE_OPENAI_API_KEY", "bench")
+    os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://127.0.0.1")
+    os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-02-01")
+    asyncio.run(run(args.n, args.hu_id))
+
+
+if __name__ == "__main__":
+    main()
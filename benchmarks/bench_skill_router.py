@@ -0,0 +1,44 @@
+"""
+Latencia del enrutador local (SkillRouter) sobre las HUs de data/test_cases.json.
+
+Uso:
+    python -m benchmarks.bench_skill_router --iterations 20000
+"""
+import argparse
+import json
+import time
+
+from agents.agent_card import AgentSkill
+from core.skill_router import SkillRouter
+
+SKILLS = [
+    AgentSkill(id="pgp", name="PGP", description="Transforma HUs a Gherkin",
+               tags=["login", "credenciales", "contraseña", "validación", "pruebas", "gherkin", "acceso"]),
+    AgentSkill(id="clima", name="Clima", description="Responde preguntas sobre el clima",
+               tags=["clima", "temperatura", "tiempo", "lluvia", "pronóstico", "meteorología"]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--data", default="data/test_cases.json")
+    args = parser.parse_args()
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        texts = [f"{c.get('title', '')} {c.get('description', '')}" for c in json.load(f)]
+
+    router = SkillRouter()
+    router.build(SKILLS)
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        router.route(texts[i % len(texts)])
+    elapsed = time.perf_counter() - start
+
+    print(f"Decisiones:        {args.iterations}")
+    print(f"Por decisión:      {elapsed / args.iterations * 1e6:.1f} µs")
+    print(f"Estadísticas:      {router.stats()}")
+
+
+if __name__ == "__main__":
+    main()
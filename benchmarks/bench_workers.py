@@ -0,0 +1,97 @@
+"""
+Escalado con WORKERS: la misma carga extremo a extremo con 1, 2, 4... procesos por servicio.
+
+Con un LLM de latencia 0 que falla siempre (--llm-error-rate 1, por defecto) el Agente PGP
+genera los casos con el método clásico, así que todo el trabajo es CPU: parseo y
+serialización JSON en cada salto, generación clásica y enrutado local. Un solo proceso
+por servicio no usa más de un núcleo; con WORKERS > 1 el throughput debería crecer hasta
+el número de CPUs y aplanarse a partir de ahí.
+
+Las HUs son sintéticas (benchmarks.bench_hu_loader.generate) con --cases-per-hu casos cada
+una para que la respuesta pese; con --data se usa un fichero existente.
+
+Uso:
+    python -m benchmarks.bench_workers --workers 1 2 4 --requests 400 --concurrency 32
+    python -m benchmarks.bench_workers --llm-error-rate 0 --llm-latency-ms 200   # limitado por el LLM
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from benchmarks.bench_e2e import drive, load_hu_ids, start_services, stop_services
+from benchmarks.bench_hu_loader import generate
+from benchmarks.common import percentile, process_tree_cpu_seconds
+
+
+def run(args, workers: int, hu_ids: list) -> dict:
+    config = argparse.Namespace(**{**vars(args), "workers": workers,
+                                   "log_dir": os.path.join(args.log_dir, f"workers-{workers}")})
+    os.makedirs(config.log_dir, exist_ok=True)
+    procs, urls = start_services(config, config.log_dir)
+    try:
+        asyncio.run(drive(urls["gateway"], hu_ids, args.warmup * workers, args.concurrency))
+        cpu_before = {name: process_tree_cpu_seconds(proc.pid) for name, proc in procs.items()}
+        latencies, errors, not_success, wall = asyncio.run(drive(urls["gateway"], hu_ids, args.requests, args.concurrency))
+        cpu = {name: process_tree_cpu_seconds(proc.pid) - cpu_before[name] for name, proc in procs.items()}
+    finally:
+        stop_services(procs)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "not_success": not_success,
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "cpu_percent": {name: round(sec / wall * 100, 1) for name, sec in cpu.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=10, help="peticiones previas por worker que no se miden")
+    parser.add_argument("--hus", type=int, default=20, help="HUs sintéticas")
+    parser.add_argument("--cases-per-hu", type=int, default=40)
+    parser.add_argument("--llm-latency-ms", type=float, default=0)
+    parser.add_argument("--llm-error-rate", type=float, default=1, help="1 = siempre método clásico")
+    parser.add_argument("--routing", choices=("local", "llm"), default="local")
+    parser.add_argument("--data", help="fichero de casos de prueba (en lugar de HUs sintéticas)")
+    parser.add_argument("--json", help="guarda el resultado en este fichero")
+    parser.add_argument("--log-dir", default=os.path.join(tempfile.gettempdir(), "bench_workers_logs"))
+    args = parser.parse_args()
+    # Valores que start_services espera y que aquí son fijos
+    args.llm_tokens_per_second, args.llm_output_tokens, args.cache, args.hu = 0, 60, False, None
+
+    os.makedirs(args.log_dir, exist_ok=True)
+    if not args.data:
+        args.data = os.path.join(args.log_dir, "hus.json")
+        generate(args.data, args.hus * args.cases_per_hu, ndjson=False, cases_per_hu=args.cases_per_hu)
+    hu_ids = load_hu_ids(args)
+
+    results = []
+    for workers in args.workers:
+        print(f"Midiendo con WORKERS={workers} (logs en {args.log_dir}) ...")
+        results.append(run(args, workers, hu_ids))
+
+    base = results[0]["throughput_rps"] or 1
+    print(f"\nCPUs: {os.cpu_count()}  HUs: {len(hu_ids)}  LLM falso: {args.llm_latency_ms:.0f} ms, "
+          f"fallos {args.llm_error_rate:.0%}  concurrencia: {args.concurrency}")
+    print(f"{'workers':>8} {'req/s':>8} {'x':>6} {'p50 ms':>8} {'p95 ms':>8} {'errores':>8}  CPU % por servicio")
+    for r in results:
+        cpu = "  ".join(f"{name} {pct:.0f}" for name, pct in r["cpu_percent"].items())
+        print(f"{r['workers']:>8} {r['throughput_rps']:>8.1f} {r['throughput_rps'] / base:>6.2f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['errors']:>8}  {cpu}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"cpus": os.cpu_count(), "config": {k: v for k, v in vars(args).items() if k not in ("json", "log_dir")},
+                       "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Utilidades compartidas por los benchmarks: servidores stub locales, percentiles, memoria y CPU.
+"""
+import os
+import resource
+import socket
+import threading
+import time
+
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app, port: int | None = None) -> str:
+    """
+    Levanta una app ASGI con uvicorn en un hilo daemon y devuelve su URL base
+    cuando ya acepta conexiones.
+    """
+    port = port or free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _proc_status_mb(field: str):
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def anon_rss_mb():
+    """
+    Memoria residente privada (RssAnon) en MB, sin las páginas de ficheros mapeados,
+    que son caché de página compartida y recuperable. None fuera de Linux.
+    """
+    return _proc_status_mb("RssAnon")
+
+
+def peak_rss_mb() -> float:
+    """
+    Pico de memoria residente del proceso actual en MB. En Linux se lee VmHWM, porque
+    ru_maxrss conserva tras fork+exec el pico del proceso padre.
+    """
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def process_cpu_seconds(pid: int):
+    """
+    CPU consumida (usuario + sistema) por un proceso, en segundos, leída de /proc/<pid>/stat.
+    None fuera de Linux o si el proceso ya no existe.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # El nombre del proceso (campo 2) va entre paréntesis y puede contener espacios
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def process_rss_mb(pid: int):
+    """
+    Memoria residente actual (VmRSS) de un proceso en MB. None fuera de Linux.
+    """
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_tree(pid: int) -> list[int]:
+    """
+    El proceso y todos sus descendientes vivos (p.ej. los workers de uvicorn --workers).
+    """
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def process_tree_cpu_seconds(pid: int) -> float:
+    """CPU de un proceso y sus descendientes vivos, en segundos."""
+    return sum(process_cpu_seconds(p) or 0.0 for p in process_tree(pid))
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Memoria residente de un proceso y sus descendientes vivos, en MB."""
+    return sum(process_rss_mb(p) or 0.0 for p in process_tree(pid))
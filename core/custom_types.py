@@ -13,6 +13,13 @@ class Message(BaseModel):
 # --- Solicitudes específicas con estructura interna validada ---
 class SendTaskParams(BaseModel):
     message: Message
+    # Id de la tarea propuesto por el cliente: permite reintentar tasks/send y cancelar
+    # la tarea antes de recibir la respuesta
+    id: Optional[str] = None
+    session_id: Optional[str] = None
+    metadata: Optional[Dict] = None
+    # Segundos que el servidor espera a que la tarea termine antes de responder
+    wait_seconds: Optional[float] = None
 
 class SendTaskRequest(BaseModel):
     jsonrpc: str
@@ -20,6 +27,33 @@ class SendTaskRequest(BaseModel):
     id: Optional[str]
     params: SendTaskParams
 
+class TaskIdParams(BaseModel):
+    id: str
+    # tasks/get: segundos que el servidor espera a que la tarea termine (long polling)
+    wait_seconds: Optional[float] = None
+
+class GetTaskRequest(BaseModel):
+    jsonrpc: str
+    method: str = "tasks/get"
+    id: Optional[str]
+    params: TaskIdParams
+
+class CancelTaskRequest(BaseModel):
+    jsonrpc: str
+    method: str = "tasks/cancel"
+    id: Optional[str]
+    params: TaskIdParams
+
+# --- Tarea y su ciclo de vida ---
+class Task(BaseModel):
+    id: str
+    session_id: Optional[str] = None
+    state: str
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
 # --- Respuesta JSON-RPC ---
 class JSONRPCSuccess(BaseModel):
     state: Optional[str] = None
@@ -33,7 +67,7 @@ class JSONRPCError(BaseModel):
 class JSONRPCResponse(BaseModel):
     jsonrpc: str = "2.0"
     id: Optional[str] = None
-    result: Optional[JSONRPCSuccess] = None
+    result: Optional[Union[Task, JSONRPCSuccess]] = None
     error: Optional[JSONRPCError] = None
 
 
@@ -49,9 +83,27 @@ class InternalError(Exception):
         self.message = message
         super().__init__(self.message)
 
+class TaskNotFoundError(Exception):
+    def __init__(self, message="Task not found", code=-32001):
+        self.code = code
+        self.message = message
+        super().__init__(self.message)
+
+class TaskNotCancelableError(Exception):
+    def __init__(self, message="Task cannot be canceled", code=-32002):
+        self.code = code
+        self.message = message
+        super().__init__(self.message)
+
 
 # --- Estados posibles de la tarea ---
 class TaskState:
+    SUBMITTED = "SUBMITTED"
+    WORKING = "WORKING"
     COMPLETED = "COMPLETED"
     INPUT_REQUIRED = "INPUT_REQUIRED"
+    CANCELED = "CANCELED"
     ERROR = "ERROR"
+
+    # Estados en los que la tarea ya no cambiará
+    TERMINAL = (COMPLETED, CANCELED, ERROR)
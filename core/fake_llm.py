@@ -0,0 +1,169 @@
+# core/fake_llm.py
+"""
+LLM falso determinista para pruebas de carga (LLM_PROVIDER=fake / ORCHESTRATOR_LLM_PROVIDER=fake).
+
+No hace llamadas de red, responde siempre lo mismo para el mismo prompt y simula la latencia
+del proveedor (FAKE_LLM_LATENCY_MS hasta el primer token y FAKE_LLM_TOKENS_PER_SECOND para
+el resto). Soporta invoke/batch/stream, usage_metadata y tool calling (bind_tools), así que
+sirve tanto para el agente ReAct del orquestador como para la cadena del Agente PGP.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import random
+import hashlib
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+# 0 = la respuesta completa llega de golpe tras FAKE_LLM_LATENCY_MS
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+FAKE_LLM_OUTPUT_TOKENS = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "60"))
+# Herramienta que elige el LLM falso; por defecto la que aparezca en el texto o la primera
+FAKE_LLM_TOOL = os.getenv("FAKE_LLM_TOOL", "")
+# Fracción de llamadas que fallan al instante (como un servidor caído); 1 = todas, para medir el fallback
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+
+# El prompt de enrutado del orquestador (ChatPromptTemplate.from_template) renderiza la
+# lista de mensajes como texto: los mensajes previos aparecen como su repr
+_RENDERED_HUMAN = re.compile(r"HumanMessage\(content=(['\"])((?:(?!\1)[^\\]|\\.)*)\1")
+_RENDERED_TOOL = re.compile(r"ToolMessage\(content=(['\"])((?:(?!\1)[^\\]|\\.)*)\1")
+
+_STEP_WORDS = ("el", "usuario", "ingresa", "sus", "credenciales", "y", "el", "sistema", "valida", "el", "acceso")
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    LLM determinista sin red. Si tiene herramientas y aún no hay respuesta de ninguna,
+    devuelve una llamada a herramienta; tras la respuesta de la herramienta, devuelve su
+    contenido; en otro caso genera un Gherkin de FAKE_LLM_OUTPUT_TOKENS palabras.
+    """
+    latency_ms: float = FAKE_LLM_LATENCY_MS
+    tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND
+    output_tokens: int = FAKE_LLM_OUTPUT_TOKENS
+    tool: str = FAKE_LLM_TOOL
+    error_rate: float = FAKE_LLM_ERROR_RATE
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    # --- Contenido de la respuesta ---
+
+    @staticmethod
+    def _read_conversation(messages: List[BaseMessage], prompt: str):
+        """
+        Devuelve (texto del usuario, resultado de herramienta o None), tanto si la conversación
+        llega como mensajes como si llega renderizada dentro del prompt.
+        """
+        tool_results = [str(m.content) for m in messages if isinstance(m, ToolMessage)]
+        tool_results += [m.group(2) for m in _RENDERED_TOOL.finditer(prompt)]
+        rendered = [m.group(2) for m in _RENDERED_HUMAN.finditer(prompt)]
+        if rendered:
+            human = rendered[0]
+        else:
+            human = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), prompt)
+            # Prompt de plantilla: el texto de la HU va al final
+            human = next((line for line in reversed(human.splitlines()) if line.strip()), human)
+        return human, (tool_results[-1] if tool_results else None)
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[list]) -> AIMessage:
+        prompt = "\n".join(str(m.content) for m in messages)
+        usage_in = _approx_tokens(prompt)
+        human, tool_result = self._read_conversation(messages, prompt)
+        if tool_result is not None:
+            return AIMessage(content=tool_result, usage_metadata=self._usage(usage_in, _approx_tokens(tool_result)))
+        if tools:
+            names = [tool["function"]["name"] for tool in tools]
+            name = self.tool if self.tool in names else next((n for n in names if n.lower() in human.lower()), names[0])
+            call_id = "call_" + hashlib.sha256(f"{name}:{human}".encode("utf-8")).hexdigest()[:12]
+            return AIMessage(content="", tool_calls=[{"name": name, "args": {"input": human}, "id": call_id}],
+                             usage_metadata=self._usage(usage_in, 10))
+        return AIMessage(content=self._gherkin(prompt), usage_metadata=self._usage(usage_in, self.output_tokens))
+
+    def _gherkin(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        words = [_STEP_WORDS[(int(digest[i % 64], 16) + i) % len(_STEP_WORDS)] for i in range(max(self.output_tokens - 6, 3))]
+        third = max(1, len(words) // 3)
+        return (
+            f"Según la historia {digest[:8]} el formato Gherkin es:\n"
+            f"- Given: {' '.join(words[:third])}\n"
+            f"- When: {' '.join(words[third:2 * third])}\n"
+            f"- Then: {' '.join(words[2 * third:])}"
+        )
+
+    @staticmethod
+    def _usage(input_tokens: int, output_tokens: int) -> dict:
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _check_error(self):
+        if self.error_rate > 0 and random.random() < self.error_rate:
+            raise ConnectionError("Error simulado del LLM falso (FAKE_LLM_ERROR_RATE)")
+
+    def _duration(self, message: AIMessage) -> float:
+        tokens = (message.usage_metadata or {}).get("output_tokens", 0)
+        generation = tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return self.latency_ms / 1000 + generation
+
+    # --- Interfaz de BaseChatModel ---
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self._check_error()
+        message = self._reply(messages, kwargs.get("tools"))
+        time.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self._check_error()
+        message = self._reply(messages, kwargs.get("tools"))
+        await asyncio.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            return [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False), "id": c["id"], "index": 0}
+                for c in message.tool_calls
+            ], usage_metadata=message.usage_metadata)]
+        tokens = str(message.content).split(" ")
+        chunks = [AIMessageChunk(content=token if i == 0 else " " + token) for i, token in enumerate(tokens)]
+        # Como los proveedores reales, el consumo de tokens llega en el último fragmento
+        chunks.append(AIMessageChunk(content="", usage_metadata=message.usage_metadata))
+        return chunks
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self._check_error()
+        message = self._reply(messages, kwargs.get("tools"))
+        time.sleep(self.latency_ms / 1000)
+        for chunk in self._chunks(message):
+            if self.tokens_per_second > 0 and chunk.content:
+                time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self._check_error()
+        message = self._reply(messages, kwargs.get("tools"))
+        await asyncio.sleep(self.latency_ms / 1000)
+        for chunk in self._chunks(message):
+            if self.tokens_per_second > 0 and chunk.content:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,101 @@
+# core/health.py
+"""
+Liveness y readiness de los servicios.
+
+GET /health/live responde en cuanto el proceso atiende peticiones: sirve para reiniciar el
+contenedor si se cuelga y no depende de nada externo. GET /health/ready responde 503
+mientras quedan tareas de arranque pendientes (descubrimiento de agentes, precarga del
+LLM...) y 200 cuando han terminado, para que el balanceador no envíe tráfico a una réplica
+que aún se está inicializando. GET /health se mantiene como antes (equivale a live).
+
+Las tareas de arranque se lanzan en segundo plano desde el lifespan de cada servicio con
+Readiness.start, así que el servidor empieza a escuchar sin esperar a que terminen. Una
+tarea que falla cuenta como terminada (el servicio funciona degradado, p.ej. con el método
+clásico) y el error se ve en el detalle de /health/ready.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Precargar al arrancar lo que se importa de forma perezosa (proveedor del LLM, LangGraph).
+# Con false, la primera petición que lo necesite paga la importación.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+
+
+class Readiness:
+    """
+    Estado de las tareas de arranque de un servicio: pending | ok | error.
+    """
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self._checks: Dict[str, Dict[str, Any]] = {}
+        self._tasks: set = set()
+
+    def start(self, name: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Lanza fn() en segundo plano; 'name' queda pendiente hasta que termine.
+        Si fn devuelve un dict, se añade al detalle de la comprobación.
+        """
+        self._checks[name] = {"status": "pending"}
+        task = asyncio.get_running_loop().create_task(self._run(name, fn))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, name: str, fn: Callable[[], Awaitable[Any]]):
+        start = time.monotonic()
+        try:
+            detail = await fn()
+        except Exception as e:
+            logger.error(f"Tarea de arranque '{name}' fallida: {e}")
+            self._checks[name] = {"status": "error", "error": str(e), "seconds": round(time.monotonic() - start, 3)}
+            return
+        self._checks[name] = {"status": "ok", "seconds": round(time.monotonic() - start, 3),
+                              **(detail if isinstance(detail, dict) else {})}
+        logger.info(f"Tarea de arranque '{name}' completada en {self._checks[name]['seconds']}s")
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """
+        True si la tarea indicada (o todas, sin nombre) ya terminó. Una tarea que no se ha
+        lanzado cuenta como terminada.
+        """
+        checks = [self._checks.get(name)] if name else list(self._checks.values())
+        return all(check is None or check["status"] != "pending" for check in checks)
+
+    def checks(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(check) for name, check in self._checks.items()}
+
+    async def stop(self):
+        """Cancela las tareas de arranque que sigan en curso (apagado durante el arranque)."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def install_health(app, service: str, readiness: Optional[Readiness] = None) -> Readiness:
+    """
+    Añade GET /health/live y GET /health/ready a una app FastAPI.
+    Devuelve el Readiness en el que el servicio registra sus tareas de arranque.
+    """
+    from fastapi.responses import JSONResponse
+
+    readiness = readiness or Readiness()
+
+    async def live():
+        return {"status": "alive", "service": service,
+                "uptime_seconds": round(time.monotonic() - readiness.started_at, 3)}
+
+    async def ready():
+        is_ready = readiness.is_ready()
+        return JSONResponse(
+            status_code=200 if is_ready else 503,
+            content={"status": "ready" if is_ready else "starting", "service": service, "checks": readiness.checks()}
+        )
+
+    app.add_api_route("/health/live", live, methods=["GET"])
+    app.add_api_route("/health/ready", ready, methods=["GET"])
+    return readiness
@@ -0,0 +1,167 @@
+# core/hu_repository.py
+import gc
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.hu_stream import iter_test_cases_with_offsets
+from core.hu_store import HUStore, is_hu_store
+
+logger = logging.getLogger(__name__)
+
+# Ruta por defecto del fichero de HUs / casos de prueba
+HU_DATA_PATH = os.getenv("HU_DATA_PATH", "data/test_cases.json")
+# "memory": índice con los casos ya parseados; "offsets": solo la posición de cada caso en
+# el fichero (se lee y parsea al consultarlo); "auto": offsets a partir de HU_INDEX_OFFSETS_MIN_MB
+HU_INDEX_MODE = os.getenv("HU_INDEX_MODE", "auto").lower()
+HU_INDEX_OFFSETS_MIN_MB = float(os.getenv("HU_INDEX_OFFSETS_MIN_MB", "64"))
+
+
+class HURepository:
+    """
+    Repositorio de casos de prueba indexados por hu_id.
+
+    El fichero se carga una sola vez y se vuelve a leer únicamente cuando cambia su
+    mtime, de modo que cada consulta es un acceso O(1) al índice en lugar de abrir y
+    parsear el JSON completo. Acepta un array JSON o NDJSON (.ndjson/.jsonl) y lo recorre
+    en streaming. Con exportaciones grandes el índice guarda solo (offset, longitud) de
+    cada caso y get_cases lee y parsea únicamente los casos de esa HU. Los ficheros .hus
+    (ver core/hu_store.py) se abren con mmap y no necesitan índice en memoria.
+    """
+    def __init__(self, path: str = HU_DATA_PATH, index_mode: str = HU_INDEX_MODE):
+        self.path = Path(path)
+        self.index_mode = index_mode
+        self._index: Dict[str, List[dict]] = {}
+        self._offsets: Dict[str, List[Tuple[int, int]]] = {}
+        self._store: Optional[HUStore] = None
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _current_mtime(self) -> Optional[int]:
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _use_offsets(self) -> bool:
+        if self.index_mode == "offsets":
+            return True
+        if self.index_mode == "memory":
+            return False
+        return self.path.stat().st_size >= HU_INDEX_OFFSETS_MIN_MB * 1024 * 1024
+
+    def _build_index(self, use_offsets: bool):
+        index: Dict[str, list] = {}
+        # Con millones de casos el GC generacional recorre una y otra vez los objetos recién
+        # creados (que siguen vivos); se pausa durante la carga y se restaura al terminar
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for case, offset, length in iter_test_cases_with_offsets(self.path):
+                hu_id = case.get("hu_id")
+                if hu_id:
+                    index.setdefault(hu_id, []).append((offset, length) if use_offsets else case)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return index
+
+    def _read_cases(self, positions: List[Tuple[int, int]]) -> List[dict]:
+        cases = []
+        with self.path.open("rb") as f:
+            for offset, length in positions:
+                f.seek(offset)
+                cases.append(json.loads(f.read(length)))
+        return cases
+
+    def _refresh(self):
+        """
+        Recarga el índice si el fichero cambió desde la última lectura.
+        """
+        mtime = self._current_mtime()
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            if mtime is None:
+                self._index, self._offsets, self._store = {}, {}, None
+                self._mtime = None
+                return
+            if is_hu_store(self.path):
+                try:
+                    # El mmap anterior se libera cuando deja de referenciarse
+                    self._store = HUStore(self.path)
+                except Exception as e:
+                    logger.warning(f"No se pudo abrir {self.path}: {e}")
+                    return
+                self._mtime = mtime
+                logger.info(f"Almacén de HUs abierto desde {self.path} (mmap): {len(self._store)} HUs")
+                return
+            try:
+                use_offsets = self._use_offsets()
+                index = self._build_index(use_offsets)
+            except Exception as e:
+                # Se conserva el índice anterior (p.ej. fichero a medio escribir)
+                logger.warning(f"No se pudo cargar {self.path}: {e}")
+                return
+            if use_offsets:
+                self._index, self._offsets = {}, index
+            else:
+                self._index, self._offsets = index, {}
+            self._mtime = mtime
+            mode = "offsets" if use_offsets else "memoria"
+            logger.info(f"Índice de HUs cargado desde {self.path} ({mode}): {len(index)} HUs")
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def get_cases(self, hu_id: str) -> List[dict]:
+        """
+        Devuelve todos los casos de prueba de una HU (lista vacía si no existe).
+        """
+        self._refresh()
+        if self._store is not None:
+            return self._store.get_cases(hu_id)
+        positions = self._offsets.get(hu_id)
+        if positions:
+            return self._read_cases(positions)
+        return list(self._index.get(hu_id, []))
+
+    def get_first(self, hu_id: str) -> Optional[dict]:
+        """
+        Devuelve el primer caso de prueba de una HU, o None si no existe.
+        """
+        self._refresh()
+        if self._store is not None:
+            cases = self._store.get_cases(hu_id)
+            return cases[0] if cases else None
+        positions = self._offsets.get(hu_id)
+        if positions:
+            return self._read_cases(positions[:1])[0]
+        cases = self._index.get(hu_id)
+        return cases[0] if cases else None
+
+    def hu_ids(self) -> List[str]:
+        self._refresh()
+        if self._store is not None:
+            return list(self._store.hu_ids())
+        return list(self._offsets.keys() or self._index.keys())
+
+
+_repositories: Dict[str, HURepository] = {}
+_repositories_lock = threading.Lock()
+
+
+def get_hu_repository(path: Optional[str] = None) -> HURepository:
+    """
+    Devuelve el repositorio compartido (uno por ruta y proceso).
+    """
+    key = str(Path(path or HU_DATA_PATH))
+    with _repositories_lock:
+        if key not in _repositories:
+            _repositories[key] = HURepository(key)
+        return _repositories[key]
@@ -0,0 +1,199 @@
+# core/hu_store.py
+"""
+Formato binario de HUs (.hus) con acceso aleatorio vía mmap.
+
+Estructura del fichero (little-endian):
+  - Cabecera:  magic "HUS1", versión (u16), reservado (u16), nº de HUs (u32),
+               nº de huecos de la tabla (u32, potencia de 2), offset de la tabla (u64)
+  - Registros: por HU, longitud del hu_id (u16) + hu_id UTF-8 + longitud (u32) + JSON
+               compacto con la lista de casos de prueba de esa HU
+  - Tabla:     direccionamiento abierto con sondeo lineal; cada hueco es
+               (hash del hu_id u64, offset del registro u64), offset 0 = hueco vacío
+
+Buscar una HU es calcular el hash, leer uno o pocos huecos y parsear solo su registro.
+
+Conversión:
+    python -m core.hu_store data/test_cases.json data/test_cases.hus
+"""
+import os
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+from core.hu_stream import iter_test_cases_with_offsets
+
+logger = logging.getLogger(__name__)
+
+HU_STORE_SUFFIX = ".hus"
+MAGIC = b"HUS1"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIIQ")
+_SLOT = struct.Struct("<QQ")
+_KEY_LEN = struct.Struct("<H")
+_PAYLOAD_LEN = struct.Struct("<I")
+# Ocupación máxima de la tabla hash
+_LOAD_FACTOR = 0.5
+
+
+def hu_key_hash(hu_id: str) -> int:
+    """Hash estable de 64 bits del hu_id (el hash() de Python cambia entre procesos)."""
+    return int.from_bytes(hashlib.blake2b(hu_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _table_size(count: int) -> int:
+    size = 8
+    while size * _LOAD_FACTOR < count:
+        size *= 2
+    return size
+
+
+def write_hu_store(source: Union[str, Path], target: Union[str, Path]) -> int:
+    """
+    Convierte un fichero de casos de prueba (array JSON o NDJSON) al formato .hus.
+    El origen se recorre en streaming dos veces: una para agrupar offsets por HU y otra
+    para escribir los casos de cada HU juntos. Se escribe en un temporal y se sustituye
+    de forma atómica, así que los lectores con el fichero anterior abierto no se ven afectados.
+    Returns:
+        int: Número de HUs escritas.
+    """
+    groups = {}
+    for case, offset, length in iter_test_cases_with_offsets(source):
+        hu_id = case.get("hu_id")
+        if hu_id:
+            groups.setdefault(str(hu_id), []).append((offset, length))
+
+    slots = _table_size(len(groups))
+    table = [(0, 0)] * slots
+    mask = slots - 1
+    tmp_path = f"{target}.tmp"
+    with open(source, "rb") as src, open(tmp_path, "wb") as out:
+        out.write(b"\0" * _HEADER.size)
+        for hu_id, positions in groups.items():
+            cases = []
+            for offset, length in positions:
+                src.seek(offset)
+                cases.append(json.loads(src.read(length)))
+            key = hu_id.encode("utf-8")
+            payload = json.dumps(cases, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            record_offset = out.tell()
+            out.write(_KEY_LEN.pack(len(key)) + key + _PAYLOAD_LEN.pack(len(payload)) + payload)
+
+            key_hash = hu_key_hash(hu_id)
+            i = key_hash & mask
+            while table[i][1]:
+                i = (i + 1) & mask
+            table[i] = (key_hash, record_offset)
+
+        table_offset = out.tell()
+        out.write(b"".join(_SLOT.pack(h, o) for h, o in table))
+        out.seek(0)
+        out.write(_HEADER.pack(MAGIC, VERSION, 0, len(groups), slots, table_offset))
+    os.replace(tmp_path, target)
+    return len(groups)
+
+
+def is_hu_store(path: Union[str, Path]) -> bool:
+    return Path(path).suffix.lower() == HU_STORE_SUFFIX
+
+
+class HUStore:
+    """
+    Lector de ficheros .hus: abre el fichero con mmap y lee una HU sin tocar el resto.
+    Con sequential=True (recorridos completos, p.ej. agents.pgp_bulk) se pide readahead
+    al kernel en lugar de desactivarlo.
+    """
+    def __init__(self, path: Union[str, Path], sequential: bool = False):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Consultas sueltas: sin readahead solo se cargan las páginas que se leen
+        advice = getattr(mmap, "MADV_SEQUENTIAL" if sequential else "MADV_RANDOM", None)
+        if advice is not None:
+            self._mm.madvise(advice)
+        magic, version, _, self.count, self.slots, self.table_offset = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{self.path} no es un fichero .hus válido")
+        self._mask = self.slots - 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _read_key(self, record_offset: int) -> bytes:
+        (key_len,) = _KEY_LEN.unpack_from(self._mm, record_offset)
+        start = record_offset + _KEY_LEN.size
+        return self._mm[start:start + key_len]
+
+    def _read_payload(self, record_offset: int) -> bytes:
+        (key_len,) = _KEY_LEN.unpack_from(self._mm, record_offset)
+        length_offset = record_offset + _KEY_LEN.size + key_len
+        (payload_len,) = _PAYLOAD_LEN.unpack_from(self._mm, length_offset)
+        start = length_offset + _PAYLOAD_LEN.size
+        return self._mm[start:start + payload_len]
+
+    def _find(self, hu_id: str) -> Optional[int]:
+        key = hu_id.encode("utf-8")
+        key_hash = hu_key_hash(hu_id)
+        i = key_hash & self._mask
+        while True:
+            slot_hash, record_offset = _SLOT.unpack_from(self._mm, self.table_offset + i * _SLOT.size)
+            if not record_offset:
+                return None
+            if slot_hash == key_hash and self._read_key(record_offset) == key:
+                return record_offset
+            i = (i + 1) & self._mask
+
+    def get_cases(self, hu_id: str) -> List[dict]:
+        """
+        Devuelve los casos de prueba de una HU (lista vacía si no existe).
+        """
+        record_offset = self._find(hu_id)
+        if record_offset is None:
+            return []
+        return self.get_cases_at(record_offset)
+
+    def get_cases_at(self, record_offset: int) -> List[dict]:
+        """
+        Devuelve los casos del registro que empieza en record_offset (ver records()).
+        """
+        return json.loads(self._read_payload(record_offset))
+
+    def hu_ids(self) -> Iterator[str]:
+        for i in range(self.slots):
+            _, record_offset = _SLOT.unpack_from(self._mm, self.table_offset + i * _SLOT.size)
+            if record_offset:
+                yield self._read_key(record_offset).decode("utf-8")
+
+    def records(self) -> List[Tuple[str, int]]:
+        """
+        (hu_id, offset del registro) de todas las HUs en el orden del fichero, para
+        recorridos completos con lecturas secuenciales en lugar del orden de la tabla hash.
+        """
+        offsets = sorted(
+            record_offset
+            for _, record_offset in _SLOT.iter_unpack(self._mm[self.table_offset:self.table_offset + self.slots * _SLOT.size])
+            if record_offset
+        )
+        return [(self._read_key(offset).decode("utf-8"), offset) for offset in offsets]
+
+    def close(self):
+        self._mm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte casos de prueba (JSON o NDJSON) al formato binario .hus")
+    parser.add_argument("source", help="fichero de casos de prueba, p.ej. data/test_cases.json")
+    parser.add_argument("target", nargs="?", help="fichero .hus de salida (por defecto, el origen con extensión .hus)")
+    args = parser.parse_args()
+    target = args.target or str(Path(args.source).with_suffix(HU_STORE_SUFFIX))
+    count = write_hu_store(args.source, target)
+    print(f"{count} HUs escritas en {target} ({os.path.getsize(target) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
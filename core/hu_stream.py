@@ -0,0 +1,123 @@
+# core/hu_stream.py
+import os
+import json
+import codecs
+from pathlib import Path
+from typing import BinaryIO, Iterator, Tuple, Union
+
+# Tamaño de cada lectura del parser incremental
+HU_STREAM_CHUNK_SIZE = int(os.getenv("HU_STREAM_CHUNK_SIZE", str(1024 * 1024)))
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(f: BinaryIO, chunk_size: int = HU_STREAM_CHUNK_SIZE) -> Iterator[Tuple[object, int, int]]:
+    """
+    Recorre un array JSON de nivel superior elemento a elemento sin cargar el documento.
+
+    Lee el fichero por bloques, decodifica cada elemento con JSONDecoder.raw_decode y
+    descarta el texto ya consumido, así que la memoria depende del tamaño del bloque y
+    del elemento más grande, no del fichero.
+    Yields:
+        (elemento, offset en bytes, longitud en bytes) de cada elemento del array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    text, idx = "", 0
+    pos = 0           # offset en bytes de text[idx]
+    ascii_only = True
+    eof = False
+    started = False
+    read_size = chunk_size
+
+    def fill() -> bool:
+        nonlocal text, idx, ascii_only, eof
+        if eof:
+            return False
+        data = f.read(read_size)
+        eof = not data
+        # Se descarta lo consumido antes de añadir el bloque nuevo
+        text = text[idx:] + utf8.decode(data, final=eof)
+        idx = 0
+        ascii_only = text.isascii()
+        return bool(data)
+
+    fill()
+    while True:
+        # Saltar espacios, la apertura del array y las comas (todos ASCII: 1 carácter = 1 byte)
+        while True:
+            while idx < len(text) and text[idx] in _WHITESPACE:
+                idx += 1
+                pos += 1
+            if idx == len(text):
+                if not fill():
+                    raise ValueError("JSON incompleto: falta el cierre del array")
+                continue
+            char = text[idx]
+            if not started:
+                if char != "[":
+                    raise ValueError("Se esperaba un array JSON de casos de prueba")
+                started = True
+            elif char == "]":
+                return
+            elif char != ",":
+                break
+            idx += 1
+            pos += 1
+
+        try:
+            obj, end = decoder.raw_decode(text, idx)
+            truncated = end == len(text) and not eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            truncated = True
+        if truncated:
+            # Elemento cortado por el final del bloque: leer más (cada vez más si sigue sin caber)
+            fill()
+            read_size *= 2
+            continue
+        read_size = chunk_size
+        length = end - idx if ascii_only else len(text[idx:end].encode("utf-8"))
+        yield obj, pos, length
+        idx = end
+        pos += length
+
+
+def iter_ndjson(f: BinaryIO) -> Iterator[Tuple[object, int, int]]:
+    """
+    Recorre un fichero NDJSON (un objeto JSON por línea).
+    Yields:
+        (objeto, offset en bytes, longitud en bytes) de cada línea no vacía.
+    """
+    offset = 0
+    for line in f:
+        stripped = line.strip()
+        if stripped:
+            yield json.loads(stripped), offset + (len(line) - len(line.lstrip())), len(stripped)
+        offset += len(line)
+
+
+def is_ndjson(path: Union[str, Path]) -> bool:
+    return Path(path).suffix.lower() in NDJSON_SUFFIXES
+
+
+def iter_test_cases_with_offsets(path: Union[str, Path]) -> Iterator[Tuple[dict, int, int]]:
+    """
+    Recorre los casos de prueba de un fichero JSON (array) o NDJSON con su posición en bytes.
+    """
+    with open(path, "rb") as f:
+        records = iter_ndjson(f) if is_ndjson(path) else iter_json_array(f)
+        for case, offset, length in records:
+            if isinstance(case, dict):
+                yield case, offset, length
+
+
+def iter_test_cases(path: Union[str, Path]) -> Iterator[dict]:
+    """
+    Recorre los casos de prueba de un fichero JSON (array) o NDJSON sin materializarlo entero.
+    """
+    for case, _, _ in iter_test_cases_with_offsets(path):
+        yield case
@@ -0,0 +1,363 @@
+# core/in_memory_task_manager.py
+import os
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional
+
+from core.task_base import TaskManager
+from core.custom_types import (
+    SendTaskRequest,
+    GetTaskRequest,
+    CancelTaskRequest,
+    JSONRPCResponse,
+    JSONRPCError,
+    Task,
+    TaskState,
+    InternalError,
+    TaskNotFoundError,
+    TaskNotCancelableError,
+)
+
+if TYPE_CHECKING:
+    from core.shared_state import SharedTaskStore
+
+logger = logging.getLogger(__name__)
+
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+TASK_QUEUE_SIZE = int(os.getenv("TASK_QUEUE_SIZE", "1000"))
+TASK_STORE_MAX = int(os.getenv("TASK_STORE_MAX", "10000"))
+TASK_RESULT_TTL_SECONDS = float(os.getenv("TASK_RESULT_TTL_SECONDS", "3600"))
+# Espera por defecto de tasks/send antes de responder (si la tarea termina antes, se devuelve
+# ya COMPLETED) y máximo que puede pedir un cliente con params.wait_seconds
+TASK_SEND_WAIT_SECONDS = float(os.getenv("TASK_SEND_WAIT_SECONDS", "2"))
+TASK_MAX_WAIT_SECONDS = float(os.getenv("TASK_MAX_WAIT_SECONDS", "30"))
+# Modo multi-worker: cada cuánto late el worker en el almacén compartido y tras cuánto
+# tiempo sin latir se marcan ERROR las tareas activas que ejecutaba (worker caído)
+TASK_HEARTBEAT_SECONDS = float(os.getenv("TASK_HEARTBEAT_SECONDS", "5"))
+TASK_ORPHAN_SECONDS = float(os.getenv("TASK_ORPHAN_SECONDS", "30"))
+
+TaskHandler = Callable[[SendTaskRequest], Awaitable[dict]]
+
+# Cada cuánto se borran del almacén compartido las tareas caducadas y se buscan tareas
+# huérfanas (modo multi-worker)
+_SHARED_PURGE_INTERVAL = 60.0
+# Intervalo de consulta al esperar una tarea de otro worker (modo multi-worker)
+_SHARED_WAIT_POLL = 0.05
+
+
+class InMemoryTaskManager(TaskManager):
+    """
+    TaskManager con cola de trabajo en proceso y pool de workers asyncio.
+
+    tasks/send encola la tarea y responde con ella en cuanto termina o, como mucho, tras
+    params.wait_seconds (TASK_SEND_WAIT_SECONDS por defecto; 0 = de inmediato, en estado
+    SUBMITTED). Las generaciones cortas se resuelven en una sola llamada y las largas se
+    consultan con tasks/get, que también acepta wait_seconds (long polling: responde en
+    cuanto la tarea termina). El id de la tarea lo puede proponer el cliente (params.id);
+    un tasks/send repetido con el mismo id devuelve la tarea existente. Los workers pasan
+    la tarea a WORKING y ejecutan el handler. Los resultados se guardan en un
+    almacén acotado: las tareas terminadas caducan tras ttl_seconds y, si se supera
+    max_tasks, se descartan primero las terminadas más antiguas.
+
+    Con shared_store (modo multi-worker) cada tarea se ejecuta en el worker que recibió
+    tasks/send, pero su estado se escribe también en el almacén compartido: tasks/get y
+    tasks/cancel funcionan desde cualquier worker. Una cancelación desde otro worker no
+    interrumpe la llamada en curso, pero la tarea termina CANCELED y su resultado se descarta.
+    El almacén compartido se usa desde un único hilo (fuera del event loop y en el orden
+    de las llamadas), y un bucle de mantenimiento publica el heartbeat del worker, marca
+    ERROR las tareas de workers caídos y borra las caducadas.
+    """
+    def __init__(
+        self,
+        handler: TaskHandler,
+        num_workers: int = TASK_WORKERS,
+        queue_size: int = TASK_QUEUE_SIZE,
+        max_tasks: int = TASK_STORE_MAX,
+        ttl_seconds: float = TASK_RESULT_TTL_SECONDS,
+        shared_store: Optional["SharedTaskStore"] = None
+    ):
+        self.handler = handler
+        self.num_workers = num_workers
+        self.max_tasks = max_tasks
+        self.ttl_seconds = ttl_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: "OrderedDict[str, Task]" = OrderedDict()
+        self._requests: Dict[str, SendTaskRequest] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        # Se activa cuando la tarea termina (espera de tasks/send y tasks/get)
+        self._done: Dict[str, asyncio.Event] = {}
+        self._workers: list = []
+        self._stopping = False
+        self._shared = shared_store
+        self._shared_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-tasks") if shared_store else None
+        self._maintenance: Optional[asyncio.Task] = None
+        self._shared_counts: Dict[str, int] = {}
+
+    # --- Workers ---
+    def _ensure_workers(self):
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.num_workers:
+            # Contexto vacío: los workers no deben heredar el de la petición que los arrancó
+            # (p.ej. su traza); cada tarea trae el suyo en params.metadata
+            self._workers.append(contextvars.Context().run(asyncio.create_task, self._worker()))
+
+    async def _shared_call(self, fn, *args):
+        """Operación del almacén compartido en su hilo: no bloquea el loop y respeta el orden."""
+        return await asyncio.get_running_loop().run_in_executor(self._shared_executor, partial(fn, *args))
+
+    def _ensure_maintenance(self):
+        if self._shared is None or (self._maintenance is not None and not self._maintenance.done()):
+            return
+        # El primer heartbeat se encola ya, antes que cualquier put de este worker
+        first = asyncio.get_running_loop().run_in_executor(self._shared_executor, self._shared.heartbeat)
+        self._maintenance = contextvars.Context().run(asyncio.create_task, self._maintenance_loop(first))
+
+    async def _maintenance_loop(self, first: asyncio.Future):
+        purged_at = 0.0
+        while True:
+            try:
+                if first is not None:
+                    beat, first = first, None
+                    await beat
+                else:
+                    await self._shared_call(self._shared.heartbeat)
+                if time.monotonic() - purged_at >= _SHARED_PURGE_INTERVAL:
+                    purged_at = time.monotonic()
+                    self._purge()
+                    orphans = await self._shared_call(self._shared.mark_orphans, TASK_ORPHAN_SECONDS)
+                    if orphans:
+                        logger.warning(f"{orphans} tareas de workers caídos marcadas ERROR")
+                    await self._shared_call(self._shared.purge, self.ttl_seconds)
+                self._shared_counts = await self._shared_call(self._shared.counts)
+            except sqlite3.Error as e:
+                logger.warning(f"Error manteniendo el almacén compartido de tareas: {e}")
+            await asyncio.sleep(TASK_HEARTBEAT_SECONDS)
+
+    async def _worker(self):
+        while True:
+            task_id = await self._queue.get()
+            try:
+                await self._execute(task_id)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, task_id: str):
+        task = self._tasks.get(task_id)
+        request = self._requests.pop(task_id, None)
+        if task is None or request is None or task.state != TaskState.SUBMITTED:
+            return
+        await self._update(task, TaskState.WORKING)
+        if task.state != TaskState.WORKING:
+            # Cancelada mientras se guardaba el estado (aquí o desde otro worker)
+            return
+        run = asyncio.create_task(self.handler(request))
+        self._running[task_id] = run
+        try:
+            result = await run
+            if task.state != TaskState.CANCELED:
+                await self._update(task, TaskState.COMPLETED, result=result)
+        except asyncio.CancelledError:
+            if run.cancelled() and not self._stopping:
+                # tasks/cancel: el worker sigue con la siguiente tarea
+                await self._update(task, TaskState.CANCELED)
+            else:
+                # Cancelación del propio worker (apagado del servicio)
+                run.cancel()
+                await self._update(task, TaskState.CANCELED)
+                raise
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"Tarea {task_id} terminó con error: {detail}")
+            await self._update(task, TaskState.ERROR, error=str(detail))
+        finally:
+            self._running.pop(task_id, None)
+
+    async def shutdown(self):
+        # Si un tasks/cancel coincide con el apagado, el worker no debe tomar su propia
+        # cancelación por la de la tarea y seguir esperando en la cola
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._stopping = False
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            await asyncio.gather(self._maintenance, return_exceptions=True)
+            self._maintenance = None
+        if self._shared is not None:
+            # Las tareas encoladas sin empezar no las ejecutará nadie
+            await self._shared_call(self._shared.release, "El worker se detuvo antes de ejecutar la tarea")
+
+    # --- Almacén de tareas ---
+    async def _update(self, task: Task, state: str, result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+        """
+        Cambia el estado de la tarea. False si ya estaba cancelada desde otro worker.
+        """
+        task.state = state
+        task.result = result
+        task.error = error
+        task.updated_at = time.time()
+        ok = True
+        if self._shared is not None and not await self._shared_call(self._shared.update, task.model_copy()):
+            task.state, task.result, task.error = TaskState.CANCELED, None, None
+            ok = False
+        if task.state in TaskState.TERMINAL and task.id in self._done:
+            self._done[task.id].set()
+        return ok
+
+    def _purge(self, room: int = 0):
+        """
+        Borra las tareas terminadas caducadas y, si con room tareas nuevas se superaría
+        max_tasks, las terminadas más antiguas.
+        """
+        now = time.time()
+        if self.ttl_seconds > 0:
+            expired = [
+                task_id for task_id, task in self._tasks.items()
+                if task.state in TaskState.TERMINAL and now - task.updated_at > self.ttl_seconds
+            ]
+            for task_id in expired:
+                del self._tasks[task_id]
+                self._done.pop(task_id, None)
+        if len(self._tasks) + room > self.max_tasks:
+            for task_id in [t for t, task in self._tasks.items() if task.state in TaskState.TERMINAL]:
+                del self._tasks[task_id]
+                self._done.pop(task_id, None)
+                if len(self._tasks) + room <= self.max_tasks:
+                    break
+        # Lo caducado del almacén compartido lo borra el bucle de mantenimiento, que en
+        # modo multi-worker también repite esta purga local sin esperar a un tasks/send
+        self._ensure_maintenance()
+
+    async def _get(self, task_id: str) -> Task:
+        # En modo multi-worker el almacén compartido manda: la tarea puede ser de otro worker
+        if self._shared is not None:
+            task = await self._shared_call(self._shared.get, task_id)
+        else:
+            task = self._tasks.get(task_id)
+        if task is None:
+            raise TaskNotFoundError(f"Tarea '{task_id}' no encontrada")
+        return task
+
+    async def _find(self, task_id: str) -> Optional[Task]:
+        try:
+            return await self._get(task_id)
+        except TaskNotFoundError:
+            return None
+
+    async def wait_for(self, task_id: str, timeout: float) -> Task:
+        """
+        Devuelve la tarea en cuanto termina o, si no, tras timeout segundos.
+        """
+        task = await self._get(task_id)
+        if timeout <= 0 or task.state in TaskState.TERMINAL:
+            return task
+        done = self._done.get(task_id)
+        if done is not None:
+            try:
+                await asyncio.wait_for(done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return await self._get(task_id)
+        # Tarea de otro worker (modo multi-worker): se consulta el almacén compartido
+        deadline = time.monotonic() + timeout
+        while task.state not in TaskState.TERMINAL:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(_SHARED_WAIT_POLL, remaining))
+            task = await self._get(task_id)
+        return task
+
+    @staticmethod
+    def _wait_seconds(requested: Optional[float], default: float) -> float:
+        wait = default if requested is None else requested
+        return min(max(wait, 0.0), TASK_MAX_WAIT_SECONDS)
+
+    def stats(self) -> dict:
+        counts: Dict[str, int] = {}
+        for task in self._tasks.values():
+            counts[task.state] = counts.get(task.state, 0) + 1
+        stats = {
+            "queued": self._queue.qsize(),
+            "running": len(self._running),
+            "workers": self.num_workers,
+            "stored": len(self._tasks),
+            "by_state": counts
+        }
+        if self._shared is not None:
+            # Recuento del último ciclo de mantenimiento (sin consultar SQLite desde el loop)
+            stats["shared_by_state"] = self._shared_counts
+        return stats
+
+    @staticmethod
+    def _error_response(request_id, exc) -> JSONRPCResponse:
+        return JSONRPCResponse(id=request_id, error=JSONRPCError(code=exc.code, message=exc.message))
+
+    # --- Métodos JSON-RPC ---
+    async def on_send_task(self, request: SendTaskRequest) -> JSONRPCResponse:
+        self._purge(room=1)
+        wait = self._wait_seconds(request.params.wait_seconds, TASK_SEND_WAIT_SECONDS)
+        # Reintento de un tasks/send que ya llegó: se devuelve la tarea existente
+        task = None
+        if request.params.id:
+            task = self._tasks.get(request.params.id) or await self._find(request.params.id)
+        if task is None:
+            if len(self._tasks) >= self.max_tasks or self._queue.full():
+                return self._error_response(request.id, InternalError("Cola de tareas llena, reintente más tarde"))
+            self._ensure_workers()
+            now = time.time()
+            task = Task(
+                id=request.params.id or str(uuid.uuid4()),
+                session_id=request.params.session_id,
+                state=TaskState.SUBMITTED,
+                created_at=now,
+                updated_at=now
+            )
+            self._tasks[task.id] = task
+            self._requests[task.id] = request
+            self._done[task.id] = asyncio.Event()
+            self._queue.put_nowait(task.id)
+            if self._shared is not None:
+                # Se encola en el hilo del almacén antes que el WORKING del worker
+                await self._shared_call(self._shared.put, task.model_copy())
+        return JSONRPCResponse(id=request.id, result=await self.wait_for(task.id, wait))
+
+    async def on_get_task(self, request: GetTaskRequest) -> JSONRPCResponse:
+        try:
+            task = await self.wait_for(request.params.id, self._wait_seconds(request.params.wait_seconds, 0.0))
+        except TaskNotFoundError as e:
+            return self._error_response(request.id, e)
+        return JSONRPCResponse(id=request.id, result=task)
+
+    async def on_cancel_task(self, request: CancelTaskRequest) -> JSONRPCResponse:
+        try:
+            task = await self._get(request.params.id)
+            local = self._tasks.get(task.id)
+            if local is not None:
+                task = local
+            if task.state in TaskState.TERMINAL:
+                raise TaskNotCancelableError(f"La tarea '{task.id}' ya terminó ({task.state})")
+            if local is None:
+                # Tarea de otro worker: se marca cancelada en el almacén compartido
+                task = await self._shared_call(self._shared.cancel, task.id) if self._shared is not None else None
+                if task is None:
+                    raise TaskNotCancelableError(f"La tarea '{request.params.id}' ya terminó")
+                return JSONRPCResponse(id=request.id, result=task)
+        except (TaskNotFoundError, TaskNotCancelableError) as e:
+            return self._error_response(request.id, e)
+        task = local
+        running = self._running.get(task.id)
+        if running is not None:
+            running.cancel()
+        self._requests.pop(task.id, None)
+        await self._update(task, TaskState.CANCELED)
+        return JSONRPCResponse(id=request.id, result=task)
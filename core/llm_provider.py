@@ -0,0 +1,36 @@
+# core/llm_provider.py
+"""
+Selección del proveedor de LLM de cada servicio.
+
+Cada servicio elige su proveedor con una variable de entorno (LLM_PROVIDER en el Agente PGP,
+ORCHESTRATOR_LLM_PROVIDER en el orquestador) y pasa a build_chat_model las opciones de cada
+proveedor que soporta. El paquete de cada proveedor (y LangChain) solo se importa al crear
+el modelo, así que importar este módulo no cuesta nada: los servicios lo llaman en la
+primera petición o en la precarga del arranque (ver core/health.py).
+
+Con "fake" se usa el LLM falso determinista de core/fake_llm.py (pruebas de carga).
+"""
+from typing import Any, Dict
+
+PROVIDERS = ("ollama", "azure", "fake")
+
+
+def build_chat_model(provider: str, **options: Dict[str, Any]):
+    """
+    Crea el modelo de chat del proveedor indicado.
+    Args:
+        provider: ollama | azure | fake
+        options: argumentos del constructor por proveedor, p.ej. ollama={"model": "llama3"}.
+    """
+    provider = provider.lower()
+    kwargs = options.get(provider) or {}
+    if provider == "fake":
+        from core.fake_llm import FakeChatModel
+        return FakeChatModel(**kwargs)
+    if provider == "ollama":
+        from langchain_ollama import ChatOllama
+        return ChatOllama(**kwargs)
+    if provider == "azure":
+        from langchain_openai import AzureChatOpenAI
+        return AzureChatOpenAI(**kwargs)
+    raise ValueError(f"Proveedor de LLM desconocido: '{provider}' (opciones: {', '.join(PROVIDERS)})")
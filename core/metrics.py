@@ -0,0 +1,489 @@
+# core/metrics.py
+"""
+Métricas en formato de exposición de Prometheus (text/plain; version=0.0.4), sin dependencias.
+
+Cada servicio llama a install_metrics(app, "nombre") al crear la app FastAPI: se añade un
+middleware ASGI que cuenta peticiones y mide su latencia por ruta (plantilla de la ruta, no
+la URL, para acotar la cardinalidad) y el endpoint GET /metrics.
+
+Además de las métricas HTTP, el módulo define las compartidas por los servicios:
+  - JSON-RPC por método (track_jsonrpc)
+  - duración de las llamadas al LLM y respuestas por método clásico (fallback)
+  - latencia por salto hacia otros servicios (observe_upstream / MeteredTransport)
+  - estadísticas que ya exponen los componentes (stats()), leídas al hacer scrape
+
+En modo multi-worker (core/shared_state.py) cada worker publica su exposición en SQLite
+cada METRICS_SHARED_INTERVAL segundos y GET /metrics, lo atienda el worker que lo atienda,
+devuelve las series de todos con la etiqueta worker (pid); en Prometheus se agregan con
+sum without (worker).
+"""
+import os
+import re
+import time
+import bisect
+import asyncio
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from core.shared_state import SharedKV, shared_state_enabled
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "a2a")
+# Límites superiores (segundos) de los buckets de los histogramas de latencia
+METRICS_LATENCY_BUCKETS = tuple(
+    float(b) for b in os.getenv(
+        "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120"
+    ).split(",") if b.strip()
+)
+
+# Modo multi-worker: cada cuánto publica cada worker sus métricas (las de más de 3 intervalos se descartan)
+METRICS_SHARED_INTERVAL = float(os.getenv("METRICS_SHARED_INTERVAL", "5"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_INVALID_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[Tuple[str, tuple, tuple, float]]:
+        raise NotImplementedError
+
+    def render(self, const_names: tuple, const_values: tuple) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self._samples():
+            labels = _format_labels(const_names + names, const_values + values)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [("", self.labelnames, key, value) for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [("", self.labelnames, key, value) for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Cada observación incrementa solo su bucket; los acumulados se calculan al exponer
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        samples = []
+        names = self.labelnames + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", names, key + (_format_value(bound),), cumulative))
+            samples.append(("_sum", self.labelnames, key, total))
+            samples.append(("_count", self.labelnames, key, count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas del proceso. Las etiquetas constantes (p.ej. service) se añaden a
+    todas las muestras; los collectors se leen en cada scrape.
+    """
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self.const_labels: Dict[str, str] = {}
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Tuple[str, Callable[[], dict]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames, **kwargs):
+        full_name = f"{self.prefix}_{name}" if self.prefix else name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, documentation, tuple(labelnames), **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrica {full_name} ya existe con otro tipo")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        # En el formato de texto 0.0.4 el nombre de la familia de un counter incluye _total
+        return self._get_or_create(Counter, f"{name}_total", documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_collector(self, name: str, stats_fn: Callable[[], dict]):
+        """
+        Expone como gauges los valores numéricos del dict que devuelve stats_fn()
+        (p.ej. task_manager.stats): {prefix}_{name}_{clave}. Los dicts anidados se aplanan.
+        """
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c[0] != name] + [(name, stats_fn)]
+
+    def _collect(self, name: str, stats_fn: Callable[[], dict]) -> List[str]:
+        try:
+            stats = stats_fn()
+        except Exception as e:
+            logger.warning(f"Error leyendo las estadísticas '{name}' para /metrics: {e}")
+            return []
+        const_names, const_values = tuple(self.const_labels), tuple(self.const_labels.values())
+        labels = _format_labels(const_names, const_values)
+        lines = []
+
+        def walk(path: str, value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    walk(f"{path}_{key}", item)
+            elif isinstance(value, (int, float)):
+                metric = _INVALID_NAME.sub("_", f"{self.prefix}_{path}" if self.prefix else path)
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric}{labels} {_format_value(float(value))}")
+
+        walk(name, stats)
+        return lines
+
+    def render(self) -> str:
+        const_names, const_values = tuple(self.const_labels), tuple(self.const_labels.values())
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render(const_names, const_values))
+        for name, stats_fn in collectors:
+            lines.extend(self._collect(name, stats_fn))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def merge_worker_expositions(expositions: Dict[str, str]) -> str:
+    """
+    Une las exposiciones de varios workers ({worker: texto}) en una sola: cada muestra
+    recibe la etiqueta worker y las de una misma familia quedan juntas tras su HELP/TYPE.
+    """
+    families: Dict[str, List[str]] = {}
+    for worker, text in expositions.items():
+        worker_label = f'worker="{_escape(worker)}"'
+        family = None
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith("#"):
+                family = line.split(" ", 3)[2]
+                meta = families.setdefault(family, [])
+                if line not in meta:
+                    meta.append(line)
+                continue
+            name, brace, rest = line.partition("{")
+            if brace:
+                sample = f"{name}{{{worker_label},{rest}" if not rest.startswith("}") else f"{name}{{{worker_label}{rest}"
+            else:
+                name, _, value = line.rpartition(" ")
+                sample = f"{name}{{{worker_label}}} {value}"
+            families.setdefault(family or name, []).append(sample)
+    return "\n".join(line for lines in families.values() for line in lines) + "\n"
+
+
+class SharedMetricsPublisher:
+    """
+    Publica la exposición de este worker en el estado compartido y compone la de todos los
+    workers vivos para GET /metrics. La publicación periódica es una tarea del event loop
+    (los stats() de los componentes no son seguros entre hilos); solo la escritura en
+    SQLite va a un hilo.
+    """
+    def __init__(self, registry: MetricsRegistry, store: SharedKV, interval: float = METRICS_SHARED_INTERVAL):
+        self.registry = registry
+        self.store = store
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self):
+        await asyncio.to_thread(self.store.set, str(os.getpid()), self.registry.render())
+
+    def ensure_started(self):
+        """
+        Arranca la publicación en la primera petición: así solo la tienen los workers que
+        atienden peticiones, no el proceso supervisor de uvicorn.
+        """
+        if self._task is None or self._task.done():
+            # Contexto vacío: la tarea no debe heredar la traza de la petición que la arrancó
+            self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._loop())
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.warning(f"No se pudieron publicar las métricas del worker: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def render(self) -> str:
+        self.ensure_started()
+        await self.publish()
+        snapshots = await asyncio.to_thread(self.store.items, self.interval * 3)
+        return merge_worker_expositions(snapshots)
+
+
+# --- Métricas compartidas por los servicios ---
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests", "Peticiones HTTP atendidas", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta (respuesta completa)",
+    ("method", "route"))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "Peticiones HTTP en curso")
+
+JSONRPC_REQUESTS = REGISTRY.counter(
+    "jsonrpc_requests", "Peticiones JSON-RPC por método y resultado", ("method", "outcome"))
+JSONRPC_LATENCY = REGISTRY.histogram(
+    "jsonrpc_request_duration_seconds", "Latencia de las peticiones JSON-RPC por método", ("method",))
+
+LLM_LATENCY = REGISTRY.histogram(
+    "llm_call_duration_seconds", "Duración de las llamadas al LLM", ("mode", "outcome"))
+LLM_IN_FLIGHT = REGISTRY.gauge(
+    "llm_calls_in_flight", "Llamadas al LLM en curso")
+LLM_FALLBACKS = REGISTRY.counter(
+    "llm_fallbacks", "Respuestas generadas por el método clásico porque falló el LLM", ("mode",))
+
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "upstream_request_duration_seconds",
+    "Latencia por salto hacia otros servicios (hasta las cabeceras; en streaming A2A, el stream completo)",
+    ("target", "operation", "outcome"))
+
+HTTP_IN_FLIGHT.set(0)
+LLM_IN_FLIGHT.set(0)
+
+# Métodos JSON-RPC conocidos; el resto se agrupa como "unknown" para acotar la cardinalidad
+JSONRPC_METHODS = {"tasks/send", "tasks/get", "tasks/cancel", "tasks/sendSubscribe", "get_agent_card"}
+
+
+def _status_outcome(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+def observe_upstream(target: str, operation: str, seconds: float, outcome: str):
+    UPSTREAM_LATENCY.observe(seconds, target=target, operation=operation, outcome=outcome)
+
+
+@contextmanager
+def track_jsonrpc(method: Optional[str]):
+    """
+    Mide una petición JSON-RPC. El bloque puede fijar outcome["value"]; por defecto es
+    "ok", y "exception" si el bloque lanza una excepción.
+    """
+    method = method if method in JSONRPC_METHODS else "unknown"
+    outcome = {"value": "ok"}
+    start = time.perf_counter()
+    try:
+        yield outcome
+    except BaseException:
+        outcome["value"] = "exception"
+        raise
+    finally:
+        JSONRPC_LATENCY.observe(time.perf_counter() - start, method=method)
+        JSONRPC_REQUESTS.inc(method=method, outcome=outcome["value"])
+
+
+def jsonrpc_outcome(response) -> str:
+    """
+    Resultado de una respuesta JSON-RPC para las métricas: "error" si trae error, si no "ok".
+    """
+    if isinstance(response, dict) and response.get("error"):
+        return "error"
+    return "ok"
+
+
+@contextmanager
+def track_llm_call(mode: str):
+    """
+    Mide una llamada al LLM (mode: invoke | stream) y el número de llamadas en curso.
+    """
+    LLM_IN_FLIGHT.inc()
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        LLM_IN_FLIGHT.dec()
+        LLM_LATENCY.observe(time.perf_counter() - start, mode=mode, outcome=outcome)
+
+
+class MeteredTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte httpx que registra la latencia de cada petición hacia target, con la ruta
+    de la URL como operación. Con stream=True mide hasta recibir las cabeceras.
+    """
+    def __init__(self, transport: httpx.AsyncBaseTransport, target: str):
+        self._transport = transport
+        self.target = target
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            outcome = _status_outcome(response.status_code)
+            return response
+        finally:
+            observe_upstream(self.target, request.url.path, time.perf_counter() - start, outcome)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: peticiones en curso, contador por (método, ruta, estado) e histograma
+    de latencia por (método, ruta). La ruta es la plantilla registrada en FastAPI; las
+    peticiones que no encajan con ninguna ruta se agrupan en "unmatched". En respuestas en
+    streaming (SSE, NDJSON) la latencia cubre el stream completo.
+    """
+    def __init__(self, app, on_request: Optional[Callable[[], None]] = None):
+        self.app = app
+        self.on_request = on_request
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.on_request is not None:
+            self.on_request()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=path)
+            HTTP_REQUESTS.inc(method=method, route=path, status=str(status["code"]))
+
+
+def install_metrics(app, service: str, collectors: Optional[Dict[str, Callable[[], dict]]] = None):
+    """
+    Añade a una app FastAPI el middleware de métricas y GET /metrics.
+    Args:
+        service: valor de la etiqueta "service" de todas las métricas del proceso.
+        collectors: {nombre: función stats()} expuestas como gauges en cada scrape.
+    """
+    if not METRICS_ENABLED:
+        return
+    from fastapi import Response
+
+    REGISTRY.const_labels = {"service": service}
+    for name, stats_fn in (collectors or {}).items():
+        REGISTRY.register_collector(name, stats_fn)
+    # Varios workers: /metrics devuelve las series de todos (etiqueta worker)
+    shared = SharedMetricsPublisher(REGISTRY, SharedKV(f"metrics_{service}")) if shared_state_enabled() else None
+    app.add_middleware(MetricsMiddleware, on_request=shared.ensure_started if shared else None)
+
+    async def metrics():
+        content = await shared.render() if shared else REGISTRY.render()
+        return Response(content=content, media_type=CONTENT_TYPE)
+
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
@@ -1,26 +1,78 @@
 import os
+import asyncio
 import json
 import logging
 import uuid
-import re
+import threading
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 from host.host_agent import HostAgent
-from langgraph.prebuilt import create_react_agent
-from langchain_ollama import ChatOllama
-from langchain_openai import AzureChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from functools import partial
+from host.remote_agent_client import RemoteAgentClient, close_http_clients
+from core.hu_repository import get_hu_repository
+from core.skill_router import SkillRouter, ROUTER_ENABLED
+from core.single_flight import SingleFlight, make_flight_key
+from core.metrics import install_metrics, track_llm_call
+from core import tracing
+from core.health import STARTUP_WARMUP, install_health
+from core.serve import run_service
+from core.shared_state import SharedKV, shared_state_enabled
+# LangGraph, LangChain y el proveedor del LLM se importan de forma perezosa (ver propiedades
+# llm, routing_prompt y react_agent): con el enrutador local la mayoría de HUs no los usan
+from core.llm_provider import build_chat_model
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 
+# Proveedor del LLM de enrutado: azure | ollama | fake
+ORCHESTRATOR_LLM_PROVIDER = os.getenv("ORCHESTRATOR_LLM_PROVIDER", "azure")
+
+# Máximo de HUs procesándose a la vez en /route-hu (por worker)
+ROUTE_MAX_CONCURRENCY = int(os.getenv("ROUTE_MAX_CONCURRENCY", "32"))
+# Lotes: tamaño máximo y llamadas simultáneas por skill
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Prompt optimizado para forzar tool calling
+ROUTING_PROMPT = """
+Eres un orquestador que decide qué herramienta usar para resolver la HU.
+
+REGLAS IMPORTANTES:
+- Usa SIEMPRE una herramienta. NO respondas con texto libre.
+- Elige SOLO una herramienta de la lista proporcionada.
+- NO inventes herramientas, usa exactamente el nombre definido.
+
+CRITERIOS:
+- Si la HU menciona clima, temperatura o tiempo → usa herramienta `clima`.
+- Si la HU menciona login, credenciales, contraseña, validación, pruebas → usa herramienta `pgp`.
+
+FORMATO OBLIGATORIO:
+No devuelvas texto libre, debes responder invocando la herramienta usando el sistema de acciones interno (Tool Call).
+
+HU:
+{messages}
+"""
+
+# HU que se está enrutando con el agente ReAct: sus herramientas envían los casos completos
+# y dejan aquí la respuesta normalizada de /route-hu
+_current_route: ContextVar[Optional[dict]] = ContextVar("current_route", default=None)
+
 class HURequest(BaseModel):
     hu_id: str
     test_cases: Optional[List[Dict]] = None
+    # Segundos máximos de espera: si la generación no termina antes, se responde
+    # status="submitted" con un task_id para consultarla en GET /tasks/{task_id}.
+    # Sin valor se espera a que termine.
+    wait_seconds: Optional[float] = None
+
+class HUBatchRequest(BaseModel):
+    hu_ids: List[str]
 
 
 class A2AServer:
@@ -28,111 +80,457 @@ class A2AServer:
         self.app = FastAPI(
             title="A2A Orquestador (A2AServer)",
             description="Orquestador multiagente usando HostAgent y JSON-RPC",
-            version="2.0.0"
+            version="2.0.0",
+            lifespan=self._lifespan
         )
         self.AGENT_URLS = os.getenv("AGENT_URLS", "http://localhost:8001,http://localhost:8002").split(",")
-        self.host_agent = HostAgent(self.AGENT_URLS)
-        self.host_agent.initialize()   
+        self._llm = None
+        self._routing_prompt = None
+        self._react_agent = None
+        self._lazy_lock = threading.Lock()
+        self.hu_repository = get_hu_repository()
+        # El descubrimiento de agentes se hace al arrancar (lifespan), no al importar el módulo
+        # Con varios workers las AgentCards descubiertas se comparten entre ellos
+        self.host_agent = HostAgent(
+            self.AGENT_URLS,
+            card_store=SharedKV("orchestrator_agent_cards") if shared_state_enabled() else None
+        )
+        self.skill_router = SkillRouter()
+        self.route_semaphore = asyncio.Semaphore(ROUTE_MAX_CONCURRENCY)
+        self.route_flight = SingleFlight("orchestrator")
         self._add_routes()
+        install_metrics(self.app, "a2a-orquestador", collectors={
+            "router": self.skill_router.stats,
+            "singleflight": self.route_flight.stats,
+        })
+        tracing.install_tracing(self.app, "a2a-orquestador")
+        # /health/ready: pendiente hasta el primer descubrimiento de agentes (y la precarga)
+        self.readiness = install_health(self.app, "a2a-orquestador")
 
-    def load_test_cases(self):
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        await self.startup()
         try:
-            with open("data/test_cases.json", "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return []
+            yield
+        finally:
+            await self.shutdown()
 
-    def find_hu_by_id(self, hu_id: str):
-        test_cases = self.load_test_cases()
-        for test_case in test_cases:
-            if test_case.get("hu_id") == hu_id:
-                return test_case
-        return None
+    async def startup(self):
+        """
+        Lanza en segundo plano el descubrimiento de agentes y la precarga (LLM e índice de
+        HUs): el servidor atiende /health/live de inmediato y /health/ready cuando terminan.
+        """
+        self.readiness.start("agents", self.discover_agents)
+        if STARTUP_WARMUP:
+            self.readiness.start("llm", lambda: asyncio.to_thread(self._warmup))
+            self.readiness.start("hu_index", lambda: asyncio.to_thread(lambda: {"hus": len(self.hu_repository.hu_ids())}))
 
-    def _call_agent_tool(self, input: str, client, skill_id: str):
+    async def discover_agents(self) -> dict:
         """
-        Ejecuta la herramienta (agente remoto) con la HU como input.
+        Descubre los agentes en paralelo (timeout por agente), construye herramientas y
+        enrutador, y lanza el refresco periódico de AgentCards.
         """
-        hu_dict = {"hu_id": "auto", "title": input, "description": ""}
-        logging.info(f"Ejecutando skill '{skill_id}' con HU: {input}")
-        return client.send_task(str(uuid.uuid4()), "session-xyz", json.dumps([hu_dict], ensure_ascii=False))
+        await self.host_agent.initialize_async()
+        self.rebuild_agents()
+        self.host_agent.start_refresher(on_change=self.rebuild_agents)
+        return {"skills": self.host_agent.list_skill_ids()}
 
-    def build_tools(self):
-        tools = []
-        for client in self.host_agent.clients.values():
-            if client.agent_card:
-                for skill in client.agent_card.skills:
-                    # Crear función con partial para fijar client y skill_id
-                    def make_tool(client_ref, skill_ref):
-                        def wrapper(input: str):
-                            return self._call_agent_tool(input, client=client_ref, skill_id=skill_ref)
-                        wrapper.__name__ = skill_ref
-                        wrapper.__doc__ = f"Herramienta para manejar tareas relacionadas con '{skill_ref}'."
-                        return wrapper
-                    tools.append(make_tool(client, skill.id))
-        return tools
+    def _require_agents(self):
+        if not self.readiness.is_ready("agents"):
+            raise HTTPException(status_code=503, detail="Descubrimiento de agentes en curso")
 
-    def _add_routes(self):
-        """
-        Inicializa LLM + LangGraph Agent y define endpoints.
-        """
-        #self.llm = ChatOllama(
-        #    model="mistral",  # Ajusta si usas otro modelo
-        #    temperature=0.2,
-        #    base_url=os.getenv("LLM_URL", "http://localhost:11434")
-        #)
-        self.llm = AzureChatOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION")
+    async def shutdown(self):
+        await self.readiness.stop()
+        await self.host_agent.stop_refresher()
+        await close_http_clients()
+
+    def _build_llm(self):
+        # Azure OpenAI por defecto; ORCHESTRATOR_LLM_PROVIDER=ollama o fake (pruebas de carga)
+        return build_chat_model(
+            ORCHESTRATOR_LLM_PROVIDER,
+            azure={
+                "azure_endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
+                "azure_deployment": os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+                "api_version": os.getenv("AZURE_OPENAI_API_VERSION")
+            },
+            ollama={
+                "model": os.getenv("ORCHESTRATOR_LLM_MODEL", "mistral"),
+                "temperature": 0.2,
+                "base_url": os.getenv("LLM_URL", "http://localhost:11434")
+            }
         )
 
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._lazy_lock:
+                if self._llm is None:
+                    self._llm = self._build_llm()
+        return self._llm
+
+    @property
+    def routing_prompt(self):
+        if self._routing_prompt is None:
+            with self._lazy_lock:
+                if self._routing_prompt is None:
+                    from langchain_core.prompts import ChatPromptTemplate
+                    self._routing_prompt = ChatPromptTemplate.from_template(ROUTING_PROMPT)
+        return self._routing_prompt
+
+    @property
+    def react_agent(self):
+        """
+        Agente ReAct con las herramientas actuales; se crea al primer uso y se descarta
+        cuando cambian las AgentCard.
+        """
+        agent = self._react_agent
+        if agent is None:
+            from langgraph.prebuilt import create_react_agent
+            agent = create_react_agent(tools=self.tools, model=self.llm, prompt=self.routing_prompt)
+            self._react_agent = agent
+        return agent
+
+    @react_agent.setter
+    def react_agent(self, agent):
+        self._react_agent = agent
+
+    def _warmup(self) -> dict:
+        """
+        Importa LangGraph/LangChain y crea el LLM y el prompt (se ejecuta en un hilo al arrancar).
+        """
+        import langgraph.prebuilt  # noqa: F401
+        return {"provider": ORCHESTRATOR_LLM_PROVIDER, "model": type(self.llm).__name__,
+                "prompt_variables": self.routing_prompt.input_variables}
+
+    def rebuild_agents(self):
+        """
+        Reconstruye herramientas e índice del enrutador (y descarta el agente ReAct) a partir
+        de las AgentCard actuales. Se invoca al arrancar y cada vez que cambian las tarjetas.
+        """
         self.tools = self.build_tools()
+        self.skill_router.build(self.host_agent.list_skills())
+        self._react_agent = None
+        logging.info(f"[Orquestador] Herramientas disponibles: {[t.__name__ for t in self.tools]}")
 
-        # Prompt optimizado para forzar tool calling
-        prompt = ChatPromptTemplate.from_template("""
-Eres un orquestador que decide qué herramienta usar para resolver la HU.
+    def find_hu_by_id(self, hu_id: str):
+        return self.hu_repository.get_first(hu_id)
 
-REGLAS IMPORTANTES:
-- Usa SIEMPRE una herramienta. NO respondas con texto libre.
-- Elige SOLO una herramienta de la lista proporcionada.
-- NO inventes herramientas, usa exactamente el nombre definido.
+    async def _acall_agent_tool(self, input: str, skill_id: str):
+        """
+        Herramienta del agente ReAct: envía al agente remoto los casos completos de la HU que
+        se está enrutando (no solo el texto que pasa el LLM) y guarda la respuesta normalizada
+        para que /route-hu responda igual que con el enrutado local.
+        """
+        route = _current_route.get()
+        if route is None:
+            raise RuntimeError(f"La herramienta '{skill_id}' solo puede usarse al enrutar una HU")
+        if route["response"] is None:
+            logging.info(f"Ejecutando skill '{skill_id}' con HU {route['hu_id']} (elegida por el LLM)")
+            with tracing.start_span("tool.call", skill=skill_id):
+                route["response"] = await self._dispatch(route["hu_id"], skill_id, route["hu_cases"], route["wait"])
+        response = route["response"]
+        return json.dumps({"status": response["status"], "message": response["message"]}, ensure_ascii=False)
 
-CRITERIOS:
-- Si la HU menciona clima, temperatura o tiempo → usa herramienta `clima`.
-- Si la HU menciona login, credenciales, contraseña, validación, pruebas → usa herramienta `pgp`.
+    async def select_skill(self, hu_text: str) -> Optional[str]:
+        """
+        Elige la skill para la HU sin ejecutarla: primero con el enrutador local y,
+        si el resultado es ambiguo, pidiendo al LLM que elija la herramienta.
+        Se usa en las rutas que llaman al agente directamente (p.ej. streaming y lotes).
+        """
+        if ROUTER_ENABLED:
+            with tracing.start_span("routing.local"):
+                decision = self.skill_router.route(hu_text)
+                tracing.set_attributes(skill=decision.skill_id, method=decision.method)
+            if decision.skill_id:
+                return decision.skill_id
+        router = self.routing_prompt | self.llm.bind_tools(self.tools)
+        with tracing.start_span("routing.llm"), track_llm_call("route"):
+            ai_message = await router.ainvoke({"messages": hu_text})
+        tool_calls = getattr(ai_message, "tool_calls", None) or []
+        return tool_calls[0]["name"] if tool_calls else None
 
-FORMATO OBLIGATORIO:
-No devuelvas texto libre, debes responder invocando la herramienta usando el sistema de acciones interno (Tool Call).
+    async def _relay_stream(self, client, skill_id: str, message: str):
+        """
+        Reenvía como SSE los eventos del agente remoto. Si el agente no soporta streaming,
+        emite un único evento "done" con su respuesta.
+        """
+        task_id = str(uuid.uuid4())
+        yield {"event": "route", "data": json.dumps({"skill": skill_id, "agent": client.base_url})}
+        async with self.route_semaphore:
+            try:
+                if client.agent_card.capabilities.streaming:
+                    async for event, data in client.send_task_subscribe(task_id, tracing.correlation_id(), message):
+                        yield {"event": event, "data": data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)}
+                else:
+                    result = await client.send_task_async(task_id, tracing.correlation_id(), message)
+                    yield {"event": "done", "data": json.dumps(result, ensure_ascii=False)}
+            except Exception as e:
+                logging.error(f"[Orquestador] Error en streaming con skill '{skill_id}': {e}")
+                yield {"event": "error", "data": json.dumps({"code": -32603, "message": str(e)}, ensure_ascii=False)}
 
-HU:
-{messages}
-""")
+    def _route_result(self, hu_id: Optional[str], skill_id: Optional[str], result, task_id: Optional[str] = None) -> dict:
+        """
+        Respuesta de /route-hu y /tasks/{task_id} a partir de lo que devuelve el agente:
+        resultado final, tarea aún en curso (status "submitted" con task_id) o error JSON-RPC.
+        """
+        response = {"status": "error", "hu_id": hu_id, "skill": skill_id,
+                    "gherkin_content": None, "message": None, "task_id": task_id}
+        if RemoteAgentClient.is_pending_task(result):
+            task_id = task_id or self.host_agent.task_handle(result["agent"], result["id"])
+            response.update(status="submitted", task_id=task_id,
+                            message=f"Generación en curso ({result['state']})")
+        elif isinstance(result, dict) and "code" in result and "status" not in result:
+            response["message"] = result.get("message")
+        elif isinstance(result, dict):
+            response.update(status=result.get("status", "success"), hu_id=result.get("hu_id") or hu_id,
+                            gherkin_content=result.get("gherkin_content"), message=result.get("message"))
+        else:
+            response.update(status="success", gherkin_content=result, message="PGP generado exitosamente")
+        return response
 
-        self.react_agent = create_react_agent(
-            tools=self.tools,
-            model=self.llm,
-            prompt=prompt
-        )
+    async def _dispatch(self, hu_id: str, skill_id: str, hu_cases: List[dict], wait: Optional[float] = None) -> dict:
+        """
+        Envía los casos de la HU a una réplica de la skill y devuelve la respuesta de /route-hu.
+        """
+        try:
+            result = await self.host_agent.call_skill(skill_id, json.dumps(hu_cases, ensure_ascii=False), wait=wait)
+        except LookupError as e:
+            return self._route_result(hu_id, skill_id, {"code": -32601, "message": str(e)})
+        except Exception as e:
+            return self._route_result(hu_id, skill_id, {"code": -32603, "message": f"Error llamando al agente remoto: {e}"})
+        return self._route_result(hu_id, skill_id, result)
+
+    def _task_response(self, task_id: str, task) -> dict:
+        """Respuesta de /tasks/{task_id} a partir de la tarea (o el error JSON-RPC) del agente."""
+        if isinstance(task, dict) and "code" in task and "state" not in task:
+            status_code = {-32001: 404, -32002: 409}.get(task["code"], 502)
+            raise HTTPException(status_code=status_code, detail=task.get("message"))
+        if RemoteAgentClient.is_pending_task(task):
+            return self._route_result(None, None, task, task_id=task_id)
+        response = self._route_result(None, None, RemoteAgentClient.task_outcome(task))
+        response["task_id"] = task_id
+        return response
+
+    async def _route_hu(self, hu_id: str, hu_data: dict, hu_cases: List[dict], wait: Optional[float] = None):
+        """
+        Enruta una HU y devuelve la respuesta del agente (lógica de /route-hu).
+        """
+        hu_text = f"{hu_data.get('title', '')} {hu_data.get('description', '')}"
+        logging.info(f"[Orquestador] Procesando HU: {hu_id} -> {hu_text}")
+
+        # Enrutado local: si la skill es clara se llama al agente sin pasar por el LLM
+        if ROUTER_ENABLED:
+            with tracing.start_span("routing.local"):
+                decision = self.skill_router.route(hu_text)
+                tracing.set_attributes(skill=decision.skill_id, method=decision.method)
+            if decision.skill_id:
+                logging.info(f"[Orquestador] HU {hu_id} enrutada a '{decision.skill_id}' por {decision.method} (score={decision.score:.2f})")
+                async with self.route_semaphore:
+                    return await self._dispatch(hu_id, decision.skill_id, hu_cases, wait)
+
+        # Dejar que el LLM decida la herramienta (ruta asíncrona: LLM y herramienta con await)
+        route = {"hu_id": hu_id, "hu_cases": hu_cases, "wait": wait, "response": None}
+        token = _current_route.set(route)
+        try:
+            async with self.route_semaphore:
+                # El span incluye la elección del LLM y la llamada a la herramienta (tool.call)
+                with tracing.start_span("routing.react"):
+                    await self.react_agent.ainvoke({"messages": [{"role": "user", "content": hu_text}]})
+        finally:
+            _current_route.reset(token)
+        if route["response"] is None:
+            return self._route_result(hu_id, None, {"code": -32601, "message": "El LLM no seleccionó ninguna skill para la HU"})
+        return route["response"]
+
+    async def _route_batch_item(self, hu_id: str, hu_cases: List[dict]) -> Optional[str]:
+        hu_data = hu_cases[0]
+        hu_text = f"{hu_data.get('title', '')} {hu_data.get('description', '')}"
+        async with self.route_semaphore:
+            return await self.select_skill(hu_text)
+
+    async def _run_batch_group(self, skill_id: str, items: List[tuple], semaphore: asyncio.Semaphore, results: asyncio.Queue):
+        """
+        Procesa las HUs de una misma skill con como mucho BATCH_MAX_CONCURRENCY llamadas a la vez.
+        """
+        async def run_one(hu_id: str, hu_cases: List[dict]):
+            async with semaphore:
+                # La réplica se elige por HU (call_skill) para repartir el grupo entre réplicas
+                response = await self.route_flight.do(
+                    make_flight_key(f"{skill_id}:{hu_id}", hu_cases),
+                    lambda: self._dispatch(hu_id, skill_id, hu_cases)
+                )
+            await results.put(response)
+
+        await asyncio.gather(*(run_one(hu_id, hu_cases) for hu_id, hu_cases in items))
+
+    async def _run_batch(self, hu_ids: List[str]):
+        """
+        Resuelve la skill de cada HU, agrupa por skill y reparte el trabajo entre los agentes.
+        Produce una línea NDJSON por HU a medida que termina (se admiten fallos parciales).
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        found, missing = [], []
+        with tracing.start_span("hu.lookup", hus=len(hu_ids)):
+            for hu_id in dict.fromkeys(hu_ids):
+                hu_cases = self.hu_repository.get_cases(hu_id)
+                if hu_cases:
+                    found.append((hu_id, hu_cases))
+                else:
+                    missing.append(hu_id)
+        for hu_id in missing:
+            yield json.dumps({"hu_id": hu_id, "skill": None, "status": "error",
+                              "message": f"HU '{hu_id}' no encontrada en test_cases.json"}, ensure_ascii=False) + "\n"
+
+        pending = len(found)
+        group_tasks = []
+
+        async def route_and_dispatch():
+            # Fase 1: enrutado de todas las HUs; fase 2: reparto por grupos de skill
+            routed = await asyncio.gather(
+                *(self._route_batch_item(hu_id, hu_cases) for hu_id, hu_cases in found),
+                return_exceptions=True
+            )
+            groups: Dict[str, List[tuple]] = {}
+            for (hu_id, hu_cases), skill_id in zip(found, routed):
+                if isinstance(skill_id, Exception) or not skill_id:
+                    reason = skill_id if isinstance(skill_id, Exception) else "ninguna skill seleccionada"
+                    await results.put({"hu_id": hu_id, "skill": None, "status": "error",
+                                       "message": f"No se pudo enrutar la HU: {reason}"})
+                    continue
+                groups.setdefault(skill_id, []).append((hu_id, hu_cases))
+            for skill_id, items in groups.items():
+                logging.info(f"[Orquestador] Lote: {len(items)} HUs para skill '{skill_id}'")
+                semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+                group_tasks.append(asyncio.create_task(self._run_batch_group(skill_id, items, semaphore, results)))
+
+        dispatcher = asyncio.create_task(route_and_dispatch())
+        try:
+            while pending:
+                item = await results.get()
+                pending -= 1
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        finally:
+            # Si el cliente se desconecta, se cancela el trabajo pendiente
+            for task in [dispatcher, *group_tasks]:
+                if not task.done():
+                    task.cancel()
+
+    def build_tools(self):
+        """
+        Una herramienta por skill (aunque haya varias réplicas del agente que la soporta).
+        """
+        tools = []
+        for skill_id in self.host_agent.list_skill_ids():
+            # La herramienta es asíncrona para no bloquear el event loop del orquestador
+            def make_tool(skill_ref):
+                async def wrapper(input: str):
+                    return await self._acall_agent_tool(input, skill_id=skill_ref)
+                wrapper.__name__ = skill_ref
+                wrapper.__doc__ = f"Herramienta para manejar tareas relacionadas con '{skill_ref}'."
+                return wrapper
+            tools.append(make_tool(skill_id))
+        return tools
+
+    def _add_routes(self):
+        """
+        Define los endpoints (el LLM y el agente LangGraph se crean al primer uso).
+        """
+        # Herramientas y enrutador se (re)construyen tras el descubrimiento de agentes
+        self.rebuild_agents()
 
         @self.app.post("/route-hu")
         async def route_hu(request: HURequest):
             hu_id = request.hu_id
             if not isinstance(hu_id, str) or not hu_id:
                 raise HTTPException(status_code=400, detail="Falta el parámetro hu_id")
+            self._require_agents()
 
-            hu_data = self.find_hu_by_id(hu_id)
+            with tracing.start_span("hu.lookup", hu_id=hu_id):
+                hu_data = self.find_hu_by_id(hu_id)
+                hu_cases = self.hu_repository.get_cases(hu_id) if hu_data else []
+                tracing.set_attributes(cases=len(hu_cases))
             if not hu_data:
                 raise HTTPException(status_code=404, detail=f"HU '{hu_id}' no encontrada en test_cases.json")
 
+            # Varias peticiones simultáneas de la misma HU comparten un único enrutado y generación
+            flight_key = make_flight_key(f"route:{hu_id}:{request.wait_seconds}", hu_cases)
+            return await self.route_flight.do(
+                flight_key, lambda: self._route_hu(hu_id, hu_data, hu_cases, request.wait_seconds)
+            )
+
+        @self.app.get("/tasks/{task_id}")
+        async def get_task(task_id: str, wait_seconds: float = 0):
+            """
+            Estado de una generación que /route-hu devolvió como "submitted". Con wait_seconds
+            se responde en cuanto termina (o al cumplirse ese tiempo).
+            """
+            try:
+                task = await self.host_agent.get_task(task_id, wait_seconds)
+            except LookupError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            return self._task_response(task_id, task)
+
+        @self.app.delete("/tasks/{task_id}")
+        async def cancel_task(task_id: str):
+            """Cancela una generación en curso."""
+            try:
+                task = await self.host_agent.cancel_task(task_id)
+            except LookupError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            return self._task_response(task_id, task)
+
+        @self.app.post("/route-hu/stream")
+        async def route_hu_stream(request: HURequest):
+            """
+            Igual que /route-hu pero reenvía por SSE los tokens que genera el agente.
+            Eventos: "route" (skill elegida), "token" ({"text": ...}), "done" (respuesta final) o "error".
+            """
+            hu_id = request.hu_id
+            if not isinstance(hu_id, str) or not hu_id:
+                raise HTTPException(status_code=400, detail="Falta el parámetro hu_id")
+            self._require_agents()
+
+            with tracing.start_span("hu.lookup", hu_id=hu_id):
+                hu_cases = self.hu_repository.get_cases(hu_id)
+                tracing.set_attributes(cases=len(hu_cases))
+            if not hu_cases:
+                raise HTTPException(status_code=404, detail=f"HU '{hu_id}' no encontrada en test_cases.json")
+
+            hu_data = hu_cases[0]
             hu_text = f"{hu_data.get('title', '')} {hu_data.get('description', '')}"
-            logging.info(f"[Orquestador] Procesando HU: {hu_id} -> {hu_text}")
+            logging.info(f"[Orquestador] Procesando HU en streaming: {hu_id} -> {hu_text}")
+
+            skill_id = await self.select_skill(hu_text)
+            client = self.host_agent.get_client_by_skill(skill_id) if skill_id else None
+            if not client:
+                raise HTTPException(status_code=404, detail=f"No hay agente disponible para la HU '{hu_id}'")
+
+            message = json.dumps(hu_cases, ensure_ascii=False)
+            return EventSourceResponse(self._relay_stream(client, skill_id, message))
+
+        @self.app.post("/route-hu/batch")
+        async def route_hu_batch(request: HUBatchRequest):
+            """
+            Procesa un lote de HUs: enruta cada una, agrupa por skill y reparte entre los agentes
+            con concurrencia acotada. Responde en NDJSON, una línea por HU en cuanto termina.
+            """
+            if not request.hu_ids:
+                raise HTTPException(status_code=400, detail="Falta el parámetro hu_ids")
+            if len(request.hu_ids) > BATCH_MAX_SIZE:
+                raise HTTPException(status_code=400, detail=f"El lote supera el máximo de {BATCH_MAX_SIZE} HUs")
+            self._require_agents()
+            logging.info(f"[Orquestador] Procesando lote de {len(request.hu_ids)} HUs")
+            return StreamingResponse(self._run_batch(request.hu_ids), media_type="application/x-ndjson")
 
-            # Dejar que el LLM decida la herramienta
-            # result = self.react_agent.invoke([{"role": "user", "content": hu_text}])
-            result = self.react_agent.invoke({"messages": [{"role": "user", "content": hu_text}]})
+        @self.app.get("/router/stats")
+        async def router_stats():
+            """Fracción de HUs enrutadas localmente frente a las que necesitaron el LLM"""
+            return {"enabled": ROUTER_ENABLED, **self.skill_router.stats()}
 
-            return result
+        @self.app.get("/singleflight/stats")
+        async def singleflight_stats():
+            """Peticiones de HU agrupadas con otra idéntica que ya estaba en curso"""
+            return self.route_flight.stats()
 
         @self.app.get("/agents")
         async def list_agents():
@@ -148,5 +546,4 @@ server = A2AServer()
 app = server.app
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8003)
+    run_service(app, "core.orchestrator_langgraph:app", 8003)
@@ -0,0 +1,30 @@
+# core/serve.py
+"""
+Arranque de los servicios con uvicorn, en uno o varios procesos.
+
+Con WORKERS > 1 uvicorn lanza WORKERS procesos que comparten el puerto; el estado que no
+puede vivir en un solo proceso (tareas, AgentCards, métricas, caché del LLM) pasa a
+core/shared_state.py. WORKERS también activa ese estado compartido, así que debe usarse en
+lugar de `uvicorn --workers` directamente (o bien fijar SHARED_STATE_DIR a mano).
+"""
+import os
+
+# Procesos por servicio; 0 = uno por CPU
+WORKERS = int(os.getenv("WORKERS", "1")) or (os.cpu_count() or 1)
+HOST = os.getenv("HOST", "0.0.0.0")
+
+
+def run_service(app, import_path: str, port: int):
+    """
+    Arranca el servicio en el puerto indicado (PORT lo sobrescribe).
+    Args:
+        app: la aplicación ya importada (modo de un proceso).
+        import_path: "modulo:app", necesario para que uvicorn importe la app en cada worker.
+    """
+    import uvicorn
+
+    port = int(os.getenv("PORT", str(port)))
+    if WORKERS > 1:
+        uvicorn.run(import_path, host=HOST, port=port, workers=WORKERS)
+    else:
+        uvicorn.run(app, host=HOST, port=port)
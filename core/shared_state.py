@@ -0,0 +1,214 @@
+# core/shared_state.py
+"""
+Estado compartido entre los workers de un servicio (modo multi-worker, ver core/serve.py).
+
+Con WORKERS > 1 cada servicio corre en varios procesos y lo que vivía en memoria se
+perdería (un tasks/get que llega a otro worker) o se duplicaría. Este módulo lo guarda en
+SQLite en modo WAL dentro de SHARED_STATE_DIR, un fichero por tipo de dato, de modo que
+todos los procesos del host lo ven:
+  - tareas A2A del Agente PGP (SharedTaskStore): tasks/get y tasks/cancel desde cualquier worker;
+    las tareas de un worker caído se marcan ERROR (heartbeat por worker)
+  - AgentCards descubiertas por el orquestador (SharedKV)
+  - instantáneas de las métricas de cada worker (SharedKV; /metrics las une con la etiqueta worker)
+  - caché de resultados del LLM (nivel SQLite de agents/llm_cache.py)
+
+Sin WORKERS > 1 ni SHARED_STATE_DIR todo sigue en memoria del proceso, como antes.
+La ejecución de cada tarea, el single-flight, el circuit breaker y el balanceo siguen
+siendo de cada worker.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from core.custom_types import Task, TaskState
+from core.serve import WORKERS
+
+# Directorio de las bases SQLite compartidas; por defecto uno temporal si WORKERS > 1
+SHARED_STATE_DIR = os.getenv(
+    "SHARED_STATE_DIR",
+    os.path.join(tempfile.gettempdir(), "a2a-shared-state") if WORKERS > 1 else ""
+)
+
+
+def shared_state_enabled() -> bool:
+    return bool(SHARED_STATE_DIR)
+
+
+def shared_db_path(name: str) -> str:
+    os.makedirs(SHARED_STATE_DIR, exist_ok=True)
+    return os.path.join(SHARED_STATE_DIR, f"{name}.db")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Conexión SQLite apta para varios procesos: WAL (lectores sin bloquear al escritor),
+    espera de hasta 30 s si otro proceso tiene el lock y autocommit.
+    """
+    db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class SharedKV:
+    """
+    Diccionario clave -> valor JSON en SQLite, compartido entre procesos.
+    """
+    def __init__(self, name: str, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._db = connect(path or shared_db_path(name))
+        self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)")
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any):
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO kv (key, value, updated_at) VALUES (?, ?, ?)", (key, data, time.time()))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def items(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """Todas las entradas (solo las actualizadas en los últimos max_age segundos, si se indica)."""
+        since = time.time() - max_age if max_age else 0.0
+        with self._lock:
+            rows = self._db.execute("SELECT key, value FROM kv WHERE updated_at >= ? ORDER BY key", (since,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+
+_TERMINAL = tuple(TaskState.TERMINAL)
+_NOT_TERMINAL = f"state NOT IN ({', '.join('?' for _ in _TERMINAL)})"
+
+
+class SharedTaskStore:
+    """
+    Almacén de tareas A2A compartido entre workers. Cada tarea la ejecuta el worker que
+    recibió tasks/send (su owner); los demás la leen de aquí. Las transiciones solo se
+    aplican si la tarea no ha terminado, así una cancelación desde otro worker no se pisa
+    al completar.
+
+    Cada worker publica un heartbeat; las tareas activas cuyo owner deja de latir durante
+    orphan_seconds (p.ej. el proceso murió) se marcan ERROR en mark_orphans, para que no
+    queden SUBMITTED/WORKING para siempre y purge pueda borrarlas.
+    Los métodos son síncronos: desde el event loop se llaman con asyncio.to_thread.
+    """
+    def __init__(self, name: str, path: Optional[str] = None, owner: Optional[str] = None):
+        self._lock = threading.Lock()
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._db = connect(path or shared_db_path(name))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL, owner TEXT)"
+        )
+        try:
+            # Bases creadas antes de registrar el owner de cada tarea
+            self._db.execute("ALTER TABLE tasks ADD COLUMN owner TEXT")
+        except sqlite3.OperationalError:
+            pass
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_updated ON tasks(updated_at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS owners (owner TEXT PRIMARY KEY, heartbeat REAL NOT NULL)")
+
+    def put(self, task: Task):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO tasks (id, state, data, updated_at, owner) VALUES (?, ?, ?, ?, ?)",
+                             (task.id, task.state, task.model_dump_json(), task.updated_at, self.owner))
+
+    def update(self, task: Task) -> bool:
+        """
+        Guarda el nuevo estado si la tarea sigue activa. False si ya había terminado
+        (p.ej. cancelada desde otro worker).
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                f"UPDATE tasks SET state = ?, data = ?, updated_at = ? WHERE id = ? AND {_NOT_TERMINAL}",
+                (task.state, task.model_dump_json(), task.updated_at, task.id, *_TERMINAL)
+            )
+        return cursor.rowcount > 0
+
+    def get(self, task_id: str) -> Optional[Task]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return Task.model_validate_json(row[0]) if row else None
+
+    def _finish(self, task_id: str, state: str, error: Optional[str] = None) -> Optional[Task]:
+        # Llamar con self._lock: termina la tarea si sigue activa
+        row = self._db.execute(f"SELECT data FROM tasks WHERE id = ? AND {_NOT_TERMINAL}", (task_id, *_TERMINAL)).fetchone()
+        if row is None:
+            return None
+        task = Task.model_validate_json(row[0])
+        task.state, task.result, task.error, task.updated_at = state, None, error, time.time()
+        cursor = self._db.execute(
+            f"UPDATE tasks SET state = ?, data = ?, updated_at = ? WHERE id = ? AND {_NOT_TERMINAL}",
+            (task.state, task.model_dump_json(), task.updated_at, task.id, *_TERMINAL)
+        )
+        return task if cursor.rowcount > 0 else None
+
+    def cancel(self, task_id: str) -> Optional[Task]:
+        """
+        Marca como cancelada una tarea activa de otro worker. None si ya había terminado.
+        """
+        with self._lock:
+            return self._finish(task_id, TaskState.CANCELED)
+
+    def heartbeat(self):
+        """Indica que el worker sigue vivo (sus tareas activas no son huérfanas)."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO owners (owner, heartbeat) VALUES (?, ?)", (self.owner, time.time()))
+
+    def release(self, error: str) -> int:
+        """
+        Apagado del worker: marca ERROR sus tareas aún activas (p.ej. encoladas sin empezar)
+        y retira su heartbeat. Devuelve cuántas tareas se marcaron.
+        """
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                f"SELECT id FROM tasks WHERE owner = ? AND {_NOT_TERMINAL}", (self.owner, *_TERMINAL)
+            ).fetchall()]
+            marked = sum(1 for task_id in ids if self._finish(task_id, TaskState.ERROR, error))
+            self._db.execute("DELETE FROM owners WHERE owner = ?", (self.owner,))
+        return marked
+
+    def mark_orphans(self, orphan_seconds: float) -> int:
+        """
+        Marca ERROR las tareas activas cuyo owner no late desde hace más de orphan_seconds
+        (o sin owner registrado). Devuelve cuántas se marcaron.
+        """
+        if orphan_seconds <= 0:
+            return 0
+        since = time.time() - orphan_seconds
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, owner FROM tasks WHERE {_NOT_TERMINAL} AND owner IS NOT ? AND "
+                "(owner IS NULL OR owner NOT IN (SELECT owner FROM owners WHERE heartbeat >= ?))",
+                (*_TERMINAL, self.owner, since)
+            ).fetchall()
+            marked = sum(
+                1 for task_id, owner in rows
+                if self._finish(task_id, TaskState.ERROR, f"El worker {owner or 'desconocido'} que ejecutaba la tarea dejó de responder")
+            )
+            self._db.execute("DELETE FROM owners WHERE heartbeat < ?", (since,))
+        return marked
+
+    def purge(self, ttl_seconds: float) -> int:
+        """Borra las tareas terminadas hace más de ttl_seconds."""
+        if ttl_seconds <= 0:
+            return 0
+        with self._lock:
+            cursor = self._db.execute(f"DELETE FROM tasks WHERE updated_at < ? AND state IN ({', '.join('?' for _ in _TERMINAL)})",
+                                      (time.time() - ttl_seconds, *_TERMINAL))
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
@@ -0,0 +1,81 @@
+# core/single_flight.py
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def make_flight_key(*parts: Any) -> str:
+    """
+    Clave estable para agrupar llamadas idénticas: hu_id + hash SHA-256 del payload.
+    Args:
+        parts: Primer elemento legible (p.ej. el hu_id) seguido del payload a hashear.
+    """
+    head, *payload = parts
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{head}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes idénticas (single-flight).
+
+    La primera llamada con una clave ejecuta la función en una tarea propia; las que llegan
+    mientras sigue en curso esperan el mismo futuro en lugar de repetir el trabajo. La tarea
+    compartida se protege con asyncio.shield, así que si el cliente que la lanzó se
+    desconecta el resto sigue recibiendo el resultado. Al terminar la clave se libera:
+    no es una caché, las llamadas posteriores vuelven a ejecutar la función.
+    """
+    def __init__(self, name: str = "default", enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _release(self, key: str, task: asyncio.Future):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Marca la excepción como recuperada si ya no queda nadie esperando
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta fn() o se une a la ejecución en curso con la misma clave.
+        Los errores de la ejecución compartida se propagan a todos los que esperan.
+        """
+        self.calls += 1
+        if not self.enabled:
+            self.executions += 1
+            return await fn()
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.collapsed += 1
+            logger.debug(f"[single-flight:{self.name}] llamada agrupada con la que está en curso ({key[:48]})")
+            return await asyncio.shield(task)
+
+        self.executions += 1
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda t: self._release(key, t))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._in_flight),
+            "collapse_ratio": round(self.collapsed / self.calls, 4) if self.calls else 0.0
+        }
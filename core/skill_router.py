@@ -0,0 +1,176 @@
+# core/skill_router.py
+import os
+import re
+import math
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Umbrales de confianza del índice de palabras clave
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "1.0"))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "1.0"))
+# Similitud TF-IDF como segunda etapa (opcional)
+ROUTER_TFIDF = os.getenv("ROUTER_TFIDF", "true").lower() in ("1", "true", "yes")
+ROUTER_TFIDF_MIN_SIMILARITY = float(os.getenv("ROUTER_TFIDF_MIN_SIMILARITY", "0.2"))
+ROUTER_TFIDF_MIN_MARGIN = float(os.getenv("ROUTER_TFIDF_MIN_MARGIN", "0.1"))
+
+# Peso de cada campo del AgentSkill en el índice
+FIELD_WEIGHTS = {"id": 2.0, "name": 2.0, "tags": 2.0, "description": 1.0}
+
+STOPWORDS = {
+    "como", "con", "del", "las", "los", "para", "por", "que", "quiero", "sobre", "una", "uno",
+    "mis", "sus", "este", "esta", "the", "and", "for", "with", "hus"
+}
+
+# Longitud del "stem": agrupa variantes como validar / validación / validado
+STEM_LENGTH = 6
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Minúsculas, sin tildes, sin stopwords y truncado a STEM_LENGTH caracteres.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [
+        token[:STEM_LENGTH]
+        for token in _TOKEN_RE.findall(text)
+        if len(token) >= 3 and token not in STOPWORDS and not token.isdigit()
+    ]
+
+
+@dataclass
+class RouteDecision:
+    skill_id: Optional[str]
+    method: str
+    score: float = 0.0
+    scores: Dict[str, float] = field(default_factory=dict)
+
+
+class SkillRouter:
+    """
+    Enrutador local previo al LLM. Construye un índice de palabras clave a partir del
+    id, nombre, descripción y tags de cada AgentSkill y, opcionalmente, una similitud
+    TF-IDF. Solo decide cuando la mejor skill supera los umbrales con margen suficiente;
+    en caso contrario devuelve skill_id=None y el orquestador recurre al LLM.
+    """
+    def __init__(
+        self,
+        min_score: float = ROUTER_MIN_SCORE,
+        min_margin: float = ROUTER_MIN_MARGIN,
+        use_tfidf: bool = ROUTER_TFIDF,
+        tfidf_min_similarity: float = ROUTER_TFIDF_MIN_SIMILARITY,
+        tfidf_min_margin: float = ROUTER_TFIDF_MIN_MARGIN
+    ):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.use_tfidf = use_tfidf
+        self.tfidf_min_similarity = tfidf_min_similarity
+        self.tfidf_min_margin = tfidf_min_margin
+        self._keywords: Dict[str, Dict[str, float]] = {}
+        self._idf: Dict[str, float] = {}
+        self._vectors: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self.routed_keyword = 0
+        self.routed_tfidf = 0
+        self.routed_llm = 0
+
+    def build(self, skills: Iterable):
+        """
+        (Re)construye el índice con los AgentSkill disponibles.
+        """
+        keywords: Dict[str, Dict[str, float]] = {}
+        documents: Dict[str, List[str]] = {}
+        for skill in skills:
+            index = keywords.setdefault(skill.id, {})
+            document = documents.setdefault(skill.id, [])
+            fields = {
+                "id": skill.id,
+                "name": skill.name,
+                "description": skill.description or "",
+                "tags": " ".join(getattr(skill, "tags", None) or [])
+            }
+            for name, text in fields.items():
+                tokens = tokenize(text)
+                document.extend(tokens)
+                for token in tokens:
+                    index[token] = max(index.get(token, 0.0), FIELD_WEIGHTS[name])
+
+        doc_count = len(documents)
+        df: Dict[str, int] = {}
+        for tokens in documents.values():
+            for token in set(tokens):
+                df[token] = df.get(token, 0) + 1
+        idf = {token: math.log((1 + doc_count) / (1 + n)) + 1.0 for token, n in df.items()}
+        vectors = {skill_id: self._tfidf_vector(tokens, idf) for skill_id, tokens in documents.items()}
+
+        with self._lock:
+            self._keywords, self._idf, self._vectors = keywords, idf, vectors
+
+    @staticmethod
+    def _tfidf_vector(tokens: List[str], idf: Dict[str, float]) -> Dict[str, float]:
+        vector: Dict[str, float] = {}
+        for token in tokens:
+            if token in idf:
+                vector[token] = vector.get(token, 0.0) + idf[token]
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {t: v / norm for t, v in vector.items()} if norm else {}
+
+    @staticmethod
+    def _best_two(scores: Dict[str, float]):
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best = ranked[0] if ranked else (None, 0.0)
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        return best[0], best[1], second
+
+    def route(self, text: str) -> RouteDecision:
+        """
+        Intenta resolver la skill sin LLM. skill_id=None significa "ambiguo".
+        """
+        tokens = tokenize(text)
+        with self._lock:
+            keywords, idf, vectors = self._keywords, self._idf, self._vectors
+
+        scores = {
+            skill_id: sum(index.get(token, 0.0) for token in set(tokens))
+            for skill_id, index in keywords.items()
+        }
+        skill_id, best, second = self._best_two(scores)
+        keyword_best = best
+        if skill_id and best >= self.min_score and best - second >= self.min_margin:
+            with self._lock:
+                self.routed_keyword += 1
+            return RouteDecision(skill_id, "keyword", best, scores)
+
+        if self.use_tfidf and vectors:
+            query = self._tfidf_vector(tokens, idf)
+            similarities = {
+                sid: sum(weight * vector.get(token, 0.0) for token, weight in query.items())
+                for sid, vector in vectors.items()
+            }
+            skill_id, best, second = self._best_two(similarities)
+            if skill_id and best >= self.tfidf_min_similarity and best - second >= self.tfidf_min_margin:
+                with self._lock:
+                    self.routed_tfidf += 1
+                return RouteDecision(skill_id, "tfidf", best, similarities)
+
+        with self._lock:
+            self.routed_llm += 1
+        return RouteDecision(None, "llm", keyword_best, scores)
+
+    def stats(self) -> dict:
+        with self._lock:
+            local = self.routed_keyword + self.routed_tfidf
+            total = local + self.routed_llm
+            return {
+                "total": total,
+                "routed_keyword": self.routed_keyword,
+                "routed_tfidf": self.routed_tfidf,
+                "routed_llm": self.routed_llm,
+                "local_ratio": round(local / total, 4) if total else 0.0,
+                "skills": sorted(self._keywords.keys())
+            }
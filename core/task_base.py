@@ -3,10 +3,20 @@
 from abc import ABC, abstractmethod
 from core.custom_types import (
     SendTaskRequest,
+    GetTaskRequest,
+    CancelTaskRequest,
     JSONRPCResponse,
 )
 
 class TaskManager(ABC):
     @abstractmethod
-    def on_send_task(self, request: SendTaskRequest) -> JSONRPCResponse:
+    async def on_send_task(self, request: SendTaskRequest) -> JSONRPCResponse:
+        pass
+
+    @abstractmethod
+    async def on_get_task(self, request: GetTaskRequest) -> JSONRPCResponse:
+        pass
+
+    @abstractmethod
+    async def on_cancel_task(self, request: CancelTaskRequest) -> JSONRPCResponse:
         pass
@@ -0,0 +1,435 @@
+# core/tracing.py
+"""
+Trazas distribuidas con propagación W3C Trace Context (cabecera traceparent), sin dependencias.
+
+Una petición a /api/generate-pgp cruza gateway -> orquestador -> agente. Cada servicio:
+  - abre un span de servidor por petición HTTP (install_tracing), continuando el traceparent
+    recibido, y devuelve el trace id en la cabecera X-Trace-Id
+  - propaga el span activo en las llamadas salientes: cabecera traceparent en los clientes
+    httpx (inject_headers / ainject_headers como event hooks) y params.metadata.traceparent
+    en JSON-RPC, porque las tareas de tasks/send se ejecutan en los workers de la cola,
+    fuera del contexto de la petición HTTP
+  - abre spans internos con start_span() (búsqueda de HU, LLM, llamada al agente, fallback)
+
+Exportación (TRACING_EXPORTER): "file" escribe un span por línea (NDJSON) en TRACING_FILE;
+"otlp" envía lotes en OTLP/HTTP JSON a TRACING_OTLP_ENDPOINT (p.ej. un OpenTelemetry
+Collector o Jaeger en :4318). La exportación se hace en un hilo aparte, por lotes.
+
+Para ver dónde se va el tiempo de una petición:
+    python -m core.tracing traces.ndjson [trace_id]
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import asyncio
+import random
+import logging
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+# none | file | otlp
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.ndjson")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Fracción de trazas nuevas que se exportan; las que llegan con traceparent respetan su flag
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+TRACING_FLUSH_INTERVAL = float(os.getenv("TRACING_FLUSH_INTERVAL", "1.0"))
+TRACING_BATCH_SIZE = int(os.getenv("TRACING_BATCH_SIZE", "512"))
+
+TRACEPARENT_HEADER = "traceparent"
+TRACE_ID_HEADER = "X-Trace-Id"
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_OTLP_KIND = {"internal": 1, "server": 2, "client": 3}
+
+# (trace_id, span_id, sampled) de un span remoto, leído de un traceparent
+SpanContext = Tuple[str, str, bool]
+
+_service_name = "a2a"
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "service", "sampled",
+                 "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, kind: str = "internal",
+                 service: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.service = service or _service_name
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, object] = {}
+        self.status = "ok"
+        self.status_message: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException):
+        self.status = "error"
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": self.service,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "status_message": self.status_message,
+            "attributes": self.attributes,
+        }
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """
+    Lee una cabecera traceparent (versión 00). Devuelve None si falta o no es válida.
+    """
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+def set_attributes(**attributes):
+    """
+    Añade atributos al span activo (no hace nada si no hay traza).
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+def correlation_id() -> str:
+    """
+    Identificador para correlacionar una petición entre servicios (p.ej. session_id de A2A):
+    el trace id del span activo, o un uuid nuevo si no hay traza.
+    """
+    span = _current_span.get()
+    return span.trace_id if span is not None else uuid.uuid4().hex
+
+
+@contextmanager
+def start_span(name: str, kind: str = "internal", parent: Optional[SpanContext] = None,
+               service: Optional[str] = None, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Abre un span hijo del span activo (o de parent, si viene de otro proceso) y lo deja
+    activo dentro del bloque. Las excepciones marcan el span como error y se propagan.
+    Con TRACING_ENABLED=false devuelve None y no hace nada.
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+    active = _current_span.get()
+    if parent is None and active is not None:
+        parent = (active.trace_id, active.span_id, active.sampled)
+        service = service or active.service
+    if parent is None:
+        span = Span(name, os.urandom(16).hex(), None, random.random() < TRACING_SAMPLE_RATIO, kind, service)
+    else:
+        span = Span(name, parent[0], parent[1], parent[2], kind, service)
+    span.attributes.update(attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        # La cancelación o el cierre de un generador no son errores del span
+        if not isinstance(exc, (GeneratorExit, KeyboardInterrupt, asyncio.CancelledError)):
+            span.record_error(exc)
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Generador asíncrono cerrado desde otro contexto: el contexto original ya no existe
+            pass
+        if span.sampled:
+            _exporter.export(span)
+
+
+def inject_headers(request):
+    """
+    Event hook de httpx.Client: añade el traceparent del span activo a la petición.
+    """
+    traceparent = current_traceparent()
+    if traceparent and TRACEPARENT_HEADER not in request.headers:
+        request.headers[TRACEPARENT_HEADER] = traceparent
+
+
+async def ainject_headers(request):
+    """
+    Event hook de httpx.AsyncClient (los hooks del cliente asíncrono deben ser corrutinas).
+    """
+    inject_headers(request)
+
+
+def inject_metadata(metadata: Optional[dict]) -> Optional[dict]:
+    """
+    Añade el traceparent del span activo a params.metadata de una petición JSON-RPC.
+    """
+    traceparent = current_traceparent()
+    if not traceparent:
+        return metadata
+    return {**(metadata or {}), TRACEPARENT_HEADER: traceparent}
+
+
+def extract_metadata(metadata: Optional[dict]) -> Optional[SpanContext]:
+    return parse_traceparent((metadata or {}).get(TRACEPARENT_HEADER))
+
+
+# --- Exportación ---
+
+class SpanExporter:
+    """
+    Cola de spans terminados y un hilo que los exporta por lotes cada TRACING_FLUSH_INTERVAL
+    segundos (o al llegar a TRACING_BATCH_SIZE), fuera del event loop de la petición.
+    """
+    def __init__(self, kind: str = TRACING_EXPORTER):
+        self.kind = kind if kind in ("file", "otlp") else "none"
+        self.exported = 0
+        self.dropped = 0
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._flushed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._http = None
+
+    def export(self, span: Span):
+        if self.kind == "none":
+            return
+        self._queue.put(span)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            # None es la marca de flush(): se escribe lo pendiente sin esperar al intervalo
+            flush_requested = item is None
+            batch = [] if flush_requested else [item]
+            deadline = time.monotonic() + TRACING_FLUSH_INTERVAL
+            while not flush_requested and len(batch) < TRACING_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    flush_requested = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            if flush_requested:
+                self._flushed.set()
+
+    def flush(self, timeout: float = 5.0):
+        """
+        Exporta los spans pendientes (se llama también al salir del proceso).
+        """
+        if self._thread is None:
+            return
+        self._flushed.clear()
+        self._queue.put(None)
+        self._flushed.wait(timeout)
+
+    def _write(self, batch: List[Span]):
+        try:
+            if self.kind == "file":
+                with self._lock, open(TRACING_FILE, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in batch))
+            else:
+                self._post_otlp(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"No se pudieron exportar {len(batch)} spans ({self.kind}): {e}")
+
+    def _post_otlp(self, batch: List[Span]):
+        import httpx
+        if self._http is None:
+            self._http = httpx.Client(timeout=5.0)
+        by_service: Dict[str, list] = {}
+        for span in batch:
+            by_service.setdefault(span.service, []).append(_otlp_span(span))
+        payload = {"resourceSpans": [
+            {
+                "resource": {"attributes": [_otlp_attribute("service.name", service)]},
+                "scopeSpans": [{"scope": {"name": "a2a-pgp"}, "spans": spans}],
+            }
+            for service, spans in by_service.items()
+        ]}
+        response = self._http.post(TRACING_OTLP_ENDPOINT, json=payload)
+        response.raise_for_status()
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Span) -> dict:
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": _OTLP_KIND.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.status_message or ""} if span.status == "error" else {"code": 1},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    return data
+
+
+_exporter = SpanExporter()
+
+
+# --- Integración con FastAPI ---
+
+class TracingMiddleware:
+    """
+    Middleware ASGI: un span de servidor por petición HTTP, hijo del traceparent recibido.
+    El nombre usa la plantilla de la ruta (p.ej. "POST /route-hu").
+    """
+    def __init__(self, app, service: Optional[str] = None):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        parent = parse_traceparent(headers.get(TRACEPARENT_HEADER.encode(), b"").decode("latin-1"))
+        method = scope.get("method", "")
+        with start_span(f"{method} {scope.get('path', '')}", kind="server", parent=parent, service=self.service) as span:
+            if span is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                    message["headers"] = list(message.get("headers", [])) + [(TRACE_ID_HEADER.lower().encode(), span.trace_id.encode())]
+                await send(message)
+
+            span.set_attribute("http.method", method)
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.name = f"{method} {route}"
+                    span.set_attribute("http.route", route)
+
+
+def install_tracing(app, service: str):
+    """
+    Añade a una app FastAPI el span de servidor por petición. service es el nombre del
+    servicio en los spans exportados (service.name en OTLP).
+    """
+    global _service_name
+    _service_name = service
+    if TRACING_ENABLED:
+        app.add_middleware(TracingMiddleware, service=service)
+
+
+# --- Resumen de un fichero de trazas ---
+
+def _print_trace(spans: List[dict], out=sys.stdout):
+    by_parent: Dict[Optional[str], List[dict]] = {}
+    ids = {span["span_id"] for span in spans}
+    for span in spans:
+        parent = span["parent_id"] if span["parent_id"] in ids else None
+        by_parent.setdefault(parent, []).append(span)
+    root_start = min(span["start_ns"] for span in spans)
+
+    def walk(parent: Optional[str], depth: int):
+        for span in sorted(by_parent.get(parent, []), key=lambda s: s["start_ns"]):
+            offset = (span["start_ns"] - root_start) / 1e6
+            status = "" if span["status"] == "ok" else f"  [{span['status_message'] or 'error'}]"
+            out.write(f"{offset:>10.1f} {span['duration_ms']:>10.1f}  {'  ' * depth}{span['service']}: {span['name']}{status}\n")
+            walk(span["span_id"], depth + 1)
+
+    out.write(f"traza {spans[0]['trace_id']}\n{'inicio ms':>10} {'dur. ms':>10}  span\n")
+    walk(None, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Muestra como árbol las trazas de un fichero NDJSON (TRACING_EXPORTER=file)")
+    parser.add_argument("file", nargs="?", default=TRACING_FILE)
+    parser.add_argument("trace_id", nargs="?", help="traza a mostrar (por defecto, la última)")
+    args = parser.parse_args()
+
+    traces: Dict[str, List[dict]] = {}
+    with open(args.file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces.setdefault(span["trace_id"], []).append(span)
+    if not traces:
+        print("No hay spans en el fichero")
+        return
+    trace_id = args.trace_id or max(traces, key=lambda t: max(s["start_ns"] for s in traces[t]))
+    if trace_id not in traces:
+        print(f"Traza {trace_id} no encontrada")
+        return
+    _print_trace(traces[trace_id])
+
+
+if __name__ == "__main__":
+    main()
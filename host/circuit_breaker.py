@@ -0,0 +1,156 @@
+# host/circuit_breaker.py
+import os
+import time
+import threading
+from collections import deque
+from typing import Optional
+
+CB_ENABLED = os.getenv("CB_ENABLED", "true").lower() in ("1", "true", "yes")
+CB_WINDOW_SIZE = int(os.getenv("CB_WINDOW_SIZE", "20"))
+CB_MIN_REQUESTS = int(os.getenv("CB_MIN_REQUESTS", "10"))
+CB_ERROR_RATE = float(os.getenv("CB_ERROR_RATE", "0.5"))
+# p95 de latencia (s) a partir del cual se considera la réplica degradada; 0 lo desactiva
+CB_LATENCY_P95_THRESHOLD = float(os.getenv("CB_LATENCY_P95_THRESHOLD", "60"))
+CB_OPEN_SECONDS = float(os.getenv("CB_OPEN_SECONDS", "30"))
+CB_HALF_OPEN_MAX_CALLS = int(os.getenv("CB_HALF_OPEN_MAX_CALLS", "1"))
+
+
+class CircuitOpenError(RuntimeError):
+    """La llamada se rechazó sin enviarse porque el circuito del agente está abierto."""
+
+
+class CircuitState:
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por agente basado en una ventana deslizante de las últimas llamadas.
+
+    CLOSED -> OPEN cuando, con al menos min_requests muestras, la tasa de error supera
+    error_rate o el p95 de latencia supera latency_p95_threshold. Tras open_seconds pasa
+    a HALF_OPEN y deja pasar half_open_max_calls llamadas de prueba: si salen bien se
+    cierra, si alguna falla se vuelve a abrir.
+    """
+    def __init__(
+        self,
+        window_size: int = CB_WINDOW_SIZE,
+        min_requests: int = CB_MIN_REQUESTS,
+        error_rate: float = CB_ERROR_RATE,
+        latency_p95_threshold: float = CB_LATENCY_P95_THRESHOLD,
+        open_seconds: float = CB_OPEN_SECONDS,
+        half_open_max_calls: int = CB_HALF_OPEN_MAX_CALLS,
+        enabled: bool = CB_ENABLED
+    ):
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate
+        self.latency_p95_threshold = latency_p95_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.enabled = enabled
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._window: deque = deque(maxlen=window_size)
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    def _maybe_half_open(self):
+        if self.state == CircuitState.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+
+    def _open(self):
+        self.state = CircuitState.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def is_available(self) -> bool:
+        """
+        True si el circuito aceptaría una llamada ahora (no consume plaza de prueba).
+        """
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._maybe_half_open()
+            if self.state == CircuitState.OPEN:
+                return False
+            if self.state == CircuitState.HALF_OPEN:
+                return self._half_open_calls < self.half_open_max_calls
+            return True
+
+    def allow_request(self) -> bool:
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._maybe_half_open()
+            if self.state == CircuitState.CLOSED:
+                return True
+            if self.state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def record(self, ok: bool, latency: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._window.append((ok, latency))
+            if self.state == CircuitState.HALF_OPEN:
+                if not ok:
+                    self._open()
+                elif self._half_open_calls >= self.half_open_max_calls:
+                    self.state = CircuitState.CLOSED
+                    self._window.clear()
+                return
+            if self.state == CircuitState.CLOSED and len(self._window) >= self.min_requests:
+                if self._error_rate() >= self.error_rate_threshold:
+                    self._open()
+                elif self.latency_p95_threshold > 0 and (self._percentile(95) or 0) >= self.latency_p95_threshold:
+                    self._open()
+
+    def release(self):
+        """
+        La llamada se canceló antes de saber si la réplica responde: se libera su plaza de
+        prueba (HALF_OPEN) sin registrar resultado ni latencia.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def _error_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return sum(1 for ok, _ in self._window if not ok) / len(self._window)
+
+    def _percentile(self, pct: float) -> Optional[float]:
+        latencies = sorted(latency for ok, latency in self._window if ok)
+        if not latencies:
+            return None
+        k = min(len(latencies) - 1, max(0, round(pct / 100 * (len(latencies) - 1))))
+        return latencies[k]
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        """
+        Percentil de latencia (s) de las llamadas correctas de la ventana, o None sin muestras.
+        """
+        with self._lock:
+            return self._percentile(pct)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            if self.enabled:
+                self._maybe_half_open()
+            p50, p95 = self._percentile(50), self._percentile(95)
+            return {
+                "state": self.state,
+                "error_rate": round(self._error_rate(), 4),
+                "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+                "window": len(self._window),
+                "times_opened": self.times_opened
+            }
@@ -1,25 +1,68 @@
 # host/host_agent.py
+import os
 import uuid
+import hashlib
 import json
-from typing import List, Optional, Dict
-from pathlib import Path
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Callable, List, Optional, Dict
 from core.custom_types import TaskState
+from core.hu_repository import get_hu_repository
+from core import tracing
 from host.remote_agent_client import RemoteAgentClient
+from host.load_balancer import BalancingStrategy, build_strategy
+from agents.agent_card import AgentCard
+
+if TYPE_CHECKING:
+    from core.shared_state import SharedKV
+
+logger = logging.getLogger(__name__)
+
+# Descubrimiento de agentes
+DISCOVERY_TIMEOUT = float(os.getenv("DISCOVERY_TIMEOUT", "5"))
+DISCOVERY_REFRESH_INTERVAL = float(os.getenv("DISCOVERY_REFRESH_INTERVAL", "30"))
+DISCOVERY_MAX_FAILURES = int(os.getenv("DISCOVERY_MAX_FAILURES", "3"))
+
+# Peticiones "hedged": si la réplica principal tarda más que su p95, se lanza una
+# segunda petición a otra réplica y se usa la primera respuesta correcta
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.5"))
 
 class HostAgent:
     """
     Clase responsable de gestionar múltiples agentes remotos y coordinar el envío de tareas,
     así como la consulta de información sobre los agentes disponibles.
     """
-    def __init__(self, remote_addresses: List[str]):
+    def __init__(self, remote_addresses: List[str], strategy: Optional[BalancingStrategy] = None,
+                 card_store: Optional["SharedKV"] = None):
         """
         Inicializa el HostAgent creando clientes remotos para cada dirección proporcionada.
         Args:
             remote_addresses (List[str]): Lista de direcciones de los agentes remotos.
+            strategy (BalancingStrategy): Estrategia de balanceo entre réplicas (LB_STRATEGY por defecto).
+            card_store (SharedKV): AgentCards compartidas con los demás workers (modo multi-worker).
         """
         self.clients: Dict[str, RemoteAgentClient] = {}
         for addr in remote_addresses:
             self.clients[addr] = RemoteAgentClient(addr)
+        self.strategy = strategy or build_strategy()
+        # Índice skill -> réplicas que la soportan, mantenido al cargar/refrescar AgentCards
+        self.skill_index: Dict[str, List[RemoteAgentClient]] = {}
+        self.card_store = card_store
+        # tasks/cancel enviados a las réplicas que pierden una petición hedged
+        self._hedge_cancels: set = set()
+
+    def rebuild_skill_index(self):
+        """
+        Reconstruye el índice skill -> [clientes] a partir de las AgentCard cargadas.
+        """
+        index: Dict[str, List[RemoteAgentClient]] = {}
+        for client in self.clients.values():
+            if client.agent_card:
+                for skill in client.agent_card.skills:
+                    index.setdefault(skill.id, []).append(client)
+        self.skill_index = index
 
     def initialize(self):
         """
@@ -27,6 +70,102 @@ class HostAgent:
         """
         for addr, client in self.clients.items():
             client.fetch_agent_card()
+        self.rebuild_skill_index()
+
+    async def _fetch_card(self, client: RemoteAgentClient, timeout: float, max_failures: int) -> bool:
+        try:
+            return await asyncio.wait_for(client.fetch_agent_card_async(max_failures=max_failures), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout ({timeout}s) obteniendo agent.json desde {client.base_url}")
+            client.discovery_failures += 1
+            if client.agent_card is not None and client.discovery_failures >= max_failures:
+                client.agent_card = None
+                client.etag = None
+                return True
+            return False
+
+    async def initialize_async(self, timeout: float = DISCOVERY_TIMEOUT) -> bool:
+        """
+        Descubre todos los agentes en paralelo, con un timeout por agente: un agente caído
+        no retrasa al resto. Devuelve True si alguna AgentCard cambió.
+        """
+        results = await asyncio.gather(
+            *(self._fetch_card(client, timeout, max_failures=1) for client in self.clients.values())
+        )
+        await self._sync_shared_cards()
+        self.rebuild_skill_index()
+        return any(results)
+
+    async def refresh(self, timeout: float = DISCOVERY_TIMEOUT) -> bool:
+        """
+        Revalida todas las AgentCard (If-None-Match); las que no cambiaron cuestan un 304.
+        Devuelve True si alguna cambió (nueva, modificada o descartada).
+        """
+        results = await asyncio.gather(
+            *(self._fetch_card(client, timeout, max_failures=DISCOVERY_MAX_FAILURES) for client in self.clients.values())
+        )
+        changed = await self._sync_shared_cards() or any(results)
+        if changed:
+            self.rebuild_skill_index()
+        return changed
+
+    async def _sync_shared_cards(self) -> bool:
+        """
+        Modo multi-worker: publica las AgentCards obtenidas en este worker y adopta las que
+        otro worker validó recientemente para los agentes que aquí no respondieron (p.ej. un
+        timeout puntual en el arranque). Devuelve True si se adoptó alguna tarjeta.
+        El acceso a SQLite se hace en un hilo para no bloquear el event loop.
+        """
+        if self.card_store is None:
+            return False
+        published = {
+            addr: {"card": client.agent_card.model_dump(), "etag": client.etag}
+            for addr, client in self.clients.items()
+            if client.agent_card is not None and client.discovery_failures == 0
+        }
+        max_age = max(DISCOVERY_REFRESH_INTERVAL, DISCOVERY_TIMEOUT) * 2
+
+        def exchange():
+            for addr, value in published.items():
+                self.card_store.set(addr, value)
+            return self.card_store.items(max_age=max_age)
+
+        shared = await asyncio.to_thread(exchange)
+        adopted = False
+        for addr, client in self.clients.items():
+            if client.agent_card is None and addr in shared:
+                client.agent_card = AgentCard(**shared[addr]["card"])
+                client.etag = shared[addr]["etag"]
+                logger.info(f"AgentCard de {addr} tomada del estado compartido")
+                adopted = True
+        return adopted
+
+    async def _refresh_loop(self, interval: float, on_change: Optional[Callable[[], None]]):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await self.refresh() and on_change:
+                    logger.info("AgentCards actualizadas; reconstruyendo herramientas")
+                    on_change()
+            except Exception as e:
+                logger.error(f"Error refrescando AgentCards: {e}")
+
+    def start_refresher(self, on_change: Optional[Callable[[], None]] = None,
+                        interval: float = DISCOVERY_REFRESH_INTERVAL) -> Optional[asyncio.Task]:
+        """
+        Lanza en segundo plano el refresco periódico de AgentCards (interval <= 0 lo desactiva).
+        """
+        if interval <= 0:
+            return None
+        self._refresher = asyncio.create_task(self._refresh_loop(interval, on_change))
+        return self._refresher
+
+    async def stop_refresher(self):
+        refresher = getattr(self, "_refresher", None)
+        if refresher is not None:
+            refresher.cancel()
+            await asyncio.gather(refresher, return_exceptions=True)
+            self._refresher = None
 
     def list_agents_info(self) -> list:
         """
@@ -43,7 +182,9 @@ class HostAgent:
                     "description": card.description,
                     "url": card.url,
                     "streaming": card.capabilities.streaming,
-                    "skills": [s.id for s in card.skills]
+                    "skills": [s.id for s in card.skills],
+                    "replica": c.stats.snapshot(),
+                    "circuit": c.breaker.snapshot()
                 })
             else:
                 infos.append({
@@ -51,24 +192,112 @@ class HostAgent:
                     "description": "Not loaded",
                     "url": addr,
                     "streaming": False,
-                    "skills": []
+                    "skills": [],
+                    "replica": c.stats.snapshot(),
+                    "circuit": c.breaker.snapshot()
                 })
         return infos
 
-    def get_client_by_skill(self, skill_id: str) -> Optional[RemoteAgentClient]:
+    def get_client_by_skill(self, skill_id: str, exclude: Optional[RemoteAgentClient] = None) -> Optional[RemoteAgentClient]:
         """
         Busca y retorna el cliente remoto que soporte una habilidad específica.
+        Si hay varias réplicas, elige una con la estrategia de balanceo entre las no
+        expulsadas y con el circuito cerrado (si ninguna lo está, entre todas).
         Args:
             skill_id (str): ID de la habilidad buscada.
+            exclude (RemoteAgentClient): Réplica a descartar (p.ej. la principal de una petición hedged).
         Returns:
             Optional[RemoteAgentClient]: Cliente que soporta la habilidad, o None si no existe.
         """
-        for client in self.clients.values():
-            if client.agent_card:
-                for skill in client.agent_card.skills:
-                    if skill.id == skill_id:
-                        return client
-        return None
+        replicas = [c for c in self.skill_index.get(skill_id, []) if c is not exclude]
+        if not replicas:
+            return None
+        if len(replicas) == 1:
+            return replicas[0]
+        healthy = [c for c in replicas if c.stats.is_available() and c.breaker.is_available()]
+        return self.strategy.select(skill_id, healthy or replicas)
+
+    async def call_skill(self, skill_id: str, message: str, session_id: Optional[str] = None, hedge: bool = HEDGE_ENABLED,
+                         wait: Optional[float] = None):
+        """
+        Envía la tarea a una réplica de la skill y devuelve su resultado (lanza excepción si falla).
+        Con hedge, si la réplica no responde en su p95 de latencia se lanza la misma tarea en
+        otra réplica y se devuelve la primera respuesta correcta; la otra se cancela también en
+        el agente (tasks/cancel) para que deje de generar.
+        Args:
+            skill_id (str): ID de la habilidad requerida.
+            message (str): Mensaje o payload de la tarea.
+            session_id (str): Sesión A2A; por defecto el trace id de la petición en curso.
+            wait (float): Segundos máximos de espera; pasado ese tiempo se devuelve la tarea
+                pendiente (ver RemoteAgentClient.send_task_async y task_handle).
+        """
+        session_id = session_id or tracing.correlation_id()
+        primary = self.get_client_by_skill(skill_id)
+        if not primary:
+            raise LookupError(f"No agent supports skill '{skill_id}'.")
+        if not hedge or len(self.skill_index.get(skill_id, [])) < 2:
+            return await primary.send_task_async(str(uuid.uuid4()), session_id, message, wait=wait)
+
+        delay = max(primary.breaker.latency_percentile(HEDGE_PERCENTILE) or HEDGE_MIN_DELAY, HEDGE_MIN_DELAY)
+        # Cada petición lleva su propio task_id para poder cancelar en el agente la que pierda
+        first_id = str(uuid.uuid4())
+        first = asyncio.create_task(primary.send_task_async(first_id, session_id, message, wait=wait))
+        owners = {first: (primary, first_id)}
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done:
+                return first.result()
+
+            secondary = self.get_client_by_skill(skill_id, exclude=primary)
+            if not secondary or not secondary.breaker.is_available():
+                return await asyncio.shield(first)
+            logger.info(f"Petición hedged para skill '{skill_id}': {primary.base_url} superó {delay:.2f}s, se lanza en {secondary.base_url}")
+            second_id = str(uuid.uuid4())
+            second = asyncio.create_task(secondary.send_task_async(second_id, session_id, message, wait=wait))
+            owners[second] = (secondary, second_id)
+            pending, outcome = {first, second}, None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        outcome = outcome or task.exception()
+                        continue
+                    result = task.result()
+                    if not RemoteAgentClient.is_error_result(result):
+                        return result
+                    # Error JSON-RPC: se espera a la otra réplica y, si también falla, se devuelve
+                    outcome = result
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return outcome
+        finally:
+            # Perdedora, o todas si se canceló al llamador (desconexión, timeout del gateway,
+            # single-flight): se cancelan aquí y en el agente para liberar la réplica
+            for task, (client, task_id) in owners.items():
+                if not task.done():
+                    task.cancel()
+                    self._cancel_remote(client, task_id)
+
+    def _cancel_remote(self, client: RemoteAgentClient, task_id: str):
+        """
+        Envía tasks/cancel en segundo plano para que la réplica deje de generar una tarea
+        cuyo resultado ya no se usará (p.ej. la perdedora de una petición hedged).
+        """
+        async def cancel():
+            try:
+                await client.cancel_task_async(task_id)
+            except Exception as e:
+                logger.warning(f"No se pudo cancelar la tarea {task_id} en {client.base_url}: {e}")
+
+        task = asyncio.create_task(cancel())
+        self._hedge_cancels.add(task)
+        task.add_done_callback(self._hedge_cancels.discard)
+
+    def list_skill_ids(self) -> List[str]:
+        """
+        Devuelve los IDs de skill disponibles (una vez aunque haya varias réplicas).
+        """
+        return list(self.skill_index.keys())
 
     def send_task_by_skill(self, skill_id: str, message: str) -> dict:
         """
@@ -88,7 +317,7 @@ class HostAgent:
             }
 
         task_id = str(uuid.uuid4())
-        session_id = "session-xyz"
+        session_id = tracing.correlation_id()
 
         try:
             result = client.send_task(task_id, session_id, message)
@@ -107,6 +336,44 @@ class HostAgent:
                 "message": "Error llamando al agente remoto"
             }
 
+    @staticmethod
+    def _agent_key(base_url: str) -> str:
+        return hashlib.sha1(base_url.encode("utf-8")).hexdigest()[:8]
+
+    def task_handle(self, agent_url: str, task_id: str) -> str:
+        """
+        Id público de una tarea en curso: identifica el agente (réplica) y la tarea, así que
+        cualquier worker o réplica del orquestador puede consultarla sin guardar estado.
+        """
+        return f"{self._agent_key(agent_url)}.{task_id}"
+
+    def _resolve_task(self, handle: str):
+        key, _, task_id = handle.partition(".")
+        for client in self.clients.values():
+            if task_id and self._agent_key(client.base_url) == key:
+                return client, task_id
+        raise LookupError(f"Tarea '{handle}' desconocida")
+
+    async def get_task(self, handle: str, wait_seconds: float = 0) -> dict:
+        """tasks/get de una tarea por su task_handle (LookupError si el agente no existe)."""
+        client, task_id = self._resolve_task(handle)
+        return await client.get_task_async(task_id, wait_seconds)
+
+    async def cancel_task(self, handle: str) -> dict:
+        """tasks/cancel de una tarea por su task_handle (LookupError si el agente no existe)."""
+        client, task_id = self._resolve_task(handle)
+        return await client.cancel_task_async(task_id)
+
+    def list_skills(self) -> list:
+        """
+        Devuelve los AgentSkill de todos los agentes con AgentCard cargado.
+        """
+        return [
+            skill
+            for client in self.clients.values() if client.agent_card
+            for skill in client.agent_card.skills
+        ]
+
     def send_task_by_hu(self, hu_id: str) -> str:
         """
         Envía una tarea a un agente usando los casos de prueba filtrados por HU (Historia de Usuario).
@@ -116,16 +383,12 @@ class HostAgent:
             str: Resultado de la operación o mensaje de error.
         """
         try:
-            # Carga los test cases
-            path = Path("data/test_cases.json")
-            if not path.exists():
-                return f"Archivo {path} no encontrado."
-
-            with path.open("r", encoding="utf-8") as f:
-                test_cases = json.load(f)
+            # Consulta los test cases en el índice compartido
+            repository = get_hu_repository()
+            if not repository.exists():
+                return f"Archivo {repository.path} no encontrado."
 
-            # Filtra los casos por hu_id
-            filtered = [c for c in test_cases if c["hu_id"] == hu_id]
+            filtered = repository.get_cases(hu_id)
             if not filtered:
                 return f"No se encontraron casos para HU = {hu_id}"
 
@@ -140,7 +403,7 @@ class HostAgent:
                 return "No se encontró ningún agente con AgentCard cargado."
 
             task_id = str(uuid.uuid4())
-            session_id = "session-pgp"
+            session_id = tracing.correlation_id()
 
             message = json.dumps(filtered, indent=2)
             # Envia el mensaje al agente remoto con el payload de los test cases filtrados por HU
@@ -0,0 +1,125 @@
+# host/load_balancer.py
+import os
+import time
+import threading
+import itertools
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+LB_STRATEGY = os.getenv("LB_STRATEGY", "least_in_flight")
+LB_EWMA_ALPHA = float(os.getenv("LB_EWMA_ALPHA", "0.3"))
+# Expulsión temporal de réplicas que fallan seguido
+LB_EJECT_FAILURES = int(os.getenv("LB_EJECT_FAILURES", "3"))
+LB_EJECT_SECONDS = float(os.getenv("LB_EJECT_SECONDS", "30"))
+
+
+class ReplicaStats:
+    """
+    Métricas de una réplica de agente: peticiones en curso, latencia EWMA y fallos
+    consecutivos. Tras LB_EJECT_FAILURES fallos seguidos la réplica queda expulsada
+    LB_EJECT_SECONDS; pasado ese tiempo vuelve a recibir tráfico de prueba.
+    """
+    def __init__(self, alpha: float = LB_EWMA_ALPHA, eject_failures: int = LB_EJECT_FAILURES,
+                 eject_seconds: float = LB_EJECT_SECONDS):
+        self.alpha = alpha
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.in_flight = 0
+        self.ewma_latency = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.total_requests = 0
+        self.total_failures = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+            self.total_requests += 1
+
+    def finish(self, latency: float, ok: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+            if ok:
+                self.consecutive_failures = 0
+            else:
+                self.total_failures += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= self.eject_failures:
+                    self.ejected_until = time.monotonic() + self.eject_seconds
+
+    def abandon(self):
+        """Llamada cancelada por el llamador: deja de contar como en curso sin registrar resultado."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def is_available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "ewma_latency_ms": round(self.ewma_latency * 1000, 2) if self.ewma_latency is not None else None,
+                "consecutive_failures": self.consecutive_failures,
+                "ejected": not self.is_available(),
+                "total_requests": self.total_requests,
+                "total_failures": self.total_failures
+            }
+
+
+class BalancingStrategy(ABC):
+    @abstractmethod
+    def select(self, skill_id: str, clients: List):
+        pass
+
+
+class RoundRobinStrategy(BalancingStrategy):
+    def __init__(self):
+        self._counters: Dict[str, itertools.count] = {}
+        self._lock = threading.Lock()
+
+    def select(self, skill_id: str, clients: List):
+        with self._lock:
+            counter = self._counters.setdefault(skill_id, itertools.count())
+            return clients[next(counter) % len(clients)]
+
+
+class LeastInFlightStrategy(BalancingStrategy):
+    def select(self, skill_id: str, clients: List):
+        return min(clients, key=lambda c: c.stats.in_flight)
+
+
+class LatencyEWMAStrategy(BalancingStrategy):
+    """
+    Elige la réplica con menor latencia esperada: EWMA × (peticiones en curso + 1).
+    Las réplicas sin muestras usan la menor EWMA conocida, de modo que reciben
+    tráfico sin acapararlo.
+    """
+    def select(self, skill_id: str, clients: List):
+        known = [c.stats.ewma_latency for c in clients if c.stats.ewma_latency is not None]
+        default = min(known) if known else 0.0
+
+        def cost(client):
+            ewma = client.stats.ewma_latency
+            ewma = default if ewma is None else ewma
+            return (ewma * (client.stats.in_flight + 1), client.stats.in_flight)
+        return min(clients, key=cost)
+
+
+STRATEGIES = {
+    "round_robin": RoundRobinStrategy,
+    "least_in_flight": LeastInFlightStrategy,
+    "latency_ewma": LatencyEWMAStrategy,
+}
+
+
+def build_strategy(name: str = LB_STRATEGY) -> BalancingStrategy:
+    try:
+        return STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(f"Estrategia de balanceo desconocida: '{name}'. Opciones: {', '.join(STRATEGIES)}")
@@ -1,15 +1,146 @@
-import requests
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import httpx
 from agents.agent_card import AgentCard
+from core.custom_types import TaskState
+from host.load_balancer import ReplicaStats
+from host.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.metrics import observe_upstream
+from core import tracing
+
+logger = logging.getLogger(__name__)
+
+# Límite de peticiones simultáneas hacia un mismo agente remoto
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "16"))
+
+# Pool HTTP compartido por proceso para todas las llamadas A2A
+AGENT_HTTP_POOL_SIZE = int(os.getenv("AGENT_HTTP_POOL_SIZE", "100"))
+AGENT_HTTP_KEEPALIVE = int(os.getenv("AGENT_HTTP_KEEPALIVE", "20"))
+AGENT_CONNECT_TIMEOUT = float(os.getenv("AGENT_CONNECT_TIMEOUT", "5"))
+# Las respuestas incluyen generación con LLM: el timeout de lectura es holgado
+AGENT_READ_TIMEOUT = float(os.getenv("AGENT_READ_TIMEOUT", "120"))
+AGENT_MAX_RETRIES = int(os.getenv("AGENT_MAX_RETRIES", "2"))
+AGENT_RETRY_BACKOFF = float(os.getenv("AGENT_RETRY_BACKOFF", "0.2"))
+
+# Espera de tareas: tasks/send y tasks/get llevan wait_seconds y el agente responde en cuanto
+# la tarea termina (long polling), así que no hay pausas entre consultas
+AGENT_TASK_TIMEOUT = float(os.getenv("AGENT_TASK_TIMEOUT", "600"))
+AGENT_TASK_POLL_WAIT = float(os.getenv("AGENT_TASK_POLL_WAIT", "10"))
+# Pausa entre consultas solo con agentes que no esperan (responden SUBMITTED al instante)
+AGENT_TASK_POLL_INTERVAL = float(os.getenv("AGENT_TASK_POLL_INTERVAL", "0.1"))
+AGENT_TASK_POLL_MAX_INTERVAL = float(os.getenv("AGENT_TASK_POLL_MAX_INTERVAL", "1.0"))
+
+# Errores en los que la petición no llegó a procesarse y es seguro reintentar
+RETRYABLE_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.PoolTimeout)
+RETRYABLE_STATUS = {502, 503, 504}
+
+_sync_client: httpx.Client | None = None
+_async_clients: dict = {}
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(AGENT_READ_TIMEOUT, connect=AGENT_CONNECT_TIMEOUT)
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=AGENT_HTTP_POOL_SIZE, max_keepalive_connections=AGENT_HTTP_KEEPALIVE)
+
+
+def get_sync_http_client() -> httpx.Client:
+    """
+    Cliente HTTP síncrono con keep-alive, compartido por todo el proceso.
+    """
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(timeout=_http_timeout(), limits=_http_limits(),
+                                    event_hooks={"request": [tracing.inject_headers]})
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Cliente HTTP asíncrono con keep-alive, compartido por el proceso.
+    El pool de conexiones está ligado al event loop, así que se mantiene uno por loop.
+    """
+    loop = asyncio.get_running_loop()
+    for stale in [l for l in _async_clients if l.is_closed()]:
+        _async_clients.pop(stale, None)
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=_http_timeout(), limits=_http_limits(),
+                                   event_hooks={"request": [tracing.ainject_headers]})
+        _async_clients[loop] = client
+    return client
+
+
+async def close_http_clients():
+    """
+    Cierra los pools HTTP compartidos (apagado del servicio).
+    """
+    global _sync_client
+    for client in list(_async_clients.values()):
+        await client.aclose()
+    _async_clients.clear()
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Backoff exponencial con jitter completo
+    return random.uniform(0, AGENT_RETRY_BACKOFF * (2 ** attempt))
+
+
+def _should_retry(attempt: int, exc: Exception | None = None, response: httpx.Response | None = None) -> bool:
+    if attempt >= AGENT_MAX_RETRIES:
+        return False
+    if exc is not None:
+        return isinstance(exc, RETRYABLE_EXCEPTIONS)
+    return response is not None and response.status_code in RETRYABLE_STATUS
+
+
+async def iter_sse_events(response: httpx.Response):
+    """
+    Parsea un stream text/event-stream y produce tuplas (evento, datos).
+    Los datos se devuelven como dict si son JSON; los comentarios (pings) se ignoran.
+    """
+    event, data_lines = "message", []
+    async for line in response.aiter_lines():
+        if not line:
+            if data_lines:
+                raw = "\n".join(data_lines)
+                try:
+                    data = json.loads(raw)
+                except ValueError:
+                    data = raw
+                yield event, data
+            event, data_lines = "message", []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].lstrip(" "))
+
 
 class RemoteAgentClient:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, max_concurrency: int = AGENT_MAX_CONCURRENCY):
         self.base_url = base_url.rstrip("/")
         self.agent_card: AgentCard | None = None
+        self.etag: str | None = None
+        self.discovery_failures = 0
+        self.stats = ReplicaStats()
+        self.breaker = CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
 
     def fetch_agent_card(self):
         try:
             url = f"{self.base_url}/.well-known/agent.json"
-            response = requests.get(url)
+            response = self._request_sync("GET", url)
             response.raise_for_status()
             data = response.json()
             self.agent_card = AgentCard(**data)
@@ -17,27 +148,342 @@ class RemoteAgentClient:
             print(f"No se pudo obtener agent.json desde {self.base_url}: {e}")
             self.agent_card = None
 
-    def send_task(self, task_id: str, session_id: str, message: str):
-        if not self.agent_card:
-            raise RuntimeError("Agente remoto no inicializado")
+    async def fetch_agent_card_async(self, max_failures: int = 1) -> bool:
+        """
+        Descarga (o revalida con If-None-Match) la AgentCard del agente.
+        Un 304 confirma que la tarjeta no cambió. Tras max_failures errores seguidos
+        se descarta la tarjeta. Devuelve True si la tarjeta cambió.
+        """
+        url = f"{self.base_url}/.well-known/agent.json"
+        headers = {"If-None-Match": self.etag} if self.etag and self.agent_card else {}
+        try:
+            response = await self._request_async("GET", url, headers=headers)
+            if response.status_code == 304:
+                self.discovery_failures = 0
+                return False
+            response.raise_for_status()
+            card = AgentCard(**response.json())
+        except Exception as e:
+            self.discovery_failures += 1
+            logger.warning(f"No se pudo obtener agent.json desde {self.base_url}: {type(e).__name__}: {e}")
+            if self.agent_card is not None and self.discovery_failures >= max_failures:
+                self.agent_card = None
+                self.etag = None
+                return True
+            return False
 
-        payload = {
-            "jsonrpc": "2.0",
-            "method": "tasks/send",
+        self.discovery_failures = 0
+        self.etag = response.headers.get("etag")
+        changed = self.agent_card is None or self.agent_card.model_dump() != card.model_dump()
+        self.agent_card = card
+        return changed
+
+    def _before_call(self):
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Circuito abierto para el agente {self.base_url}")
+        self.stats.start()
+
+    def _after_call(self, latency: float, ok: bool):
+        """
+        Registra el resultado de la llamada. latency es la del intercambio con el agente
+        (respuesta de tasks/send o apertura del stream), no la espera por la generación:
+        una réplica sana con generaciones largas no debe abrir su circuito ni alargar el hedge.
+        """
+        self.stats.finish(latency, ok)
+        self.breaker.record(ok, latency)
+
+    def _abandon_call(self):
+        """Llamada cancelada por el llamador: se libera sin registrar resultado ni latencia."""
+        self.stats.abandon()
+        self.breaker.release()
+
+    def _build_payload(self, task_id: str, session_id: str, message: str, method: str = "tasks/send",
+                       wait_seconds: float | None = None) -> dict:
+        params = {
             "id": task_id,
-            "params": {
-                "session_id": session_id,
-                "message": {
-                    "parts": [{"text": message}]
-                }
+            "session_id": session_id,
+            "message": {
+                "parts": [{"text": message}]
             }
         }
+        if wait_seconds is not None:
+            params["wait_seconds"] = wait_seconds
+        # El traceparent viaja también en params: tasks/send se ejecuta en la cola del agente,
+        # fuera de la petición HTTP que lo recibió
+        metadata = tracing.inject_metadata(None)
+        if metadata:
+            params["metadata"] = metadata
+        return {
+            "jsonrpc": "2.0",
+            "method": method,
+            "id": task_id,
+            "params": params
+        }
 
-        url = f"{self.base_url}/jsonrpc"
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        data = response.json()
+    @staticmethod
+    def _parse_response(data):
         if isinstance(data, dict):
             return data.get("result") or data.get("error")
         else:
             return data
+
+    @staticmethod
+    def is_pending_task(result) -> bool:
+        """True si el resultado es una tarea que aún no terminó (SUBMITTED o WORKING)."""
+        return isinstance(result, dict) and "id" in result and result.get("state") in (
+            TaskState.SUBMITTED, TaskState.WORKING
+        )
+
+    @staticmethod
+    def is_error_result(result) -> bool:
+        """True si el resultado es un error JSON-RPC (incluida una tarea terminada en ERROR o CANCELED)."""
+        return isinstance(result, dict) and "code" in result and "status" not in result
+
+    @staticmethod
+    def task_outcome(task: dict):
+        """
+        Convierte una tarea terminada en lo que devolvía la llamada síncrona:
+        el resultado si COMPLETED, o un error JSON-RPC en otro caso.
+        """
+        if task.get("state") == TaskState.COMPLETED:
+            return task.get("result")
+        return {"code": -32603, "message": task.get("error") or f"Tarea {task.get('id')} en estado {task.get('state')}"}
+
+    def _task_payload(self, method: str, task_id: str, wait_seconds: float | None = None) -> dict:
+        params = {"id": task_id}
+        if wait_seconds:
+            params["wait_seconds"] = round(wait_seconds, 3)
+        return {"jsonrpc": "2.0", "method": method, "id": task_id, "params": params}
+
+    def _finish_task(self, task, keep_pending: bool):
+        if self.is_pending_task(task):
+            # Tarea aún en curso: se devuelve con la URL del agente para consultarla después
+            return {**task, "agent": self.base_url} if keep_pending else task
+        return self.task_outcome(task) if isinstance(task, dict) and "state" in task else task
+
+    def _wait_for_task(self, task: dict, deadline: float):
+        url = f"{self.base_url}/jsonrpc"
+        interval = AGENT_TASK_POLL_INTERVAL
+        while self.is_pending_task(task):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._request_sync("POST", url, json=self._task_payload("tasks/cancel", task["id"]))
+                raise TimeoutError(f"La tarea {task['id']} no terminó en {AGENT_TASK_TIMEOUT}s")
+            poll_wait, start = min(AGENT_TASK_POLL_WAIT, remaining), time.monotonic()
+            response = self._request_sync("POST", url, json=self._task_payload("tasks/get", task["id"], poll_wait))
+            response.raise_for_status()
+            task = self._parse_response(response.json())
+            if self.is_pending_task(task) and time.monotonic() - start < poll_wait / 2:
+                # El agente respondió sin esperar (sin long polling): pausa con backoff
+                time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+                interval = min(interval * 1.5, AGENT_TASK_POLL_MAX_INTERVAL)
+        return self._finish_task(task, keep_pending=False)
+
+    async def _wait_for_task_async(self, task: dict, deadline: float, keep_pending: bool):
+        """
+        Consulta la tarea con tasks/get (long polling) hasta que termina o vence deadline.
+        Al vencer, con keep_pending se devuelve la tarea pendiente; si no, se cancela.
+        """
+        url = f"{self.base_url}/jsonrpc"
+        interval = AGENT_TASK_POLL_INTERVAL
+        while self.is_pending_task(task):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if keep_pending:
+                    break
+                await self._request_async("POST", url, json=self._task_payload("tasks/cancel", task["id"]))
+                raise TimeoutError(f"La tarea {task['id']} no terminó en {AGENT_TASK_TIMEOUT}s")
+            poll_wait, start = min(AGENT_TASK_POLL_WAIT, remaining), time.monotonic()
+            response = await self._request_async("POST", url, json=self._task_payload("tasks/get", task["id"], poll_wait))
+            response.raise_for_status()
+            task = self._parse_response(response.json())
+            if self.is_pending_task(task) and time.monotonic() - start < poll_wait / 2:
+                # El agente respondió sin esperar (sin long polling): pausa con backoff
+                await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+                interval = min(interval * 1.5, AGENT_TASK_POLL_MAX_INTERVAL)
+        return self._finish_task(task, keep_pending)
+
+    async def get_task_async(self, task_id: str, wait_seconds: float = 0):
+        """
+        tasks/get de una tarea de este agente: la tarea (dict) o el error JSON-RPC.
+        Con wait_seconds el agente responde en cuanto termina o tras ese tiempo.
+        """
+        url = f"{self.base_url}/jsonrpc"
+        response = await self._request_async("POST", url, json=self._task_payload("tasks/get", task_id, wait_seconds))
+        response.raise_for_status()
+        return self._parse_response(response.json())
+
+    async def cancel_task_async(self, task_id: str):
+        """tasks/cancel de una tarea de este agente: la tarea cancelada o el error JSON-RPC."""
+        url = f"{self.base_url}/jsonrpc"
+        response = await self._request_async("POST", url, json=self._task_payload("tasks/cancel", task_id))
+        response.raise_for_status()
+        return self._parse_response(response.json())
+
+    def _observe_hop(self, kwargs: dict, url: str, start: float, response: httpx.Response | None):
+        """
+        Latencia del salto hacia el agente (/metrics), por intento. La operación es el método
+        JSON-RPC si la petición lo lleva y, si no, la ruta de la URL.
+        """
+        payload = kwargs.get("json")
+        operation = payload.get("method") if isinstance(payload, dict) and payload.get("method") else httpx.URL(url).path
+        outcome = f"{response.status_code // 100}xx" if response is not None else "error"
+        observe_upstream(self.base_url, operation, time.perf_counter() - start, outcome)
+
+    def _request_sync(self, method: str, url: str, **kwargs) -> httpx.Response:
+        client = get_sync_http_client()
+        attempt = 0
+        while True:
+            start, response = time.perf_counter(), None
+            try:
+                response = client.request(method, url, **kwargs)
+            except Exception as exc:
+                if not _should_retry(attempt, exc=exc):
+                    raise
+                logger.warning(f"Reintentando {method} {url} tras error: {exc}")
+            else:
+                if not _should_retry(attempt, response=response):
+                    return response
+                logger.warning(f"Reintentando {method} {url} tras HTTP {response.status_code}")
+            finally:
+                self._observe_hop(kwargs, url, start, response)
+            time.sleep(_backoff_delay(attempt))
+            attempt += 1
+
+    async def _request_async(self, method: str, url: str, **kwargs) -> httpx.Response:
+        client = get_async_http_client()
+        attempt = 0
+        while True:
+            start, response = time.perf_counter(), None
+            try:
+                response = await client.request(method, url, **kwargs)
+            except Exception as exc:
+                if not _should_retry(attempt, exc=exc):
+                    raise
+                logger.warning(f"Reintentando {method} {url} tras error: {exc}")
+            else:
+                if not _should_retry(attempt, response=response):
+                    return response
+                logger.warning(f"Reintentando {method} {url} tras HTTP {response.status_code}")
+            finally:
+                self._observe_hop(kwargs, url, start, response)
+            await asyncio.sleep(_backoff_delay(attempt))
+            attempt += 1
+
+    def send_task(self, task_id: str, session_id: str, message: str):
+        """
+        Fachada síncrona para los llamadores existentes; usa el pool síncrono compartido.
+        Si la tarea no termina durante tasks/send, se consulta con tasks/get hasta que termine.
+        """
+        if not self.agent_card:
+            raise RuntimeError("Agente remoto no inicializado")
+
+        url = f"{self.base_url}/jsonrpc"
+        with tracing.start_span("a2a tasks/send", kind="client", agent=self.base_url, task_id=task_id):
+            payload = self._build_payload(task_id, session_id, message, wait_seconds=AGENT_TASK_POLL_WAIT)
+            self._before_call()
+            start, ok, latency = time.perf_counter(), False, None
+            try:
+                response = self._request_sync("POST", url, json=payload)
+                latency = time.perf_counter() - start
+                response.raise_for_status()
+                result = self._parse_response(response.json())
+                if self.is_pending_task(result):
+                    result = self._wait_for_task(result, time.monotonic() + AGENT_TASK_TIMEOUT)
+                # Un error JSON-RPC o una tarea en ERROR cuentan como fallo de la réplica
+                ok = not self.is_error_result(result)
+                return result
+            finally:
+                self._after_call(latency if latency is not None else time.perf_counter() - start, ok)
+
+    async def send_task_async(self, task_id: str, session_id: str, message: str, wait: float | None = None):
+        """
+        Versión asíncrona de send_task: no bloquea el event loop mientras el agente responde.
+        El número de llamadas simultáneas al agente queda acotado por max_concurrency.
+        Si la tarea no termina durante tasks/send, se consulta con tasks/get (long polling).
+        Args:
+            wait: segundos máximos de espera. Si la tarea sigue en curso pasado ese tiempo se
+                devuelve pendiente (dict con id, state y agent) sin cancelarla. Sin wait se
+                espera hasta AGENT_TASK_TIMEOUT y después se cancela.
+        """
+        if not self.agent_card:
+            raise RuntimeError("Agente remoto no inicializado")
+
+        url = f"{self.base_url}/jsonrpc"
+        keep_pending = wait is not None
+        budget = AGENT_TASK_TIMEOUT if wait is None else max(wait, 0.0)
+        with tracing.start_span("a2a tasks/send", kind="client", agent=self.base_url, task_id=task_id):
+            payload = self._build_payload(task_id, session_id, message, wait_seconds=min(budget, AGENT_TASK_POLL_WAIT))
+            async with self._semaphore:
+                self._before_call()
+                start, ok, latency, cancelled = time.perf_counter(), False, None, False
+                deadline = time.monotonic() + budget
+                try:
+                    response = await self._request_async("POST", url, json=payload)
+                    # Latencia del intercambio tasks/send; el long polling posterior es generación
+                    latency = time.perf_counter() - start
+                    response.raise_for_status()
+                    result = self._parse_response(response.json())
+                    if self.is_pending_task(result):
+                        result = await self._wait_for_task_async(result, deadline, keep_pending)
+                    # Un error JSON-RPC o una tarea en ERROR cuentan como fallo de la réplica
+                    ok = not self.is_error_result(result)
+                    return result
+                except asyncio.CancelledError:
+                    # Cancelada por el llamador (p.ej. perdió una petición hedged): no se sabe
+                    # si la réplica habría respondido, así que no cuenta ni como éxito ni como fallo
+                    cancelled = True
+                    raise
+                finally:
+                    if cancelled:
+                        self._abandon_call()
+                    else:
+                        self._after_call(latency if latency is not None else time.perf_counter() - start, ok)
+
+    async def send_task_subscribe(self, task_id: str, session_id: str, message: str):
+        """
+        Envía la tarea con tasks/sendSubscribe y produce los eventos SSE del agente
+        (evento, datos) a medida que llegan.
+        """
+        if not self.agent_card:
+            raise RuntimeError("Agente remoto no inicializado")
+
+        url = f"{self.base_url}/jsonrpc"
+        with tracing.start_span("a2a tasks/sendSubscribe", kind="client", agent=self.base_url, task_id=task_id):
+            payload = self._build_payload(task_id, session_id, message, method="tasks/sendSubscribe")
+            async with self._semaphore:
+                self._before_call()
+                start, ok, failed, abandoned, latency = time.perf_counter(), False, False, False, None
+                try:
+                    async with get_async_http_client().stream("POST", url, json=payload) as response:
+                        # Latencia hasta abrir el stream; los tokens que siguen son generación
+                        latency = time.perf_counter() - start
+                        response.raise_for_status()
+                        if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                            # El agente respondió con un JSON-RPC normal (p.ej. un error de validación)
+                            await response.aread()
+                            data = response.json()
+                            result = self._parse_response(data)
+                            failed = self.is_error_result(result)
+                            ok = not failed
+                            if isinstance(data, dict) and data.get("error"):
+                                yield "error", data["error"]
+                            else:
+                                yield "done", result
+                            return
+                        async for event in iter_sse_events(response):
+                            failed = failed or event[0] == "error"
+                            yield event
+                        ok = not failed
+                except (GeneratorExit, asyncio.CancelledError):
+                    # El consumidor abandonó el stream: cuenta como fallo solo si ya había
+                    # recibido un error; si no, la llamada se libera sin registrar resultado
+                    abandoned, ok = not failed, not failed
+                    raise
+                finally:
+                    if abandoned:
+                        self._abandon_call()
+                    else:
+                        self._after_call(latency if latency is not None else time.perf_counter() - start, ok)
+                    # En streaming el salto cubre el stream completo
+                    observe_upstream(self.base_url, "tasks/sendSubscribe", time.perf_counter() - start, "2xx" if ok else "error")
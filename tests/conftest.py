@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def sample_cases():
+    """Casos de varias HUs, con texto no ASCII para que offsets en bytes y caracteres difieran."""
+    return [
+        {"id": "TC-1", "hu_id": "HU-1", "title": "Login", "steps": ["Ingresar el usuario 'ana'"]},
+        {"id": "TC-2", "hu_id": "HU-2", "title": "Recuperación de contraseña", "steps": ["Pulsar '¿Olvidaste?'"]},
+        {"id": "TC-3", "hu_id": "HU-1", "title": "Login con ñ", "steps": ["Ingresar el usuario 'íñigo'"]},
+        {"id": "TC-4", "hu_id": "HU/3", "title": "Clima", "steps": []},
+    ]
+
+
+@pytest.fixture
+def json_source(tmp_path, sample_cases):
+    path = tmp_path / "cases.json"
+    path.write_text(json.dumps(sample_cases, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def ndjson_source(tmp_path, sample_cases):
+    path = tmp_path / "cases.ndjson"
+    lines = [json.dumps(case, ensure_ascii=False) for case in sample_cases]
+    # Líneas en blanco, sangría y CRLF: los offsets deben seguir apuntando a cada objeto
+    path.write_bytes(("\r\n".join(lines[:2]) + "\n\n  " + "\n".join(lines[2:]) + "\n").encode("utf-8"))
+    return path
@@ -0,0 +1,92 @@
+import time
+
+from host.circuit_breaker import CircuitBreaker, CircuitState
+
+
+def breaker(**kwargs):
+    options = dict(window_size=10, min_requests=4, error_rate=0.5, latency_p95_threshold=0,
+                   open_seconds=0.05, half_open_max_calls=1, enabled=True)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def fail(cb, n, latency=0.01):
+    for _ in range(n):
+        assert cb.allow_request()
+        cb.record(False, latency)
+
+
+def test_stays_closed_below_min_requests():
+    cb = breaker()
+    fail(cb, 3)
+    assert cb.state == CircuitState.CLOSED
+
+
+def test_opens_on_error_rate_and_rejects():
+    cb = breaker()
+    cb.record(True, 0.01)
+    fail(cb, 3)
+    assert cb.state == CircuitState.OPEN
+    assert cb.times_opened == 1
+    assert not cb.allow_request()
+    assert not cb.is_available()
+
+
+def test_half_open_success_closes():
+    cb = breaker()
+    fail(cb, 4)
+    time.sleep(0.06)
+    assert cb.is_available()
+    assert cb.allow_request()
+    # Solo una llamada de prueba a la vez
+    assert not cb.allow_request()
+    cb.record(True, 0.01)
+    assert cb.state == CircuitState.CLOSED
+    assert cb.snapshot()["error_rate"] == 0
+
+
+def test_half_open_failure_reopens():
+    cb = breaker()
+    fail(cb, 4)
+    time.sleep(0.06)
+    assert cb.allow_request()
+    cb.record(False, 0.01)
+    assert cb.state == CircuitState.OPEN
+    assert cb.times_opened == 2
+    assert not cb.allow_request()
+
+
+def test_opens_on_latency_p95():
+    cb = breaker(latency_p95_threshold=1.0)
+    for latency in (0.1, 0.1, 2.0, 2.0):
+        cb.record(True, latency)
+    assert cb.state == CircuitState.OPEN
+
+
+def test_latency_percentile_ignores_failures():
+    cb = breaker(min_requests=100)
+    for latency in (0.1, 0.2, 0.3):
+        cb.record(True, latency)
+    cb.record(False, 9.0)
+    assert cb.latency_percentile(50) == 0.2
+    assert cb.latency_percentile(95) == 0.3
+
+
+def test_disabled_never_opens():
+    cb = breaker(enabled=False)
+    fail(cb, 10)
+    assert cb.state == CircuitState.CLOSED
+    assert cb.allow_request()
+
+
+def test_release_frees_half_open_slot_without_recording():
+    cb = breaker()
+    fail(cb, 4)
+    time.sleep(0.06)
+    assert cb.allow_request()
+    assert not cb.allow_request()
+    window = list(cb._window)
+    cb.release()
+    assert cb.state == CircuitState.HALF_OPEN
+    assert list(cb._window) == window
+    assert cb.allow_request()
@@ -0,0 +1,61 @@
+import pytest
+
+from core.hu_store import HUStore, is_hu_store, write_hu_store
+
+
+def grouped(cases):
+    by_hu = {}
+    for case in cases:
+        by_hu.setdefault(case["hu_id"], []).append(case)
+    return by_hu
+
+
+@pytest.mark.parametrize("source", ["json_source", "ndjson_source"])
+def test_round_trip(request, tmp_path, sample_cases, source):
+    target = tmp_path / "cases.hus"
+    write_hu_store(request.getfixturevalue(source), target)
+    assert is_hu_store(target)
+
+    expected = grouped(sample_cases)
+    store = HUStore(target)
+    try:
+        assert len(store) == len(expected)
+        assert sorted(store.hu_ids()) == sorted(expected)
+        for hu_id, cases in expected.items():
+            assert store.get_cases(hu_id) == cases
+        # records() sigue el orden del fichero y sus offsets se pueden leer directamente
+        records = store.records()
+        assert [offset for _, offset in records] == sorted(offset for _, offset in records)
+        assert {hu_id: store.get_cases_at(offset) for hu_id, offset in records} == expected
+    finally:
+        store.close()
+
+
+def test_missing_hu_returns_empty_list(tmp_path, json_source):
+    target = tmp_path / "cases.hus"
+    write_hu_store(json_source, target)
+    store = HUStore(target)
+    try:
+        assert store.get_cases("HU-404") == []
+    finally:
+        store.close()
+
+
+def test_rewrite_replaces_file(tmp_path, json_source, sample_cases):
+    target = tmp_path / "cases.hus"
+    write_hu_store(json_source, target)
+    json_source.write_text("[]", encoding="utf-8")
+    write_hu_store(json_source, target)
+    store = HUStore(target)
+    try:
+        assert len(store) == 0
+        assert store.get_cases(sample_cases[0]["hu_id"]) == []
+    finally:
+        store.close()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.hus"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        HUStore(path)
@@ -0,0 +1,43 @@
+import io
+import json
+
+from core.hu_stream import iter_json_array, iter_test_cases, iter_test_cases_with_offsets
+
+
+def assert_offsets_point_to_cases(path, expected):
+    data = path.read_bytes()
+    seen = []
+    for case, offset, length in iter_test_cases_with_offsets(path):
+        assert json.loads(data[offset:offset + length]) == case
+        seen.append(case)
+    assert seen == expected
+
+
+def test_json_array_offsets(json_source, sample_cases):
+    assert_offsets_point_to_cases(json_source, sample_cases)
+
+
+def test_ndjson_offsets(ndjson_source, sample_cases):
+    assert_offsets_point_to_cases(ndjson_source, sample_cases)
+
+
+def test_offsets_across_chunk_boundaries(sample_cases):
+    # Bloques de pocos bytes: los elementos y los caracteres multibyte quedan partidos
+    data = json.dumps(sample_cases, ensure_ascii=False).encode("utf-8")
+    for chunk_size in (1, 3, 7, 64):
+        items = list(iter_json_array(io.BytesIO(data), chunk_size=chunk_size))
+        assert [item for item, _, _ in items] == sample_cases
+        for item, offset, length in items:
+            assert json.loads(data[offset:offset + length]) == item
+
+
+def test_non_object_elements_are_skipped(tmp_path):
+    path = tmp_path / "mixed.json"
+    path.write_text('[1, {"hu_id": "HU-1"}, "x", null, {"hu_id": "HU-2"}]', encoding="utf-8")
+    assert [case["hu_id"] for case in iter_test_cases(path)] == ["HU-1", "HU-2"]
+
+
+def test_empty_array(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text("  [ ]\n", encoding="utf-8")
+    assert list(iter_test_cases(path)) == []
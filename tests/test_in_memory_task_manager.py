@@ -0,0 +1,138 @@
+import asyncio
+from core.custom_types import CancelTaskRequest, GetTaskRequest, SendTaskRequest, TaskState
+from core.in_memory_task_manager import InMemoryTaskManager
+
+
+def send_request(task_id=None, wait_seconds=None, text="hola"):
+    params = {"message": {"parts": [{"text": text}]}, "id": task_id, "wait_seconds": wait_seconds}
+    return SendTaskRequest(jsonrpc="2.0", id="1", params=params)
+
+
+def get_request(task_id, wait_seconds=None):
+    return GetTaskRequest(jsonrpc="2.0", id="2", params={"id": task_id, "wait_seconds": wait_seconds})
+
+
+def cancel_request(task_id):
+    return CancelTaskRequest(jsonrpc="2.0", id="3", params={"id": task_id})
+
+
+def run(coro_factory, handler, **kwargs):
+    async def main():
+        manager = InMemoryTaskManager(handler, num_workers=2, **kwargs)
+        try:
+            return await coro_factory(manager)
+        finally:
+            await manager.shutdown()
+    return asyncio.run(main())
+
+
+async def echo(request):
+    await asyncio.sleep(0.01)
+    return {"status": "success", "text": request.params.message.parts[0].text}
+
+
+def test_send_waits_for_completion():
+    async def scenario(manager):
+        return (await manager.on_send_task(send_request(wait_seconds=1))).result
+
+    task = run(scenario, echo)
+    assert task.state == TaskState.COMPLETED
+    assert task.result == {"status": "success", "text": "hola"}
+
+
+def test_send_without_wait_then_long_poll():
+    async def scenario(manager):
+        submitted = (await manager.on_send_task(send_request(wait_seconds=0))).result
+        assert submitted.state == TaskState.SUBMITTED
+        return (await manager.on_get_task(get_request(submitted.id, wait_seconds=1))).result
+
+    assert run(scenario, echo).state == TaskState.COMPLETED
+
+
+def test_send_is_idempotent_by_client_id():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.params.id)
+        return await echo(request)
+
+    async def scenario(manager):
+        first = (await manager.on_send_task(send_request("t-1", wait_seconds=1))).result
+        second = (await manager.on_send_task(send_request("t-1", wait_seconds=1))).result
+        return first, second
+
+    first, second = run(scenario, handler)
+    assert first.id == second.id == "t-1"
+    assert calls == ["t-1"]
+
+
+def test_handler_error_marks_task_error():
+    async def failing(request):
+        raise RuntimeError("LLM caído")
+
+    async def scenario(manager):
+        return (await manager.on_send_task(send_request(wait_seconds=1))).result
+
+    task = run(scenario, failing)
+    assert task.state == TaskState.ERROR
+    assert "LLM caído" in task.error
+
+
+def test_cancel_running_task():
+    async def slow(request):
+        await asyncio.sleep(10)
+
+    async def scenario(manager):
+        task = (await manager.on_send_task(send_request(wait_seconds=0.05))).result
+        assert task.state == TaskState.WORKING
+        cancelled = (await manager.on_cancel_task(cancel_request(task.id))).result
+        again = await manager.on_cancel_task(cancel_request(task.id))
+        stored = (await manager.on_get_task(get_request(task.id))).result
+        return cancelled, again, stored
+
+    cancelled, again, stored = run(scenario, slow)
+    assert cancelled.state == TaskState.CANCELED
+    assert again.error.code == -32002
+    assert stored.state == TaskState.CANCELED
+
+
+def test_unknown_task():
+    async def scenario(manager):
+        return await manager.on_get_task(get_request("no-existe"))
+
+    assert run(scenario, echo).error.code == -32001
+
+
+def test_finished_tasks_expire_after_ttl():
+    async def scenario(manager):
+        task = (await manager.on_send_task(send_request(wait_seconds=1))).result
+        assert (await manager.on_get_task(get_request(task.id))).result.state == TaskState.COMPLETED
+        await asyncio.sleep(0.06)
+        # Las lecturas no purgan: lo caducado se borra al recibir la siguiente tarea
+        await manager.on_send_task(send_request())
+        return await manager.on_get_task(get_request(task.id))
+
+    assert run(scenario, echo, ttl_seconds=0.05).error.code == -32001
+
+
+def test_store_limit_drops_oldest_finished_tasks():
+    async def scenario(manager):
+        ids = []
+        for _ in range(3):
+            ids.append((await manager.on_send_task(send_request(wait_seconds=1))).result.id)
+        return ids, [await manager.on_get_task(get_request(task_id)) for task_id in ids]
+
+    ids, responses = run(scenario, echo, max_tasks=2, ttl_seconds=0)
+    assert responses[0].error.code == -32001
+    assert all(response.result.state == TaskState.COMPLETED for response in responses[1:])
+
+
+def test_full_store_rejects_new_tasks():
+    async def slow(request):
+        await asyncio.sleep(10)
+
+    async def scenario(manager):
+        await manager.on_send_task(send_request(wait_seconds=0))
+        return await manager.on_send_task(send_request(wait_seconds=0))
+
+    assert run(scenario, slow, max_tasks=1).error.code == -32603
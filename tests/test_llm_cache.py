@@ -0,0 +1,93 @@
+import time
+
+from agents.llm_cache import LLMResultCache, make_cache_key
+
+CASES = [{"hu_id": "HU-1", "title": "Login", "steps": ["a", "b"]}]
+
+
+def key(**overrides):
+    args = dict(prompt_template="p", model="m", temperature=0.2, test_cases=CASES,
+                input_mode="json", provider="ollama", endpoint="http://llm:11434")
+    args.update(overrides)
+    return make_cache_key(**args)
+
+
+def test_cache_key_is_canonical():
+    reordered = [{"steps": ["a", "b"], "title": "Login", "hu_id": "HU-1"}]
+    assert key() == key(test_cases=reordered)
+
+
+def test_cache_key_depends_on_every_input():
+    variants = [
+        key(prompt_template="q"), key(model="n"), key(temperature=0.3),
+        key(test_cases=[{**CASES[0], "steps": ["a"]}]), key(input_mode="text"),
+        key(provider="fake"), key(endpoint="http://otro:11434"),
+    ]
+    assert len({key(), *variants}) == len(variants) + 1
+
+
+def test_memory_lru_eviction():
+    cache = LLMResultCache(max_entries=2, ttl_seconds=0, sqlite_path="")
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"      # "a" pasa a ser la más reciente
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.evictions == 1
+
+
+def test_memory_ttl():
+    cache = LLMResultCache(max_entries=10, ttl_seconds=0.05, sqlite_path="")
+    cache.set("a", "1")
+    assert cache.get("a") == "1"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = LLMResultCache(max_entries=10, ttl_seconds=0, sqlite_path=path)
+    writer.set("a", "1")
+    reader = LLMResultCache(max_entries=10, ttl_seconds=0, sqlite_path=path)
+    assert reader.get("a") == "1"
+    assert reader.disk_hits == 1
+    assert reader.get("a") == "1"
+    assert reader.memory_hits == 1
+
+
+def test_evict_disk_keeps_most_recently_used(tmp_path):
+    cache = LLMResultCache(max_entries=1, ttl_seconds=0, sqlite_path=str(tmp_path / "cache.db"),
+                           sqlite_max_entries=2, evict_every=1000)
+    for name in ("a", "b", "c"):
+        cache.set(name, name)
+        time.sleep(0.01)
+    assert cache.stats()["disk_size"] == 3
+    assert cache.evict_disk() == 1
+    assert cache.stats()["disk_size"] == 2
+    assert cache.disk_evictions == 1
+    # En memoria solo queda "c": "a" (la menos usada) ya no está en ningún nivel
+    assert cache.get("a") is None
+    assert cache.get("b") == "b"
+
+
+def test_evict_disk_drops_expired_entries(tmp_path):
+    cache = LLMResultCache(max_entries=10, ttl_seconds=0.05, sqlite_path=str(tmp_path / "cache.db"), evict_every=1000)
+    cache.set("a", "1")
+    time.sleep(0.06)
+    assert cache.evict_disk() == 1
+    assert cache.stats()["disk_size"] == 0
+
+
+def test_eviction_runs_in_background_every_n_inserts(tmp_path):
+    cache = LLMResultCache(max_entries=10, ttl_seconds=0, sqlite_path=str(tmp_path / "cache.db"),
+                           sqlite_max_entries=2, evict_every=4)
+    for i in range(3):
+        cache.set(str(i), "x")
+    assert cache.disk_evictions == 0
+    cache.set("3", "x")
+    deadline = time.monotonic() + 2
+    while cache.disk_evictions == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.disk_evictions == 2
+    assert cache.stats()["disk_size"] == 2
@@ -0,0 +1,32 @@
+import json
+
+from agents.pgp_bulk import feature_filename, run_bulk
+
+
+def test_feature_filename_keeps_safe_ids():
+    assert feature_filename("hu-123") == "hu-123.feature"
+    assert feature_filename("hu_1.v2") == "hu_1.v2.feature"
+    assert feature_filename("HU-123").startswith("HU-123~")
+
+
+def test_feature_filename_is_injective():
+    ids = ["HU/1", "HU_1", "HU 1", "HU:1", "HU\\1", "hu_1", "HU-A", "hu-a", "Hu-A"]
+    names = [feature_filename(hu_id) for hu_id in ids]
+    # También en sistemas de ficheros que no distinguen mayúsculas
+    assert len({name.lower() for name in names}) == len(ids)
+    assert all("/" not in name and "\\" not in name for name in names)
+
+
+def test_run_bulk_writes_one_file_per_hu(tmp_path):
+    source = tmp_path / "cases.json"
+    cases = [{"hu_id": hu_id, "title": f"Caso {hu_id}", "steps": ["Abrir la página"]} for hu_id in ("HU/1", "HU_1")]
+    source.write_text(json.dumps(cases), encoding="utf-8")
+    out = tmp_path / "features"
+
+    result = run_bulk(str(source), str(out), workers=1)
+
+    assert result["hus"] == 2
+    files = sorted(path.name for path in out.iterdir())
+    assert files == sorted(feature_filename(case["hu_id"]) for case in cases)
+    assert "Caso HU/1" in (out / feature_filename("HU/1")).read_text(encoding="utf-8")
+    assert "Caso HU_1" in (out / feature_filename("HU_1")).read_text(encoding="utf-8")
@@ -0,0 +1,116 @@
+import asyncio
+
+import httpx
+import pytest
+
+from core.custom_types import TaskState
+from host.circuit_breaker import CircuitState
+from host.remote_agent_client import RemoteAgentClient
+
+
+def client_with_responses(monkeypatch, *bodies):
+    """Cliente cuyo agente responde, por orden, con los cuerpos JSON-RPC dados."""
+    client = RemoteAgentClient("http://agente")
+    client.agent_card = object()
+    replies = iter(bodies)
+
+    async def fake_request(method, url, **kwargs):
+        return httpx.Response(200, json=next(replies), request=httpx.Request(method, url))
+
+    monkeypatch.setattr(client, "_request_async", fake_request)
+    return client
+
+
+def send(client, wait=None):
+    return asyncio.run(client.send_task_async("t-1", "s-1", "[]", wait=wait))
+
+
+def recorded(client):
+    return [ok for ok, _ in client.breaker._window]
+
+
+def test_result_counts_as_success(monkeypatch):
+    client = client_with_responses(monkeypatch, {"result": {"status": "success", "gherkin_content": "x"}})
+    assert send(client)["gherkin_content"] == "x"
+    assert recorded(client) == [True]
+
+
+def test_jsonrpc_error_counts_as_failure(monkeypatch):
+    client = client_with_responses(monkeypatch, {"error": {"code": -32603, "message": "boom"}})
+    assert send(client) == {"code": -32603, "message": "boom"}
+    assert recorded(client) == [False]
+
+
+def test_task_in_error_counts_as_failure(monkeypatch):
+    client = client_with_responses(
+        monkeypatch,
+        {"result": {"id": "t-1", "state": TaskState.WORKING}},
+        {"result": {"id": "t-1", "state": TaskState.ERROR, "error": "LLM caído"}},
+    )
+    result = send(client)
+    assert RemoteAgentClient.is_error_result(result)
+    assert result["message"] == "LLM caído"
+    assert recorded(client) == [False]
+
+
+def test_pending_task_with_wait_is_returned(monkeypatch):
+    client = client_with_responses(monkeypatch, {"result": {"id": "t-1", "state": TaskState.WORKING}})
+    result = send(client, wait=0)
+    assert result["state"] == TaskState.WORKING
+    assert result["agent"] == "http://agente"
+    assert recorded(client) == [True]
+
+
+@pytest.mark.parametrize("result, expected", [
+    ({"status": "success"}, False),
+    ({"code": -32001, "message": "no encontrada"}, True),
+    ("texto", False),
+    (None, False),
+])
+def test_is_error_result(result, expected):
+    assert RemoteAgentClient.is_error_result(result) is expected
+
+
+def test_latency_covers_only_tasks_send(monkeypatch):
+    client = client_with_responses(
+        monkeypatch,
+        {"result": {"id": "t-1", "state": TaskState.WORKING}},
+        {"result": {"id": "t-1", "state": TaskState.COMPLETED, "result": {"status": "success"}}},
+    )
+    original = client._request_async
+
+    async def slow_poll(method, url, **kwargs):
+        # El long polling (tasks/get) es tiempo de generación, no latencia de la réplica
+        if kwargs["json"]["method"] == "tasks/get":
+            await asyncio.sleep(0.2)
+        return await original(method, url, **kwargs)
+
+    monkeypatch.setattr(client, "_request_async", slow_poll)
+    send(client)
+    [(ok, latency)] = client.breaker._window
+    assert ok and latency < 0.1
+    assert client.stats.ewma_latency < 0.1
+
+
+def test_cancelled_call_records_nothing_and_frees_half_open_slot(monkeypatch):
+    client = client_with_responses(monkeypatch)
+    client.breaker.state = CircuitState.HALF_OPEN
+
+    async def hang(method, url, **kwargs):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(client, "_request_async", hang)
+
+    async def scenario():
+        task = asyncio.create_task(client.send_task_async("t-1", "s-1", "[]"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert recorded(client) == []
+    assert client.breaker.state == CircuitState.HALF_OPEN
+    assert client.breaker._half_open_calls == 0
+    assert client.stats.in_flight == 0
+    assert client.stats.ewma_latency is None
@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+import time
+
+from core.custom_types import Task, TaskState
+from core.in_memory_task_manager import InMemoryTaskManager
+from core.shared_state import SharedKV, SharedTaskStore
+from tests.test_in_memory_task_manager import cancel_request, echo, get_request, send_request
+
+
+def new_task(task_id, state=TaskState.WORKING):
+    now = time.time()
+    return Task(id=task_id, state=state, created_at=now, updated_at=now)
+
+
+def test_kv_items_max_age(tmp_path):
+    kv = SharedKV("kv", path=str(tmp_path / "kv.db"))
+    kv.set("a", {"x": 1})
+    assert kv.get("a") == {"x": 1}
+    assert SharedKV("kv", path=str(tmp_path / "kv.db")).items() == {"a": {"x": 1}}
+    time.sleep(0.02)
+    assert kv.items(max_age=0.01) == {}
+
+
+def test_update_does_not_override_cancel(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    owner, other = SharedTaskStore("t", path=path, owner="w1"), SharedTaskStore("t", path=path, owner="w2")
+    task = new_task("t-1")
+    owner.put(task)
+    assert other.cancel("t-1").state == TaskState.CANCELED
+    task.state = TaskState.COMPLETED
+    assert not owner.update(task)
+    assert owner.get("t-1").state == TaskState.CANCELED
+
+
+def test_orphans_of_dead_worker_are_marked_error(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    dead, alive = SharedTaskStore("t", path=path, owner="dead"), SharedTaskStore("t", path=path, owner="alive")
+    dead.heartbeat()
+    alive.heartbeat()
+    dead.put(new_task("t-dead"))
+    alive.put(new_task("t-alive"))
+    dead.put(new_task("t-done", TaskState.COMPLETED))
+
+    assert alive.mark_orphans(orphan_seconds=10) == 0
+    time.sleep(0.05)
+    alive.heartbeat()
+    assert alive.mark_orphans(orphan_seconds=0.04) == 1
+
+    orphan = alive.get("t-dead")
+    assert orphan.state == TaskState.ERROR
+    assert "dead" in orphan.error
+    assert alive.get("t-alive").state == TaskState.WORKING
+    assert alive.get("t-done").state == TaskState.COMPLETED
+
+
+def test_release_marks_own_active_tasks(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    store, other = SharedTaskStore("t", path=path, owner="w1"), SharedTaskStore("t", path=path, owner="w2")
+    store.put(new_task("mine", TaskState.SUBMITTED))
+    other.put(new_task("theirs", TaskState.SUBMITTED))
+    assert store.release("apagado") == 1
+    assert store.get("mine").state == TaskState.ERROR
+    assert store.get("theirs").state == TaskState.SUBMITTED
+
+
+def test_purge_after_orphan_ttl(tmp_path):
+    store = SharedTaskStore("t", path=str(tmp_path / "tasks.db"), owner="w1")
+    store.put(new_task("t-1"))
+    store.release("apagado")
+    time.sleep(0.02)
+    assert store.purge(ttl_seconds=0.01) == 1
+    assert store.get("t-1") is None
+
+
+def test_migrates_tables_without_owner(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, state TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)")
+    task = new_task("old")
+    db.execute("INSERT INTO tasks VALUES (?, ?, ?, ?)", (task.id, task.state, task.model_dump_json(), task.updated_at))
+    db.commit()
+    db.close()
+
+    store = SharedTaskStore("t", path=path, owner="w1")
+    # Sin owner registrado nadie la va a terminar: es huérfana
+    assert store.mark_orphans(orphan_seconds=10) == 1
+    assert store.get("old").state == TaskState.ERROR
+
+
+def test_managers_share_tasks_between_workers(tmp_path):
+    path = str(tmp_path / "tasks.db")
+
+    async def slow(request):
+        await asyncio.sleep(10)
+
+    async def main():
+        first = InMemoryTaskManager(echo, num_workers=1, shared_store=SharedTaskStore("t", path=path))
+        second = InMemoryTaskManager(slow, num_workers=1, shared_store=SharedTaskStore("t", path=path))
+        try:
+            done = (await first.on_send_task(send_request(wait_seconds=1))).result
+            seen = (await second.on_get_task(get_request(done.id))).result
+
+            running = (await second.on_send_task(send_request(wait_seconds=0.05))).result
+            remote = (await first.on_get_task(get_request(running.id))).result
+            cancelled = (await first.on_cancel_task(cancel_request(running.id))).result
+            return done, seen, remote, cancelled
+        finally:
+            await first.shutdown()
+            await second.shutdown()
+
+    done, seen, remote, cancelled = asyncio.run(main())
+    assert done.state == seen.state == TaskState.COMPLETED
+    assert seen.result == done.result
+    assert remote.state == TaskState.WORKING
+    assert cancelled.state == TaskState.CANCELED
+
+
+def test_shutdown_releases_queued_tasks(tmp_path):
+    path = str(tmp_path / "tasks.db")
+
+    async def slow(request):
+        await asyncio.sleep(10)
+
+    async def main():
+        manager = InMemoryTaskManager(slow, num_workers=1, shared_store=SharedTaskStore("t", path=path))
+        running = (await manager.on_send_task(send_request(wait_seconds=0.05))).result
+        queued = (await manager.on_send_task(send_request(wait_seconds=0))).result
+        await manager.shutdown()
+        return running.id, queued.id
+
+    running_id, queued_id = asyncio.run(main())
+    store = SharedTaskStore("t", path=path)
+    assert store.get(running_id).state == TaskState.CANCELED
+    assert store.get(queued_id).state == TaskState.ERROR
@@ -0,0 +1,82 @@
+from agents.task_manager import PGPTargetAgent
+
+
+def case(case_id, steps, title="Login", description="Como usuario quiero entrar", expected="Se accede al panel"):
+    return {"id": case_id, "hu_id": "HU-1", "title": title, "description": description,
+            "preconditions": ["El usuario está registrado"], "steps": steps, "expected_result": expected}
+
+
+def render(cases):
+    return PGPTargetAgent().render_feature("HU-1", cases)
+
+
+def examples(feature):
+    """Filas de la tabla Examples (cabecera incluida) con las celdas sin relleno."""
+    return [[cell.strip() for cell in line.strip().split("|")[1:-1]]
+            for line in feature.splitlines() if line.strip().startswith("|")]
+
+
+def test_cases_differing_in_literals_become_outline_with_ids():
+    feature = render([
+        case("TC-1", ["Ingresar el usuario 'ana'", "Ingresar la contraseña '123'"]),
+        case("TC-2", ["Ingresar el usuario 'luis'", "Ingresar la contraseña '456'"]),
+    ])
+    assert "Scenario Outline: Login" in feature
+    assert "When Ingresar el usuario '<usuario>'" in feature
+    assert examples(feature) == [["id", "usuario", "contraseña"], ["TC-1", "ana", "123"], ["TC-2", "luis", "456"]]
+
+
+def test_identical_values_render_plain_scenarios_without_empty_examples():
+    feature = render([
+        case("TC-1", ["Ingresar el usuario 'ana'"]),
+        case("TC-2", ["Ingresar el usuario 'ana'"]),
+    ])
+    assert "Scenario Outline" not in feature
+    assert "Examples" not in feature
+    assert "|  |" not in feature
+    assert feature.count("Scenario: Login") == 2
+    assert "@TC-1" in feature and "@TC-2" in feature
+
+
+def test_exact_duplicates_are_written_once():
+    feature = render([case("TC-1", ["Abrir la página"]), case("TC-1", ["Abrir la página"])])
+    assert feature.count("Scenario: Login") == 1
+
+
+def test_cases_without_literals_are_not_dropped():
+    feature = render([case("TC-1", ["Abrir la página"]), case("TC-2", ["Abrir la página"])])
+    assert feature.count("Scenario: Login") == 2
+
+
+def test_cases_with_different_descriptions_are_not_merged():
+    feature = render([
+        case("TC-1", ["Ingresar el usuario 'ana'"], description="Caso A"),
+        case("TC-2", ["Ingresar el usuario 'luis'"], description="Caso B"),
+    ])
+    assert "Scenario Outline" not in feature
+    assert "# Caso A" in feature and "# Caso B" in feature
+
+
+def test_literal_placeholder_text_never_reaches_outline_steps():
+    # Valor fijo con "<...>": pasa a una columna de Examples en lugar de quedarse en el paso
+    feature = render([
+        case("TC-1", ["Ingresar el usuario 'ana'", "Escribir '<script>'"]),
+        case("TC-2", ["Ingresar el usuario 'luis'", "Escribir '<script>'"]),
+    ])
+    assert "Scenario Outline" in feature
+    assert "<script>" not in [step for step in feature.splitlines() if "Escribir" in step][0]
+    assert examples(feature) == [["id", "usuario", "escribir"], ["TC-1", "ana", "<script>"], ["TC-2", "luis", "<script>"]]
+
+    # Texto no literal con "<...>": se generan Scenarios
+    feature = render([
+        case("TC-1", ["Ingresar el usuario 'ana' en <b>login</b>"]),
+        case("TC-2", ["Ingresar el usuario 'luis' en <b>login</b>"]),
+    ])
+    assert "Scenario Outline" not in feature
+    assert feature.count("Scenario: Login") == 2
+
+
+def test_single_case_feature_title():
+    feature = render([case("TC-1", ["Abrir la página"])])
+    assert feature.startswith("Feature: HU-1 - Login\n  Como usuario quiero entrar\n")
+    assert "Background" not in feature